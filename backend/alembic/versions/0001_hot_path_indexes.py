@@ -0,0 +1,54 @@
+"""Hot path indexes
+
+Indexes for the queries every page load runs: today's tasks, deck loads,
+per-card MCQs/sentences, tracking history and the user's plan list.
+Tables created by Base.metadata.create_all already carry these, so every
+index is created with IF NOT EXISTS, and tables that don't exist yet are
+skipped.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) - kept in sync with __table_args__ / index=True in app/models.py
+HOT_PATH_INDEXES = [
+    ("ix_study_plans_user_status", "study_plans", ["user_id", "status"]),
+    ("ix_tasks_plan_scheduled_status", "tasks", ["study_plan_id", "scheduled_date", "completion_status"]),
+    ("ix_flashcards_study_plan_id", "flashcards", ["study_plan_id"]),
+    ("ix_mcq_questions_flashcard_id", "mcq_questions", ["flashcard_id"]),
+    ("ix_vocabulary_sentences_flashcard_id", "vocabulary_sentences", ["flashcard_id"]),
+    ("ix_pre_assessments_study_plan_id", "pre_assessments", ["study_plan_id"]),
+    ("ix_pre_assessment_responses_pre_assessment_id", "pre_assessment_responses", ["pre_assessment_id"]),
+    ("ix_study_session_tracking_user_created", "study_session_tracking", ["user_id", "created_at"]),
+    ("ix_test_results_plan_created", "test_results", ["study_plan_id", "created_at"]),
+    ("ix_study_sessions_user_date", "study_sessions", ["user_id", "date"]),
+]
+
+
+def upgrade() -> None:
+    # Tables missing here are created (indexes included) by create_all on app startup
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, table, columns in HOT_PATH_INDEXES:
+        if table in existing_tables:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, table, _ in reversed(HOT_PATH_INDEXES):
+        if table in existing_tables:
+            op.drop_index(name, table_name=table, if_exists=True)
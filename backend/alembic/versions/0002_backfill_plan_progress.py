@@ -0,0 +1,44 @@
+"""Backfill plan progress counters
+
+study_plans.tasks_total / tasks_completed / progress_percentage become the
+source of truth for plan progress (maintained by the Task flush events in
+app/models.py). Recompute them once from the task rows.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        UPDATE study_plans SET
+            tasks_total = (SELECT COUNT(*) FROM tasks WHERE tasks.study_plan_id = study_plans.id),
+            tasks_completed = (
+                SELECT COUNT(*) FROM tasks
+                WHERE tasks.study_plan_id = study_plans.id AND tasks.completion_status = TRUE
+            )
+    """)
+    op.execute("""
+        UPDATE study_plans SET progress_percentage = CASE
+            WHEN tasks_total > 0 THEN tasks_completed * 100.0 / tasks_total
+            ELSE 0.0
+        END
+    """)
+
+
+def downgrade() -> None:
+    # Counters stay valid without the events; nothing to undo.
+    pass
@@ -0,0 +1,39 @@
+"""Plan content version
+
+Adds study_plans.content_version, bumped by the flush events in app/models.py
+whenever a plan's flashcards, MCQs, sentences or summary change. Deck
+endpoints derive their ETags from it.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have the column
+    if not _has_column("study_plans", "content_version"):
+        with op.batch_alter_table("study_plans") as batch_op:
+            batch_op.add_column(sa.Column("content_version", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("study_plans") as batch_op:
+        batch_op.drop_column("content_version")
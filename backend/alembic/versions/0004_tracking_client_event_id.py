@@ -0,0 +1,59 @@
+"""Tracking client event ids
+
+Adds study_session_tracking.client_event_id with a unique (user_id,
+client_event_id) index, so events re-sent by /tracking/log-batch after a
+failed request are stored once. Rows without an id (NULL) never conflict.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return name in [index["name"] for index in inspector.get_indexes(table)]
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have both;
+    # very old ones without the table get it, complete, from create_all
+    if not _has_table("study_session_tracking"):
+        return
+    if not _has_column("study_session_tracking", "client_event_id"):
+        with op.batch_alter_table("study_session_tracking") as batch_op:
+            batch_op.add_column(sa.Column("client_event_id", sa.String(), nullable=True))
+    if not _has_index("study_session_tracking", "ux_study_session_tracking_user_event"):
+        op.create_index(
+            "ux_study_session_tracking_user_event",
+            "study_session_tracking",
+            ["user_id", "client_event_id"],
+            unique=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_study_session_tracking_user_event", table_name="study_session_tracking")
+    with op.batch_alter_table("study_session_tracking") as batch_op:
+        batch_op.drop_column("client_event_id")
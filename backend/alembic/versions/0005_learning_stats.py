@@ -0,0 +1,50 @@
+"""Learning stats
+
+Adds learning_stats: decayed accuracy, counts and response-time histograms per
+user and scope (global / category / mode), updated incrementally from the
+tracking buffer instead of rescanning study_session_tracking.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have the table
+    if sa.inspect(op.get_bind()).has_table("learning_stats"):
+        return
+    op.create_table(
+        "learning_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("events", sa.Integer(), nullable=True),
+        sa.Column("decayed_weight", sa.Float(), nullable=True),
+        sa.Column("decayed_correct", sa.Float(), nullable=True),
+        sa.Column("response_time_ewma", sa.Float(), nullable=True),
+        sa.Column("response_time_histogram", sa.JSON(), nullable=True),
+        sa.Column("last_event_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_learning_stats_id", "learning_stats", ["id"])
+    op.create_index("ux_learning_stats_user_scope_key", "learning_stats", ["user_id", "scope", "key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ux_learning_stats_user_scope_key", table_name="learning_stats")
+    op.drop_index("ix_learning_stats_id", table_name="learning_stats")
+    op.drop_table("learning_stats")
@@ -0,0 +1,50 @@
+"""Dashboard snapshots
+
+Adds dashboard_snapshots, the materialized /analytics/dashboard response per
+user (rebuilt on invalidation instead of on every load).
+
+The dashboard also used to mark fully completed plans as COMPLETED while
+serving a GET. complete_task already does this when the last task is done;
+mark the plans that only the old dashboard would have caught once here.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        UPDATE study_plans SET status = 'COMPLETED'
+        WHERE tasks_total > 0 AND tasks_completed >= tasks_total AND status != 'COMPLETED'
+    """)
+
+    # Databases created by Base.metadata.create_all already have the table
+    if sa.inspect(op.get_bind()).has_table("dashboard_snapshots"):
+        return
+    op.create_table(
+        "dashboard_snapshots",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("payload", sa.LargeBinary(), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("stale", sa.Boolean(), nullable=False),
+        sa.Column("valid_until", sa.DateTime(), nullable=True),
+        sa.Column("computed_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    # Plans marked COMPLETED stay completed
+    op.drop_table("dashboard_snapshots")
@@ -0,0 +1,133 @@
+"""Study activity days and streaks
+
+study_sessions becomes a day-bucketed activity table: a `day` column (the UTC
+day the row counts for), backfilled from `date`, with one row per user and
+day. create_study_session used to compare the `date` timestamp with a date,
+which never matched, so users can have several rows for the same day; they
+are merged into the oldest one before the unique index is created.
+
+Adds study_streaks (current / longest streak, last completed day) and fills
+it from the completed days.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 20:00:00
+
+"""
+from datetime import timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return name in [index["name"] for index in inspector.get_indexes(table)]
+
+
+def _backfill_days() -> None:
+    bind = op.get_bind()
+    day_expr = "date(date)" if bind.dialect.name == "sqlite" else "CAST(date AS DATE)"
+    op.execute(f"UPDATE study_sessions SET day = {day_expr} WHERE day IS NULL AND date IS NOT NULL")
+
+    # Merge duplicate days into the oldest row
+    op.execute("""
+        UPDATE study_sessions SET
+            tasks_available = (
+                SELECT MAX(s.tasks_available) FROM study_sessions s
+                WHERE s.user_id = study_sessions.user_id AND s.day = study_sessions.day
+            ),
+            tasks_completed = (
+                SELECT MAX(s.tasks_completed) FROM study_sessions s
+                WHERE s.user_id = study_sessions.user_id AND s.day = study_sessions.day
+            ),
+            is_complete_day = EXISTS (
+                SELECT 1 FROM study_sessions s
+                WHERE s.user_id = study_sessions.user_id AND s.day = study_sessions.day
+                AND s.is_complete_day = TRUE
+            )
+        WHERE day IS NOT NULL
+    """)
+    op.execute("""
+        DELETE FROM study_sessions
+        WHERE day IS NOT NULL AND id NOT IN (
+            SELECT keep_id FROM (
+                SELECT MIN(id) AS keep_id FROM study_sessions WHERE day IS NOT NULL GROUP BY user_id, day
+            ) AS keep
+        )
+    """)
+
+
+def _backfill_streaks() -> None:
+    bind = op.get_bind()
+    if bind.execute(sa.text("SELECT COUNT(*) FROM study_streaks")).scalar():
+        return
+    rows = bind.execute(sa.text("""
+        SELECT user_id, day FROM study_sessions
+        WHERE is_complete_day = TRUE AND day IS NOT NULL
+        ORDER BY user_id, day
+    """).columns(user_id=sa.Integer(), day=sa.Date()))
+    streaks = {}
+    for user_id, day in rows:
+        current, longest, previous = streaks.get(user_id, (0, 0, None))
+        current = current + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        streaks[user_id] = (current, max(longest, current), day)
+    if streaks:
+        streak_table = sa.table(
+            "study_streaks",
+            sa.column("user_id", sa.Integer()),
+            sa.column("current_streak", sa.Integer()),
+            sa.column("longest_streak", sa.Integer()),
+            sa.column("last_active_day", sa.Date()),
+        )
+        op.bulk_insert(streak_table, [
+            {"user_id": user_id, "current_streak": current, "longest_streak": longest, "last_active_day": last}
+            for user_id, (current, longest, last) in streaks.items()
+        ])
+
+
+def upgrade() -> None:
+    if not _has_table("study_sessions"):
+        return
+    if not _has_column("study_sessions", "day"):
+        with op.batch_alter_table("study_sessions") as batch_op:
+            batch_op.add_column(sa.Column("day", sa.Date(), nullable=True))
+    _backfill_days()
+    if not _has_index("study_sessions", "ux_study_sessions_user_day"):
+        op.create_index("ux_study_sessions_user_day", "study_sessions", ["user_id", "day"], unique=True)
+
+    if not _has_table("study_streaks"):
+        op.create_table(
+            "study_streaks",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("current_streak", sa.Integer(), nullable=False),
+            sa.Column("longest_streak", sa.Integer(), nullable=False),
+            sa.Column("last_active_day", sa.Date(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+    _backfill_streaks()
+
+
+def downgrade() -> None:
+    # Merged duplicate days are not restored
+    op.drop_table("study_streaks")
+    op.drop_index("ux_study_sessions_user_day", table_name="study_sessions")
+    with op.batch_alter_table("study_sessions") as batch_op:
+        batch_op.drop_column("day")
@@ -0,0 +1,50 @@
+"""Flashcard recall model
+
+Adds the forgetting-curve columns written by the batch half-life regression
+(app/services/recall_model.py): half_life_hours, recall_probability,
+next_review_at and recall_updated_at. They stay NULL until the first fit.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 22:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    ("half_life_hours", sa.Float()),
+    ("recall_probability", sa.Float()),
+    ("next_review_at", sa.DateTime()),
+    ("recall_updated_at", sa.DateTime()),
+)
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have the columns
+    missing = [(name, type_) for name, type_ in COLUMNS if not _has_column("flashcards", name)]
+    if not missing:
+        return
+    with op.batch_alter_table("flashcards") as batch_op:
+        for name, type_ in missing:
+            batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("flashcards") as batch_op:
+        for name, _ in reversed(COLUMNS):
+            batch_op.drop_column(name)
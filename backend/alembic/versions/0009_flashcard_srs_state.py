@@ -0,0 +1,92 @@
+"""Flashcard spaced repetition state
+
+Adds the per-card memory state of the spaced repetition engine
+(app/services/srs.py): srs_stability, srs_difficulty, srs_reps, srs_lapses,
+srs_last_review_at and due_at, plus ix_flashcards_plan_due on
+(study_plan_id, due_at) for the due-card queue.
+
+Cards that already have a fitted forgetting curve (0008) start from it: the
+stability is the time until the fitted recall falls to 90%, and the card is
+due at its next_review_at. All other cards stay new (due_at NULL).
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-20 00:00:00
+
+"""
+import math
+from datetime import timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    ("srs_stability", sa.Float()),
+    ("srs_difficulty", sa.Float()),
+    ("srs_reps", sa.Integer()),
+    ("srs_lapses", sa.Integer()),
+    ("srs_last_review_at", sa.DateTime()),
+    ("due_at", sa.DateTime()),
+)
+INITIAL_DIFFICULTY = 5.1618  # FSRS-4.5 difficulty after a first GOOD answer
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return name in [index["name"] for index in inspector.get_indexes(table)]
+
+
+def _seed_from_recall_model() -> None:
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("""
+        SELECT id, half_life_hours, next_review_at, times_studied FROM flashcards
+        WHERE half_life_hours IS NOT NULL AND next_review_at IS NOT NULL AND srs_stability IS NULL
+    """).columns(id=sa.Integer(), half_life_hours=sa.Float(), next_review_at=sa.DateTime(), times_studied=sa.Integer()))
+    seeds = []
+    for card_id, half_life_hours, next_review_at, times_studied in rows:
+        stability = half_life_hours * math.log2(1 / 0.9) / 24
+        seeds.append({
+            "card_id": card_id,
+            "stability": stability,
+            "reps": times_studied or 0,
+            "last_review": next_review_at - timedelta(days=stability),
+            "due": next_review_at,
+        })
+    if seeds:
+        bind.execute(sa.text("""
+            UPDATE flashcards SET srs_stability = :stability, srs_difficulty = :difficulty,
+                srs_reps = :reps, srs_lapses = 0, srs_last_review_at = :last_review, due_at = :due
+            WHERE id = :card_id
+        """), [dict(seed, difficulty=INITIAL_DIFFICULTY) for seed in seeds])
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have the columns
+    missing = [(name, type_) for name, type_ in COLUMNS if not _has_column("flashcards", name)]
+    if missing:
+        with op.batch_alter_table("flashcards") as batch_op:
+            for name, type_ in missing:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+    _seed_from_recall_model()
+    if not _has_index("flashcards", "ix_flashcards_plan_due"):
+        op.create_index("ix_flashcards_plan_due", "flashcards", ["study_plan_id", "due_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_flashcards_plan_due", table_name="flashcards")
+    with op.batch_alter_table("flashcards") as batch_op:
+        for name, _ in reversed(COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,71 @@
+"""Adaptive pre-assessment
+
+Adds item_calibrations, the card difficulty models fitted offline on all
+pre-assessment answers (app/services/item_response.py), and the running
+ability estimate of an adaptive pre-assessment: pre_assessments.ability_estimate
+and ability_se.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-21 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    ("ability_estimate", sa.Float()),
+    ("ability_se", sa.Float()),
+)
+
+
+def _has_table(table: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have the table and columns
+    if not _has_table("item_calibrations"):
+        op.create_table(
+            "item_calibrations",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("responses", sa.Integer(), nullable=False),
+            sa.Column("assessments", sa.Integer(), nullable=False),
+            sa.Column("weights", sa.JSON(), nullable=False),
+            sa.Column("log_loss", sa.Float(), nullable=True),
+            sa.Column("baseline_log_loss", sa.Float(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        )
+        op.create_index("ix_item_calibrations_id", "item_calibrations", ["id"])
+
+    # Very old databases without pre_assessments get it, complete, from create_all
+    if not _has_table("pre_assessments"):
+        return
+    missing = [(name, type_) for name, type_ in COLUMNS if not _has_column("pre_assessments", name)]
+    if missing:
+        with op.batch_alter_table("pre_assessments") as batch_op:
+            for name, type_ in missing:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    if _has_table("pre_assessments"):
+        with op.batch_alter_table("pre_assessments") as batch_op:
+            for name, _ in reversed(COLUMNS):
+                batch_op.drop_column(name)
+    op.drop_index("ix_item_calibrations_id", table_name="item_calibrations")
+    op.drop_table("item_calibrations")
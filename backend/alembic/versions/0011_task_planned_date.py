@@ -0,0 +1,44 @@
+"""Task planned date
+
+Adds tasks.planned_date, the day the plan's own schedule put a task on.
+scheduled_date stays the day the task is shown on, which the cross-plan
+scheduler (app/services/user_scheduler.py) may push later to fit the user's
+daily budget; it now rebalances from planned_date, so tasks can move back once
+the budget frees up.
+
+Existing tasks start planned on their current scheduled_date.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-22 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all already have the column
+    if not _has_column("tasks", "planned_date"):
+        with op.batch_alter_table("tasks") as batch_op:
+            batch_op.add_column(sa.Column("planned_date", sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE tasks SET planned_date = scheduled_date WHERE planned_date IS NULL")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("tasks") as batch_op:
+        batch_op.drop_column("planned_date")
@@ -1,9 +1,59 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from openai import OpenAI
 from app.config import settings
 from app.mock_ai_service import mock_ai_service
 import json
 
+def encode_image_for_vision(image_path: str) -> Tuple[str, str]:
+    """Decode an image (HEIC is converted to JPEG) into base64 data for the vision API.
+
+    Module-level so it can run in the CPU process pool.
+    """
+    import base64
+    from PIL import Image
+    import pillow_heif
+    from io import BytesIO
+
+    # Register HEIF opener if not already registered
+    try:
+        pillow_heif.register_heif_opener()
+    except:
+        pass
+
+    # Open and convert image to JPEG if needed
+    image_ext = image_path.lower().split('.')[-1]
+
+    if image_ext == 'heic':
+        # Convert HEIC to JPEG in memory
+        heif_file = pillow_heif.open_heif(image_path)
+        image = Image.frombytes(
+            heif_file.mode,
+            heif_file.size,
+            heif_file.data,
+            "raw"
+        )
+        # Convert to RGB if needed (HEIC might be in different color space)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        # Save to bytes buffer as JPEG
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG')
+        image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        mime_type = "image/jpeg"
+    else:
+        # For other formats, read directly
+        with open(image_path, "rb") as image_file:
+            image_data = base64.b64encode(image_file.read()).decode('utf-8')
+
+        if image_ext in ['jpg', 'jpeg']:
+            mime_type = "image/jpeg"
+        elif image_ext == 'png':
+            mime_type = "image/png"
+        else:
+            mime_type = "image/jpeg"
+
+    return image_data, mime_type
+
 class AIService:
     """Abstraction layer for AI services. Can be swapped by changing API key."""
     
@@ -598,50 +648,14 @@ Return JSON:
         if settings.USE_MOCK_AI:
             return mock_ai_service.extract_text_from_image(b"")
 
-        import base64
-        from PIL import Image
-        import pillow_heif
-        from io import BytesIO
-        
-        # Register HEIF opener if not already registered
-        try:
-            pillow_heif.register_heif_opener()
-        except:
-            pass
-        
-        # Open and convert image to JPEG if needed
-        image_ext = image_path.lower().split('.')[-1]
-        
-        if image_ext == 'heic':
-            # Convert HEIC to JPEG in memory
-            heif_file = pillow_heif.open_heif(image_path)
-            image = Image.frombytes(
-                heif_file.mode,
-                heif_file.size,
-                heif_file.data,
-                "raw"
-            )
-            # Convert to RGB if needed (HEIC might be in different color space)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            # Save to bytes buffer as JPEG
-            buffer = BytesIO()
-            image.save(buffer, format='JPEG')
-            image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            mime_type = "image/jpeg"
-        else:
-            # For other formats, read directly
-            with open(image_path, "rb") as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            if image_ext in ['jpg', 'jpeg']:
-                mime_type = "image/jpeg"
-            elif image_ext == 'png':
-                mime_type = "image/png"
-            else:
-                mime_type = "image/jpeg"
-            
-        
+        image_data, mime_type = encode_image_for_vision(image_path)
+        return self.extract_text_from_encoded_image(image_data, mime_type)
+
+    def extract_text_from_encoded_image(self, image_data: str, mime_type: str) -> str:
+        """Extract text from an image already encoded with encode_image_for_vision."""
+        if settings.USE_MOCK_AI:
+            return mock_ai_service.extract_text_from_image(b"")
+
         try:
             if not self.client:
                 return "Mock text extracted from image: [The provided image contained vocabulary and definitions for study.]"
@@ -8,19 +8,39 @@ from sqlalchemy.orm import Session
 from app.config import settings
 from app.database import get_db
 from app.models import User
+from app.workers import run_auth
+from app.auth_cache import get_cached_user_id, cache_user_id, load_cached_user, cache_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+def _password_bytes(password: str) -> bytes:
+    # Truncate password to 72 bytes (bcrypt limit)
+    return password.encode('utf-8')[:72]
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode('utf-8'))
 
-def get_password_hash(password: str) -> str:
-    # Truncate password to 72 bytes (bcrypt limit)
-    password_bytes = password.encode('utf-8')[:72]
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(_password_bytes(password), salt)
     return hashed.decode('utf-8')
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different cost than BCRYPT_ROUNDS ("$2b$12$...")."""
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.BCRYPT_ROUNDS
+
+# bcrypt takes ~250ms of CPU at cost 12; these run it in the auth process pool
+# so concurrent logins don't serialize on the event loop.
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_auth(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await run_auth(get_password_hash, password, settings.BCRYPT_ROUNDS)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -40,17 +60,25 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        user_id = payload.get("sub")
-        if user_id is None:
+    user_id = get_cached_user_id(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+            user_id = payload.get("sub")
+            if user_id is None:
+                raise credentials_exception
+            # Ensure user_id is an integer
+            user_id = int(user_id)
+        except (JWTError, ValueError, TypeError):
             raise credentials_exception
-        # Ensure user_id is an integer
-        user_id = int(user_id)
-    except (JWTError, ValueError, TypeError):
-        raise credentials_exception
+        cache_user_id(token, user_id, payload.get("exp"))
+    
+    # Cached snapshot attached to this session; falls back to the row on a miss
+    user = load_cached_user(db, user_id)
+    if user is not None:
+        return user
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise credentials_exception
+    cache_user(user)
     return user
-
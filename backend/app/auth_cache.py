@@ -0,0 +1,145 @@
+"""
+In-process cache for get_current_user.
+
+Every authenticated request used to decode the JWT and SELECT the user row,
+including each /tracking/log call fired per answered card. This module keeps
+two bounded TTL caches:
+
+- token -> user id (decoded, verified claims; never kept past the token's exp)
+- user id -> snapshot of the user's columns (without the password hash)
+
+On a hit the snapshot is attached to the request's session with
+Session.merge(load=False), so endpoints still get a normal persistent User they
+can read, lazy-load from and update - without a SELECT.
+
+Snapshots are dropped after any commit that updated or deleted the user (PUT
+/users/me, onboarding, ...). The cache is per process; with several server
+processes another process can serve a snapshot up to AUTH_CACHE_TTL_SECONDS old.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.config import settings
+from app.models import User
+
+# Never cached: the password hash stays in the database only
+SNAPSHOT_EXCLUDED = {"hashed_password"}
+
+
+class TTLCache:
+    """Small thread-safe LRU with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        expires_at = min(expires_at or float("inf"), time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+token_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+def get_cached_user_id(token: str) -> Optional[int]:
+    return token_cache.get(token)
+
+def cache_user_id(token: str, user_id: int, exp: Optional[float]):
+    """Cache verified claims; `exp` is the token's Unix expiry time."""
+    expires_at = None
+    if exp is not None:
+        expires_at = time.monotonic() + (float(exp) - time.time())
+    token_cache.set(token, user_id, expires_at)
+
+def snapshot_user(user: User) -> Dict[str, Any]:
+    return {
+        attr.key: getattr(user, attr.key)
+        for attr in inspect(User).column_attrs
+        if attr.key not in SNAPSHOT_EXCLUDED
+    }
+
+def cache_user(user: User):
+    user_cache.set(user.id, snapshot_user(user))
+
+def load_cached_user(db: Session, user_id: int) -> Optional[User]:
+    """Attach the cached snapshot to `db` as a persistent User, or None on a miss."""
+    snapshot = user_cache.get(user_id)
+    if snapshot is None:
+        return None
+    # Fresh instance per request; JSON columns are copied so requests never share lists
+    user = User(**copy.deepcopy(snapshot))
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def invalidate_user(user_id: int):
+    user_cache.discard(user_id)
+
+def get_auth_cache_stats() -> Dict[str, Any]:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+
+def _record_user_change(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+    invalidate_user(target.id)
+
+event.listen(User, "after_update", _record_user_change)
+event.listen(User, "after_delete", _record_user_change)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    # Dropped again after commit: a concurrent request may have cached the
+    # pre-commit row between the flush and the commit.
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session):
+    session.info.pop("changed_user_ids", None)
@@ -0,0 +1,206 @@
+"""
+Response compression tuned for deck payloads.
+
+Quiz/bundle JSON repeats the same keys and options thousands of times, so it
+compresses several-fold. CompressionMiddleware negotiates brotli (if the
+`brotli` package is installed) or gzip from Accept-Encoding, skips small
+bodies and content types that are already compressed, and keeps an LRU cache
+of compressed bodies keyed by ETag + encoding so an unchanged deck version is
+compressed once rather than on every request.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/msgpack",
+    "application/x-msgpack",
+    "application/javascript",
+    "text/",
+)
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL)
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported encoding for an Accept-Encoding header (brotli first on ties)."""
+    accepted = _accepted_encodings(accept_encoding)
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    candidates = [(accepted.get(name, accepted.get("*", 0.0)), name) for name in supported]
+    candidates = [(quality, name) for quality, name in candidates if quality > 0]
+    if not candidates:
+        return None
+    best = max(quality for quality, _ in candidates)
+    return next(name for quality, name in candidates if quality == best)
+
+
+class PrecompressedCache:
+    """
+    LRU of compressed bodies keyed by (ETag, encoding). The body digest is
+    stored too, so a stale ETag (content changed without a version bump)
+    recompresses instead of serving the wrong bytes.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[str, str], tuple[bytes, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, etag: str, encoding: str, body: bytes) -> bytes:
+        key = (etag, encoding)
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == digest:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        compressed = _compress(body, encoding)
+        with self._lock:
+            self._entries[key] = (digest, compressed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+precompressed_cache = PrecompressedCache(settings.COMPRESSION_CACHE_ENTRIES)
+
+def get_compression_stats() -> Dict[str, Any]:
+    return {
+        "encodings": ["br", "gzip"] if brotli is not None else ["gzip"],
+        "min_size": settings.COMPRESSION_MIN_SIZE,
+        "cache": precompressed_cache.stats(),
+    }
+
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses complete (non-streaming) responses."""
+
+    def __init__(self, app, min_size: Optional[int] = None):
+        self.app = app
+        self.min_size = settings.COMPRESSION_MIN_SIZE if min_size is None else min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or not self._should_compress(start_message, body):
+                # Streaming or not worth compressing: send it as produced
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            await self._send_compressed(send, start_message, body, encoding)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _should_compress(self, start_message, body: bytes) -> bool:
+        if start_message["status"] != 200 or len(body) < self.min_size:
+            return False
+        headers = {name.lower(): value for name, value in start_message.get("headers", [])}
+        if b"content-encoding" in headers:
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def _send_compressed(self, send, start_message, body: bytes, encoding: str):
+        headers = []
+        etag = None
+        vary = []
+        for name, value in start_message.get("headers", []):
+            lower = name.lower()
+            if lower == b"content-length":
+                continue
+            if lower == b"etag":
+                etag = value.decode("latin-1")
+                continue
+            if lower == b"vary":
+                vary.append(value.decode("latin-1"))
+                continue
+            headers.append((name, value))
+
+        if etag:
+            compressed = precompressed_cache.get_or_compress(etag, encoding, body)
+            # The compressed bytes differ from the identity representation, so the
+            # validator becomes weak; If-None-Match uses weak comparison anyway.
+            weak_etag = etag if etag.startswith("W/") else f"W/{etag}"
+            headers.append((b"etag", weak_etag.encode("latin-1")))
+        else:
+            compressed = _compress(body, encoding)
+
+        if "accept-encoding" not in ", ".join(vary).lower():
+            vary.append("Accept-Encoding")
+        headers.append((b"vary", ", ".join(vary).encode("latin-1")))
+        headers.append((b"content-encoding", encoding.encode("latin-1")))
+        headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": compressed})
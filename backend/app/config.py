@@ -23,6 +23,58 @@ class Settings:
     # Always default to True as requested to unblock usage
     USE_MOCK_AI: bool = os.getenv("USE_MOCK_AI", "True").lower() == "true"
 
+    # Background pipeline pools (see app/workers.py)
+    CPU_POOL_WORKERS: int = int(os.getenv("CPU_POOL_WORKERS", "2"))
+    IO_POOL_WORKERS: int = int(os.getenv("IO_POOL_WORKERS", "8"))
+    AUTH_POOL_WORKERS: int = int(os.getenv("AUTH_POOL_WORKERS", "2"))  # bcrypt processes
+
+    # bcrypt cost factor; hashes with a different cost are upgraded on the next login
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+    # Query instrumentation (see app/query_stats.py)
+    N_PLUS_ONE_THRESHOLD: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+    QUERY_BUDGET: int = int(os.getenv("QUERY_BUDGET", "0"))  # 0 = no per-request budget warning
+
+    # Write-behind buffer for /tracking/log (see app/tracking_buffer.py)
+    TRACKING_FLUSH_INTERVAL_MS: int = int(os.getenv("TRACKING_FLUSH_INTERVAL_MS", "250"))
+    TRACKING_FLUSH_BATCH_SIZE: int = int(os.getenv("TRACKING_FLUSH_BATCH_SIZE", "500"))
+    TRACKING_BUFFER_MAX_EVENTS: int = int(os.getenv("TRACKING_BUFFER_MAX_EVENTS", "20000"))
+    TRACKING_BATCH_MAX_EVENTS: int = int(os.getenv("TRACKING_BATCH_MAX_EVENTS", "500"))  # per /tracking/log-batch call
+
+    # Half-life of the decayed accuracy/response-time stats in learning_stats
+    LEARNING_STATS_HALF_LIFE_HOURS: float = float(os.getenv("LEARNING_STATS_HALF_LIFE_HOURS", "72"))
+
+    # Columnar copy of tracking events for long-range analytics (see app/event_store.py)
+    EVENT_STORE_ENABLED: bool = os.getenv("EVENT_STORE_ENABLED", "True").lower() == "true"
+    # A day's segment is sealed this long after the day ends: the live writer no longer
+    # appends to it (later events stay in the table) and export_event_store.py may replace it
+    EVENT_STORE_SEAL_HOURS: float = float(os.getenv("EVENT_STORE_SEAL_HOURS", "48"))
+
+    # Forgetting-curve model (see app/services/recall_model.py): review when predicted recall falls to this
+    RECALL_TARGET: float = float(os.getenv("RECALL_TARGET", "0.9"))
+    # Longest spaced-repetition interval (see app/services/srs.py)
+    SRS_MAX_INTERVAL_DAYS: float = float(os.getenv("SRS_MAX_INTERVAL_DAYS", "365"))
+
+    # Adaptive pre-assessment (see app/services/pre_assessment.py): stops once the
+    # ability's standard error is at most the target, within the question limits
+    PRE_ASSESSMENT_TARGET_SE: float = float(os.getenv("PRE_ASSESSMENT_TARGET_SE", "0.5"))
+    PRE_ASSESSMENT_MIN_QUESTIONS: int = int(os.getenv("PRE_ASSESSMENT_MIN_QUESTIONS", "5"))
+    PRE_ASSESSMENT_MAX_QUESTIONS: int = int(os.getenv("PRE_ASSESSMENT_MAX_QUESTIONS", "20"))
+
+    # /analytics/insights (see app/services/insights.py)
+    INSIGHTS_CACHE_TTL_SECONDS: float = float(os.getenv("INSIGHTS_CACHE_TTL_SECONDS", "120"))
+    INSIGHTS_CACHE_MAX_ENTRIES: int = int(os.getenv("INSIGHTS_CACHE_MAX_ENTRIES", "1024"))
+
+    # get_current_user cache (see app/auth_cache.py); TTL 0 disables it
+    AUTH_CACHE_TTL_SECONDS: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "4096"))
+
+    # Response compression (see app/compression.py)
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "5"))
+    COMPRESSION_CACHE_ENTRIES: int = int(os.getenv("COMPRESSION_CACHE_ENTRIES", "256"))
+
     @property
     def database_url(self) -> str:
         return os.getenv("DATABASE_URL", "sqlite:///./studyahead.db")
@@ -31,4 +83,8 @@ class Settings:
     def upload_dir(self) -> str:
         return os.getenv("UPLOAD_DIR", "./uploads")
 
+    @property
+    def event_store_dir(self) -> str:
+        return os.getenv("EVENT_STORE_DIR", "./event_store")
+
 settings = Settings()
@@ -0,0 +1,362 @@
+"""
+Append-only segment store for study events.
+
+study_session_tracking keeps one wide row (plus indexes) per answered card,
+but long-range analytics only need seven narrow columns. The tracking buffer
+also appends every committed event here as a fixed-width packed record
+(RECORD_DTYPE, 26 bytes), one segment file per UTC day:
+
+    EVENT_STORE_DIR/events-20261019.seg
+
+Readers memory-map the segments (numpy.memmap, no parsing, no copying) and
+aggregate with vectorized numpy operations, so scanning hundreds of millions
+of events is bounded by disk bandwidth rather than ORM/row overhead.
+
+A segment is open while the live writer may still append to it: its day, plus
+EVENT_STORE_SEAL_HOURS for late client events. After that it is sealed.
+append() skips events of sealed days, and only sealed segments are ever
+replaced by rebuild_sealed(), so the writer and a rebuild never touch the same
+file. Skipped events (offline clients sending old timestamps) are in
+study_session_tracking but not in the store until export_event_store.py runs
+again; stats() counts them and tells whether a rebuild is due.
+
+Modes are stored as small integer codes; the code table lives in modes.json
+next to the segments and only ever grows.
+"""
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no cross-process locking on Windows
+    fcntl = None
+
+RECORD_DTYPE = np.dtype([
+    ("ts_ms", "<i8"),             # event time, Unix epoch milliseconds (UTC)
+    ("user_id", "<u4"),
+    ("plan_id", "<u4"),
+    ("flashcard_id", "<u4"),      # 0 = no card
+    ("response_time_ms", "<u4"),
+    ("mode", "u1"),               # code from modes.json
+    ("is_correct", "i1"),         # 1 / 0, -1 = unknown
+])
+
+GROUP_FIELDS = ("user_id", "plan_id", "flashcard_id", "mode", "day")
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _to_epoch_ms(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - _EPOCH).total_seconds() * 1000)
+
+def _segment_day(path: str) -> Optional[date]:
+    name = os.path.basename(path)
+    if not (name.startswith("events-") and name.endswith(".seg")):
+        return None
+    try:
+        return datetime.strptime(name[7:15], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+class EventStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._mode_codes: Optional[Dict[str, int]] = None
+        # Events append() skipped because their day was sealed (this process)
+        self.late_skipped = 0
+        self.last_late_at: Optional[datetime] = None
+
+    # --- mode code table ---
+
+    @property
+    def _modes_path(self) -> str:
+        return os.path.join(self.directory, "modes.json")
+
+    def _load_modes(self) -> Dict[str, int]:
+        if self._mode_codes is None:
+            try:
+                with open(self._modes_path) as f:
+                    self._mode_codes = json.load(f)
+            except FileNotFoundError:
+                self._mode_codes = {}
+        return self._mode_codes
+
+    def mode_code(self, mode: str) -> int:
+        codes = self._load_modes()
+        if mode in codes:
+            return codes[mode]
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._modes_path + ".lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            # Re-read under the lock: another process may have added modes
+            self._mode_codes = None
+            codes = self._load_modes()
+            if mode not in codes:
+                if len(codes) >= 255:
+                    raise ValueError("Event store supports at most 255 study modes")
+                codes[mode] = len(codes) + 1
+                tmp_path = self._modes_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(codes, f)
+                os.replace(tmp_path, self._modes_path)
+        return codes[mode]
+
+    def mode_names(self) -> Dict[int, str]:
+        self._mode_codes = None  # another process may have added modes
+        return {code: mode for mode, code in self._load_modes().items()}
+
+    # --- writing ---
+
+    def segment_path(self, day: date) -> str:
+        return os.path.join(self.directory, f"events-{day:%Y%m%d}.seg")
+
+    def first_open_day(self, now: Optional[datetime] = None) -> date:
+        """Oldest day whose segment the live writer may still append to; older segments are sealed."""
+        now = now or datetime.utcnow()
+        return (now - timedelta(hours=settings.EVENT_STORE_SEAL_HOURS)).date()
+
+    def sealed_segments(self, now: Optional[datetime] = None) -> List[str]:
+        first_open = self.first_open_day(now)
+        return [path for path in self.segments() if _segment_day(path) < first_open]
+
+    @staticmethod
+    def _by_day(records: np.ndarray) -> Iterator[tuple]:
+        days = (records["ts_ms"] // 86_400_000).astype("i8")
+        for day_number in np.unique(days):
+            yield date(1970, 1, 1) + timedelta(days=int(day_number)), records[days == day_number]
+
+    def pack(self, events: Iterable[Dict[str, Any]]) -> np.ndarray:
+        """Tracking event dicts (as buffered by app/tracking_buffer.py) -> packed records."""
+        events = list(events)
+        records = np.zeros(len(events), dtype=RECORD_DTYPE)
+        for i, event in enumerate(events):
+            is_correct = event.get("is_correct")
+            records[i] = (
+                _to_epoch_ms(event["created_at"]),
+                event["user_id"],
+                event["study_plan_id"],
+                event.get("flashcard_id") or 0,
+                max(event.get("response_time_ms") or 0, 0),
+                self.mode_code(event["mode"]),
+                -1 if is_correct is None else int(bool(is_correct)),
+            )
+        return records
+
+    def append(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Append events to their (open) day segments. Returns the number of records written."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            records = self.pack(events)
+            first_open = self.first_open_day()
+            written = 0
+            for day, chunk in self._by_day(records):
+                if day < first_open:
+                    # Sealed; the next rebuild picks it up from the table
+                    self.late_skipped += len(chunk)
+                    self.last_late_at = datetime.utcnow()
+                    continue
+                written += len(chunk)
+                with open(self.segment_path(day), "ab") as f:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_EX)
+                    try:
+                        f.write(chunk.tobytes())
+                        f.flush()
+                    finally:
+                        if fcntl is not None:
+                            fcntl.flock(f, fcntl.LOCK_UN)
+            return written
+
+    def rebuild_sealed(self, chunks: Iterable[Iterable[Dict[str, Any]]], now: Optional[datetime] = None) -> int:
+        """
+        Replace every sealed segment with the given events (chunks of tracking
+        event dicts, e.g. streamed from study_session_tracking). Events of open
+        days are skipped: those segments belong to the live writer. New segments
+        are staged next to the old ones and swapped in with os.replace, so
+        readers see either file, never a partial one; sealed segments without
+        events are removed. Returns the number of records written.
+        """
+        first_open = self.first_open_day(now)
+        os.makedirs(self.directory, exist_ok=True)
+        staged: Dict[date, str] = {}
+        written = 0
+        try:
+            for events in chunks:
+                for day, records in self._by_day(self.pack(events)):
+                    if day >= first_open:
+                        continue
+                    mode = "ab" if day in staged else "wb"  # "wb" drops leftovers of an interrupted rebuild
+                    staged.setdefault(day, self.segment_path(day) + ".rebuild")
+                    with open(staged[day], mode) as f:
+                        f.write(records.tobytes())
+                    written += len(records)
+            stale = [path for path in self.sealed_segments(now) if _segment_day(path) not in staged]
+            for day, path in staged.items():
+                os.replace(path, self.segment_path(day))
+        except BaseException:
+            for path in staged.values():
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        for path in stale:
+            os.remove(path)
+        self._write_rebuild_marker(now or datetime.utcnow(), first_open, written)
+        return written
+
+    @property
+    def _rebuild_marker_path(self) -> str:
+        return os.path.join(self.directory, "rebuilt.json")
+
+    def _write_rebuild_marker(self, at: datetime, sealed_until: date, records: int):
+        tmp_path = self._rebuild_marker_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"at": at.isoformat(), "sealed_until": sealed_until.isoformat(), "records": records}, f)
+        os.replace(tmp_path, self._rebuild_marker_path)
+
+    def last_rebuild(self) -> Optional[Dict[str, Any]]:
+        """Time, sealed-until day and record count of the last rebuild_sealed() (any process)."""
+        try:
+            with open(self._rebuild_marker_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    # --- reading ---
+
+    def segments(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        """Segment files overlapping [start, end), oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        paths = []
+        for name in sorted(os.listdir(self.directory)):
+            day = _segment_day(name)
+            if day is None:
+                continue
+            if start is not None and day < start.date():
+                continue
+            if end is not None and day > end.date():
+                continue
+            paths.append(os.path.join(self.directory, name))
+        return paths
+
+    def open_segment(self, path: str) -> np.ndarray:
+        """Read-only memory map of one segment (a torn trailing record is ignored)."""
+        count = os.path.getsize(path) // RECORD_DTYPE.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(count,))
+
+    def scan(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        user_id: Optional[int] = None,
+        plan_id: Optional[int] = None,
+        mode: Optional[str] = None,
+    ) -> Iterator[np.ndarray]:
+        """Yield the matching records segment by segment (views or filtered copies)."""
+        start_ms = _to_epoch_ms(start) if start is not None else None
+        end_ms = _to_epoch_ms(end) if end is not None else None
+        mode_code = self._load_modes().get(mode) if mode is not None else None
+        if mode is not None and mode_code is None:
+            return
+
+        for path in self.segments(start, end):
+            records = self.open_segment(path)
+            mask = None
+            for condition in (
+                records["ts_ms"] >= start_ms if start_ms is not None else None,
+                records["ts_ms"] < end_ms if end_ms is not None else None,
+                records["user_id"] == user_id if user_id is not None else None,
+                records["plan_id"] == plan_id if plan_id is not None else None,
+                records["mode"] == mode_code if mode_code is not None else None,
+            ):
+                if condition is not None:
+                    mask = condition if mask is None else mask & condition
+            yield records if mask is None else records[mask]
+
+    def load(self, **filters) -> np.ndarray:
+        """All matching records as one array (fine for a user/plan; prefer aggregate() for everything)."""
+        parts = [part for part in self.scan(**filters) if len(part)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=RECORD_DTYPE)
+
+    def aggregate(self, group_by: str, **filters) -> Dict[Any, Dict[str, float]]:
+        """
+        Per-group totals over the matching events, computed segment by segment
+        with np.unique/np.bincount: events, answered (known correctness),
+        correct, accuracy and mean response time. `group_by` is one of
+        GROUP_FIELDS; "day" groups by UTC date, "mode" returns mode names.
+        """
+        if group_by not in GROUP_FIELDS:
+            raise ValueError(f"group_by must be one of {GROUP_FIELDS}")
+
+        totals: Dict[Any, np.ndarray] = {}
+        for records in self.scan(**filters):
+            if len(records) == 0:
+                continue
+            keys = records["ts_ms"] // 86_400_000 if group_by == "day" else records[group_by]
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            answered = records["is_correct"] >= 0
+            sums = np.stack([
+                np.bincount(inverse, minlength=len(unique_keys)),
+                np.bincount(inverse, weights=answered, minlength=len(unique_keys)),
+                np.bincount(inverse, weights=records["is_correct"] == 1, minlength=len(unique_keys)),
+                np.bincount(inverse, weights=records["response_time_ms"], minlength=len(unique_keys)),
+            ], axis=1)
+            for key, row in zip(unique_keys.tolist(), sums):
+                totals[key] = totals[key] + row if key in totals else row.astype("f8")
+
+        mode_names = self.mode_names() if group_by == "mode" else {}
+        result = {}
+        for key, (events, answered, correct, response_time_total) in totals.items():
+            if group_by == "day":
+                key = date(1970, 1, 1) + timedelta(days=int(key))
+            elif group_by == "mode":
+                key = mode_names.get(key, str(key))
+            result[key] = {
+                "events": int(events),
+                "answered": int(answered),
+                "correct": int(correct),
+                "accuracy": float(correct / answered) if answered else None,
+                "avg_response_time_ms": float(response_time_total / events) if events else None,
+            }
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Late events skipped by this process and the last rebuild. A rebuild is
+        due when there never was one, or events were skipped after it: until
+        then they are missing from insights and the recall model refit.
+        """
+        last_rebuild = self.last_rebuild()
+        rebuild_due = last_rebuild is None or (
+            self.last_late_at is not None and self.last_late_at > datetime.fromisoformat(last_rebuild["at"])
+        )
+        return {
+            "late_skipped": self.late_skipped,
+            "last_late_at": self.last_late_at.isoformat() if self.last_late_at else None,
+            "last_rebuild": last_rebuild,
+            "rebuild_due": rebuild_due,
+        }
+
+    def disk_usage(self) -> Dict[str, int]:
+        paths = self.segments()
+        return {
+            "segments": len(paths),
+            "records": sum(os.path.getsize(path) // RECORD_DTYPE.itemsize for path in paths),
+            "bytes": sum(os.path.getsize(path) for path in paths),
+        }
+
+
+event_store = EventStore(settings.event_store_dir)
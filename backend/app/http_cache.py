@@ -0,0 +1,72 @@
+"""
+Conditional GET support for deck content endpoints.
+
+Deck payloads are versioned by StudyPlan.content_version, so an ETag can be
+computed from one indexed lookup on study_plans and a matching If-None-Match
+is answered with 304 before any flashcard/MCQ/sentence row is read.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from app.models import StudyPlan
+from app.serialization import add_vary, wants_msgpack
+
+def plan_content_etag(plan_id: int, content_version: int, representation: str) -> str:
+    """Strong ETag for one representation of a plan's deck content."""
+    return f'"{representation}-{plan_id}-{content_version}"'
+
+def negotiated_representation(request: Request, representation: str) -> str:
+    """JSON and MessagePack encodings of the same deck need different strong ETags."""
+    return f"{representation}.msgpack" if wants_msgpack(request) else representation
+
+def cache_headers(etag: str) -> dict:
+    # no-cache: clients may store the deck but must revalidate with If-None-Match
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept"}
+
+def set_cache_headers(response: Response, etag: str):
+    """cache_headers() on an existing response, adding to its Vary rather than replacing it."""
+    for name, value in cache_headers(etag).items():
+        if name == "Vary":
+            add_vary(response.headers, value)
+        else:
+            response.headers[name] = value
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison (RFC 9110): compressed responses carry W/"..." validators
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def get_plan_content_version(db: Session, plan_id: int, user_id: int) -> int:
+    """Ownership check and version read in one query; 404 if the plan isn't the user's."""
+    row = db.query(StudyPlan.content_version).filter(
+        StudyPlan.id == plan_id,
+        StudyPlan.user_id == user_id
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Study plan not found")
+    return row[0] or 0
+
+def conditional_plan_response(
+    request: Request,
+    response: Response,
+    db: Session,
+    plan_id: int,
+    user_id: int,
+    representation: str
+) -> Optional[Response]:
+    """
+    Returns a 304 Response when the client already holds the current version.
+    Otherwise sets ETag/Cache-Control on `response` and returns None so the
+    endpoint builds the full payload.
+    """
+    version = get_plan_content_version(db, plan_id, user_id)
+    etag = plan_content_etag(plan_id, version, negotiated_representation(request, representation))
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    set_cache_headers(response, etag)
+    return None
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, JSON, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, Boolean, ForeignKey, JSON, Index, LargeBinary, Enum as SQLEnum
+from sqlalchemy import event, update, select, case, inspect, or_
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
@@ -82,6 +83,9 @@ class User(Base):
 
 class StudyPlan(Base):
     __tablename__ = "study_plans"
+    __table_args__ = (
+        Index("ix_study_plans_user_status", "user_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -106,23 +110,25 @@ class StudyPlan(Base):
     tasks_total_static = Column("tasks_total", Integer, default=0)
     tasks_completed_static = Column("tasks_completed", Integer, default=0)
     
+    # Bumped on every flashcard/MCQ/sentence/summary write; drives deck ETags
+    content_version = Column(Integer, default=1, server_default="1", nullable=False)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Progress counters are maintained in SQL by the Task flush events at the
+    # bottom of this module, so reading them never loads the task rows.
     @property
     def tasks_total(self):
-        return len(self.tasks)
+        return self.tasks_total_static or 0
 
     @property
     def tasks_completed(self):
-        return len([t for t in self.tasks if t.completion_status])
+        return self.tasks_completed_static or 0
 
     @property
     def progress_percentage(self):
-        total = self.tasks_total
-        if total == 0:
-            return 0.0
-        return (self.tasks_completed / total) * 100
+        return self.progress_percentage_static or 0.0
 
     user = relationship("User", back_populates="study_plans")
     material_summary = relationship("MaterialSummary", back_populates="study_plan", uselist=False, cascade="all, delete-orphan")
@@ -153,9 +159,13 @@ class MaterialSummary(Base):
 
 class Flashcard(Base):
     __tablename__ = "flashcards"
+    __table_args__ = (
+        # Due-card queue: plan -> due_at range scan
+        Index("ix_flashcards_plan_due", "study_plan_id", "due_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    study_plan_id = Column(Integer, ForeignKey("study_plans.id"), nullable=False)
+    study_plan_id = Column(Integer, ForeignKey("study_plans.id"), nullable=False, index=True)
     material_summary_id = Column(Integer, ForeignKey("material_summaries.id"), nullable=True)
     
     front_text = Column(Text, nullable=False)
@@ -166,6 +176,20 @@ class Flashcard(Base):
     times_studied = Column(Integer, default=0)
     last_studied = Column(DateTime(timezone=True), nullable=True)
     
+    # Forgetting curve, refitted in batch by app/services/recall_model.py
+    half_life_hours = Column(Float, nullable=True)
+    recall_probability = Column(Float, nullable=True)  # At recall_updated_at
+    next_review_at = Column(DateTime, nullable=True)  # UTC; recall reaches RECALL_TARGET
+    recall_updated_at = Column(DateTime, nullable=True)
+    
+    # Spaced repetition state, updated on every graded review (app/services/srs.py)
+    srs_stability = Column(Float, nullable=True)  # Days until recall falls to 90%
+    srs_difficulty = Column(Float, nullable=True)  # 1 (easy) - 10 (hard)
+    srs_reps = Column(Integer, default=0)
+    srs_lapses = Column(Integer, default=0)
+    srs_last_review_at = Column(DateTime, nullable=True)  # UTC
+    due_at = Column(DateTime, nullable=True)  # UTC; NULL = never reviewed
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -178,7 +202,7 @@ class VocabularySentence(Base):
     __tablename__ = "vocabulary_sentences"
     
     id = Column(Integer, primary_key=True, index=True)
-    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False, index=True)
     sentence_text = Column(Text, nullable=False)
     highlighted_words = Column(JSON, nullable=True)  # Array of {word, start_index, end_index}
     
@@ -190,7 +214,7 @@ class MCQQuestion(Base):
     __tablename__ = "mcq_questions"
     
     id = Column(Integer, primary_key=True, index=True)
-    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False, index=True)
     question_text = Column(Text, nullable=False)
     options = Column(JSON, nullable=False)  # Array of 4 strings
     correct_answer_index = Column(Integer, nullable=False)  # 0-3
@@ -203,6 +227,10 @@ class MCQQuestion(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # /tasks/today and the dashboard: plan -> day -> open tasks
+        Index("ix_tasks_plan_scheduled_status", "study_plan_id", "scheduled_date", "completion_status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     study_plan_id = Column(Integer, ForeignKey("study_plans.id"), nullable=False)
@@ -219,7 +247,8 @@ class Task(Base):
     rationale = Column(Text, nullable=True)
     
     completion_status = Column(Boolean, default=False)
-    scheduled_date = Column(DateTime(timezone=True), nullable=True)
+    scheduled_date = Column(DateTime(timezone=True), nullable=True)  # Day shown; UserScheduler may move it later
+    planned_date = Column(DateTime(timezone=True), nullable=True)  # Day the plan's schedule put it on
     completed_at = Column(DateTime(timezone=True), nullable=True)
     order = Column(Integer, default=0)
     
@@ -229,6 +258,9 @@ class Task(Base):
 
 class TestResult(Base):
     __tablename__ = "test_results"
+    __table_args__ = (
+        Index("ix_test_results_plan_created", "study_plan_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     study_plan_id = Column(Integer, ForeignKey("study_plans.id"), nullable=False)
@@ -247,11 +279,18 @@ class TestResult(Base):
     study_plan = relationship("StudyPlan", back_populates="test_results")
 
 class StudySession(Base):
+    """One row per user per UTC day (the activity calendar); see app/services/study_activity.py."""
     __tablename__ = "study_sessions"
+    __table_args__ = (
+        Index("ix_study_sessions_user_date", "user_id", "date"),
+        # Day lookups and heatmap range scans
+        Index("ux_study_sessions_user_day", "user_id", "day", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(DateTime(timezone=True), server_default=func.now())
+    day = Column(Date, nullable=True)  # UTC day the row counts for
     
     tasks_available = Column(Integer, default=0)
     tasks_completed = Column(Integer, default=0)
@@ -297,12 +336,16 @@ class PreAssessment(Base):
     __tablename__ = "pre_assessments"
     
     id = Column(Integer, primary_key=True, index=True)
-    study_plan_id = Column(Integer, ForeignKey("study_plans.id"), nullable=False)
+    study_plan_id = Column(Integer, ForeignKey("study_plans.id"), nullable=False, index=True)
     
     status = Column(String, default="pending") # pending, completed
     total_questions = Column(Integer, default=0)
     correct_score = Column(Float, default=0.0)
     
+    # Adaptive pre-assessment (app/services/pre_assessment.py): current ability and its standard error
+    ability_estimate = Column(Float, nullable=True)
+    ability_se = Column(Float, nullable=True)
+    
     # Store the generated questions snapshot
     questions_data = Column(JSON, nullable=True)
     
@@ -316,7 +359,7 @@ class PreAssessmentResponse(Base):
     __tablename__ = "pre_assessment_responses"
     
     id = Column(Integer, primary_key=True, index=True)
-    pre_assessment_id = Column(Integer, ForeignKey("pre_assessments.id"), nullable=False)
+    pre_assessment_id = Column(Integer, ForeignKey("pre_assessments.id"), nullable=False, index=True)
     flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False)
     
     is_correct = Column(Boolean, nullable=False)
@@ -329,8 +372,84 @@ class PreAssessmentResponse(Base):
     pre_assessment = relationship("PreAssessment", back_populates="responses")
     flashcard = relationship("Flashcard")
 
+class ItemCalibration(Base):
+    """
+    Card difficulty model for the adaptive pre-assessment, fitted offline on all
+    pre-assessment answers (see app/services/item_response.py). The newest row is used.
+    """
+    __tablename__ = "item_calibrations"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    responses = Column(Integer, nullable=False)
+    assessments = Column(Integer, nullable=False)
+    weights = Column(JSON, nullable=False)  # One per item_response.FEATURES
+    log_loss = Column(Float, nullable=True)
+    baseline_log_loss = Column(Float, nullable=True)  # Overall accuracy alone
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class LearningStat(Base):
+    """
+    Streaming performance statistics for one user in one scope, updated in O(1)
+    per tracking event (see app/services/learning_stats.py).
+    scope/key: ("global", "all"), ("category", "vocabulary"), ("mode", "quiz"), ...
+    """
+    __tablename__ = "learning_stats"
+    __table_args__ = (
+        Index("ux_learning_stats_user_scope_key", "user_id", "scope", "key", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    scope = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    
+    events = Column(Integer, default=0)  # Lifetime count
+    # Exponentially decayed sums; accuracy = decayed_correct / decayed_weight
+    decayed_weight = Column(Float, default=0.0)
+    decayed_correct = Column(Float, default=0.0)
+    response_time_ewma = Column(Float, nullable=True)  # ms
+    response_time_histogram = Column(JSON, default=list)  # Decayed counts per log-scale bucket
+    
+    last_event_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class StudyStreak(Base):
+    """
+    Streak state per user, advanced whenever one of their days completes
+    (see app/services/study_activity.py), so reading it never scans history.
+    """
+    __tablename__ = "study_streaks"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    current_streak = Column(Integer, default=0, nullable=False)  # Ending on last_active_day
+    longest_streak = Column(Integer, default=0, nullable=False)
+    last_active_day = Column(Date, nullable=True)  # Last completed UTC day
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class DashboardSnapshot(Base):
+    """
+    Materialized /analytics/dashboard response for one user (see
+    app/services/dashboard.py). Writes that change what the dashboard shows
+    mark it stale through the flush events at the bottom of this module.
+    """
+    __tablename__ = "dashboard_snapshots"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    payload = Column(LargeBinary, nullable=True)  # Serialized DashboardStats (compact JSON)
+    version = Column(Integer, default=0, nullable=False)  # Bumped by every invalidation
+    stale = Column(Boolean, default=True, nullable=False)
+    valid_until = Column(DateTime, nullable=True)  # UTC; next midnight or the next exam date
+    computed_at = Column(DateTime(timezone=True), nullable=True)
+
 class StudySessionTracking(Base):
     __tablename__ = "study_session_tracking"
+    __table_args__ = (
+        # AnalyticsService reads a user's history newest-first
+        Index("ix_study_session_tracking_user_created", "user_id", "created_at"),
+        # Idempotency for /tracking/log-batch retries
+        Index("ux_study_session_tracking_user_event", "user_id", "client_event_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -342,10 +461,250 @@ class StudySessionTracking(Base):
     is_correct = Column(Boolean, nullable=True)
     response_time_ms = Column(Integer, nullable=True)
     attempts_needed = Column(Integer, default=1)
+    client_event_id = Column(String, nullable=True)  # Client-generated id, dedupes retried batches
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())  # Client timestamp when sent in a batch
     
     user = relationship("User")
     study_plan = relationship("StudyPlan")
     flashcard = relationship("Flashcard")
 
+
+# --- Plan progress counters -------------------------------------------------
+# StudyPlan.tasks_total / tasks_completed / progress_percentage are denormalized.
+# ORM inserts, deletes and completion changes of Tasks are summed per plan
+# during a flush and applied with one relative UPDATE per plan at its end, in
+# the same transaction. Bulk Query.delete() bypasses these events; callers
+# follow it with PlanProgressService.recount().
+
+_COUNTER_ATTRS = ["tasks_total_static", "tasks_completed_static", "progress_percentage_static"]
+
+def _progress_expr(total, completed):
+    return case((total > 0, completed * 100.0 / total), else_=0.0)
+
+def _bump_plan_counters(connection, study_plan_id, total_delta, completed_delta):
+    plans = StudyPlan.__table__
+    total = func.coalesce(plans.c.tasks_total, 0) + total_delta
+    completed = func.coalesce(plans.c.tasks_completed, 0) + completed_delta
+    connection.execute(
+        update(plans)
+        .where(plans.c.id == study_plan_id)
+        .values(tasks_total=total, tasks_completed=completed, progress_percentage=_progress_expr(total, completed))
+    )
+
+def recount_plan_counters(connection, study_plan_id):
+    """Recompute a plan's counters from its task rows."""
+    plans = StudyPlan.__table__
+    tasks = Task.__table__
+    total = (
+        select(func.count(tasks.c.id))
+        .where(tasks.c.study_plan_id == study_plan_id)
+        .scalar_subquery()
+    )
+    completed = (
+        select(func.count(tasks.c.id))
+        .where(tasks.c.study_plan_id == study_plan_id, tasks.c.completion_status == True)
+        .scalar_subquery()
+    )
+    connection.execute(
+        update(plans)
+        .where(plans.c.id == study_plan_id)
+        .values(tasks_total=total, tasks_completed=completed, progress_percentage=_progress_expr(total, completed))
+    )
+
+def _pending_counter_changes(target):
+    session = Session.object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault("plan_counter_changes", {"deltas": {}, "recount": set()})
+
+def _add_counter_delta(target, total_delta, completed_delta):
+    changes = _pending_counter_changes(target)
+    if changes is None:
+        return
+    delta = changes["deltas"].setdefault(target.study_plan_id, [0, 0])
+    delta[0] += total_delta
+    delta[1] += completed_delta
+
+@event.listens_for(Task, "after_insert")
+def _task_inserted(mapper, connection, target):
+    _add_counter_delta(target, 1, 1 if target.completion_status else 0)
+
+@event.listens_for(Task, "after_delete")
+def _task_deleted(mapper, connection, target):
+    _add_counter_delta(target, -1, -1 if target.completion_status else 0)
+
+@event.listens_for(Task, "after_update")
+def _task_updated(mapper, connection, target):
+    history = inspect(target).attrs.completion_status.history
+    if not history.has_changes():
+        return
+    if not history.deleted:
+        # Previous value was never loaded, so a relative update could double count
+        changes = _pending_counter_changes(target)
+        if changes is not None:
+            changes["recount"].add(target.study_plan_id)
+        return
+    was_completed = bool(history.deleted[0])
+    is_completed = bool(target.completion_status)
+    if was_completed != is_completed:
+        _add_counter_delta(target, 0, 1 if is_completed else -1)
+
+@event.listens_for(Session, "after_flush")
+def _write_plan_counters(session, flush_context):
+    """One UPDATE per touched plan per flush, however many of its tasks changed."""
+    changes = session.info.pop("plan_counter_changes", None)
+    if not changes:
+        return
+    connection = session.connection()
+    for plan_id in changes["recount"]:
+        recount_plan_counters(connection, plan_id)
+    for plan_id, (total_delta, completed_delta) in changes["deltas"].items():
+        if plan_id not in changes["recount"] and (total_delta or completed_delta):
+            _bump_plan_counters(connection, plan_id, total_delta, completed_delta)
+    session.info.setdefault("touched_plan_ids", set()).update(changes["recount"], changes["deltas"])
+
+@event.listens_for(Session, "after_flush_postexec")
+def _expire_touched_plan_counters(session, flush_context):
+    """Make in-session StudyPlan objects re-read the counters the events just changed."""
+    plan_ids = session.info.pop("touched_plan_ids", None)
+    if not plan_ids:
+        return
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, StudyPlan) and obj.id in plan_ids:
+            session.expire(obj, _COUNTER_ATTRS)
+
+
+# --- Deck content version ----------------------------------------------------
+# Any write to a plan's cards, MCQs, sentences or material summary bumps
+# StudyPlan.content_version once per flush, so deck endpoints can answer
+# If-None-Match with a single indexed lookup. Study progress on a card
+# (mastery, times studied, SRS state) is not deck content and doesn't count.
+
+_FLASHCARD_CONTENT_ATTRS = ("front_text", "back_text", "difficulty", "material_summary_id", "study_plan_id")
+
+def _pending_content_changes(target):
+    session = Session.object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault("content_changes", {"plans": set(), "flashcards": set()})
+
+def _record_plan_content_change(mapper, connection, target):
+    changes = _pending_content_changes(target)
+    if changes is not None:
+        changes["plans"].add(target.study_plan_id)
+
+def _record_flashcard_content_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _FLASHCARD_CONTENT_ATTRS):
+        _record_plan_content_change(mapper, connection, target)
+
+def _record_card_content_change(mapper, connection, target):
+    changes = _pending_content_changes(target)
+    if changes is not None:
+        changes["flashcards"].add(target.flashcard_id)
+
+for _model, _listener, _update_listener in (
+    (Flashcard, _record_plan_content_change, _record_flashcard_content_update),
+    (MaterialSummary, _record_plan_content_change, _record_plan_content_change),
+    (MCQQuestion, _record_card_content_change, _record_card_content_change),
+    (VocabularySentence, _record_card_content_change, _record_card_content_change),
+):
+    event.listen(_model, "after_insert", _listener)
+    event.listen(_model, "after_update", _update_listener)
+    event.listen(_model, "after_delete", _listener)
+
+def bump_content_version(connection, plan_ids=(), flashcard_ids=()):
+    """Increment content_version for the given plans and the plans owning the given cards."""
+    plans = StudyPlan.__table__
+    conditions = []
+    if plan_ids:
+        conditions.append(plans.c.id.in_(list(plan_ids)))
+    if flashcard_ids:
+        cards = Flashcard.__table__
+        conditions.append(plans.c.id.in_(
+            select(cards.c.study_plan_id).where(cards.c.id.in_(list(flashcard_ids)))
+        ))
+    if not conditions:
+        return
+    connection.execute(
+        update(plans)
+        .where(or_(*conditions))
+        .values(content_version=func.coalesce(plans.c.content_version, 0) + 1)
+    )
+
+@event.listens_for(Session, "after_flush")
+def _bump_content_versions(session, flush_context):
+    changes = session.info.pop("content_changes", None)
+    if not changes or not (changes["plans"] or changes["flashcards"]):
+        return
+    bump_content_version(session.connection(), changes["plans"], changes["flashcards"])
+    session.info["content_version_bumped"] = True
+
+@event.listens_for(Session, "after_flush_postexec")
+def _expire_content_versions(session, flush_context):
+    if not session.info.pop("content_version_bumped", False):
+        return
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, StudyPlan):
+            session.expire(obj, ["content_version"])
+
+
+# --- Dashboard snapshots -----------------------------------------------------
+# Inserts, updates and deletes of the rows the dashboard is built from mark the
+# owner's DashboardSnapshot stale once per flush. Bulk Query.delete()/update()
+# skips these events; PlanProgressService.recount() covers the task paths.
+
+def _pending_dashboard_changes(target):
+    session = Session.object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault("dashboard_changes", {"users": set(), "plans": set()})
+
+def _record_user_dashboard_change(mapper, connection, target):
+    changes = _pending_dashboard_changes(target)
+    if changes is not None:
+        changes["users"].add(target.user_id)
+
+def _record_plan_dashboard_change(mapper, connection, target):
+    changes = _pending_dashboard_changes(target)
+    if changes is not None:
+        changes["plans"].add(target.study_plan_id)
+
+for _model, _listener in (
+    (StudyPlan, _record_user_dashboard_change),
+    (StudySession, _record_user_dashboard_change),
+    (StudyStreak, _record_user_dashboard_change),
+    (UserLearningProfile, _record_user_dashboard_change),
+    (Task, _record_plan_dashboard_change),
+    (TestResult, _record_plan_dashboard_change),
+    (PreAssessment, _record_plan_dashboard_change),
+):
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _listener)
+
+def invalidate_dashboards(connection, user_ids=(), plan_ids=()):
+    """Mark the dashboard snapshots of the given users and of the owners of the given plans stale."""
+    snapshots = DashboardSnapshot.__table__
+    conditions = []
+    if user_ids:
+        conditions.append(snapshots.c.user_id.in_(list(user_ids)))
+    if plan_ids:
+        plans = StudyPlan.__table__
+        conditions.append(snapshots.c.user_id.in_(
+            select(plans.c.user_id).where(plans.c.id.in_(list(plan_ids)))
+        ))
+    if not conditions:
+        return
+    connection.execute(
+        update(snapshots)
+        .where(or_(*conditions))
+        .values(stale=True, version=snapshots.c.version + 1)
+    )
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_dashboards(session, flush_context):
+    changes = session.info.pop("dashboard_changes", None)
+    if not changes or not (changes["users"] or changes["plans"]):
+        return
+    invalidate_dashboards(session.connection(), changes["users"], changes["plans"])
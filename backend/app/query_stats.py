@@ -0,0 +1,135 @@
+"""
+Per-request SQL instrumentation.
+
+Counts and times every statement executed on the engine, groups them by
+statement shape and flags shapes repeated often enough to look like an N+1.
+QueryStatsMiddleware reports the totals in X-Query-Count / X-Query-Time-Ms
+response headers; count_queries() / assert_max_queries() do the same for
+scripts and tests.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger("studyahead.query_stats")
+
+_IN_LIST = re.compile(r"IN \((?:[^()]*)\)", re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so repeated lookups with different ids compare equal."""
+    shape = _IN_LIST.sub("IN (...)", statement)
+    shape = _LITERAL.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold: Optional[int] = None):
+        """Statement shapes executed at least `threshold` times (likely N+1 loops)."""
+        threshold = threshold or settings.N_PLUS_ONE_THRESHOLD
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start_time")
+    started = starts.pop() if starts else time.perf_counter()
+    stats.record(statement, (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def count_queries():
+    """Collect QueryStats for the statements run inside the block."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+@contextmanager
+def assert_max_queries(budget: int, allow_repeats: bool = False):
+    """Fail (QueryBudgetExceeded) if the block runs more than `budget` statements or an N+1 pattern."""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > budget:
+        raise QueryBudgetExceeded(f"{stats.count} queries executed, budget is {budget}")
+    repeated = stats.repeated_shapes()
+    if repeated and not allow_repeats:
+        shape, n = repeated[0]
+        raise QueryBudgetExceeded(f"N+1 pattern: statement executed {n} times: {shape[:200]}")
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that measures the SQL of each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(stats.count).encode()))
+                headers.append((b"x-query-time-ms", f"{stats.total_ms:.1f}".encode()))
+                message["headers"] = headers
+                self._report(scope, stats)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+
+    def _report(self, scope, stats: QueryStats):
+        route = f"{scope.get('method')} {scope.get('path')}"
+        for shape, n in stats.repeated_shapes():
+            logger.warning("Possible N+1 on %s: %d x %s", route, n, shape[:200])
+        budget = settings.QUERY_BUDGET
+        if budget and stats.count > budget:
+            logger.warning("%s ran %d queries (budget %d)", route, stats.count, budget)
@@ -3,7 +3,9 @@ from sqlalchemy.orm import Session
 from datetime import timedelta
 from app.database import get_db
 from app.models import User
-from app.auth import verify_password, get_password_hash, create_access_token
+from app.auth import (
+    verify_password_async, get_password_hash_async, password_needs_rehash, create_access_token
+)
 from app.config import settings
 from app.schemas import UserCreate, UserResponse, Token, LoginRequest
 
@@ -12,15 +14,17 @@ router = APIRouter()
 @router.post("/register", response_model=UserResponse)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # Check if user exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = db.query(User.id).filter(User.email == user_data.email).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
+    # Give the connection back to the pool while bcrypt runs
+    db.close()
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -35,14 +39,23 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=Token)
 async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == credentials.email).first()
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    user = db.query(User.id, User.hashed_password).filter(User.email == credentials.email).first()
+    # Give the connection back to the pool while bcrypt runs; otherwise a burst of
+    # logins larger than the pool waits for connections on the event loop
+    db.close()
+    if not user or not await verify_password_async(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Transparently upgrade hashes made with an older cost factor
+    if password_needs_rehash(user.hashed_password):
+        new_hash = await get_password_hash_async(credentials.password)
+        db.query(User).filter(User.id == user.id).update({User.hashed_password: new_hash})
+        db.commit()
+    
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
@@ -1,30 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User, StudyPlan, Flashcard, VocabularySentence, MCQQuestion, MaterialCategory
-from app.schemas import FlashcardCreate, FlashcardResponse, FlashcardUpdate
+from app.schemas import FlashcardContent, FlashcardCreate, FlashcardResponse, FlashcardUpdate, MasteryBatchUpdate
 from app.ai_service import ai_service
+from app.http_cache import conditional_plan_response
+from app.serialization import flashcard_rows, serialized_response
+from app.services.mastery import MasteryService
 
 router = APIRouter()
 
-@router.get("/study-plan/{plan_id}", response_model=List[FlashcardResponse])
+@router.get("/study-plan/{plan_id}", response_model=List[FlashcardContent])
 async def get_flashcards(
     plan_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all flashcards for a study plan."""
-    plan = db.query(StudyPlan).filter(
-        StudyPlan.id == plan_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
-    
-    if not plan:
-        raise HTTPException(status_code=404, detail="Study plan not found")
+    """Get all flashcards for a study plan (progress is at /study-plans/{id}/progress)."""
+    not_modified = conditional_plan_response(request, response, db, plan_id, current_user.id, "flashcards")
+    if not_modified:
+        return not_modified
     
-    return plan.flashcards
+    return serialized_response(request, flashcard_rows(db, plan_id), response)
 
 @router.post("/study-plan/{plan_id}", response_model=FlashcardResponse)
 async def create_flashcard(
@@ -294,37 +295,43 @@ async def update_flashcard_mastery(
     db: Session = Depends(get_db)
 ):
     """Update flashcard mastery level after study session."""
-    flashcard = db.query(Flashcard).join(StudyPlan).filter(
-        Flashcard.id == flashcard_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
+    written = MasteryService(db).set_user_mastery(current_user.id, {flashcard_id: mastery_level}, studied=True)
     
-    if not flashcard:
+    if not written:
         raise HTTPException(status_code=404, detail="Flashcard not found")
     
-    flashcard.mastery_level = max(0, min(100, mastery_level))
-    flashcard.times_studied += 1
-    from datetime import datetime
-    flashcard.last_studied = datetime.utcnow()
-    
     db.commit()
     return {"message": "Mastery updated"}
 
+@router.post("/update-mastery")
+async def update_flashcard_mastery_batch(
+    batch: MasteryBatchUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Update the mastery of many flashcards after a study session or test, in
+    one statement. Cards that aren't the user's are skipped.
+    """
+    levels = {update.flashcard_id: update.mastery_level for update in batch.updates}
+    written = MasteryService(db).set_user_mastery(current_user.id, levels, studied=True)
+    
+    db.commit()
+    return {"message": "Mastery updated", "updated": len(written)}
+
 @router.get("/study-plan/{plan_id}/sentences")
 async def get_study_plan_sentences(
     plan_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all vocabulary sentences for a study plan."""
-    # Verify plan ownership
-    plan = db.query(StudyPlan).filter(
-        StudyPlan.id == plan_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
-    
-    if not plan:
-        raise HTTPException(status_code=404, detail="Study plan not found")
+    # Verify plan ownership (and answer 304 if the client's copy is current)
+    not_modified = conditional_plan_response(request, response, db, plan_id, current_user.id, "sentences")
+    if not_modified:
+        return not_modified
         
     # Get all sentences for flashcards in this plan
     sentences = db.query(VocabularySentence).join(Flashcard).filter(
@@ -446,6 +453,7 @@ async def generate_mock_content(
             day_number=1,
             rationale="Pre-assessment to determine your current vocabulary level and adapt the study plan accordingly.",
             scheduled_date=today,
+            planned_date=today,
             order=0,
             completion_status=False
         )
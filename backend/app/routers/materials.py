@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import asyncio
 import os
 from pathlib import Path
 import pdfplumber
@@ -14,8 +15,10 @@ from app.models import (
     VocabularySentence, Task, TaskType, StudyMode
 )
 from app.schemas import MaterialUpload, MaterialSummaryResponse
-from app.ai_service import ai_service
+from app.ai_service import ai_service, encode_image_for_vision
 from app.config import settings
+from app.workers import run_cpu, run_io
+from app.http_cache import conditional_plan_response
 
 router = APIRouter()
 
@@ -25,15 +28,171 @@ pillow_heif.register_heif_opener()
 UPLOAD_DIR = Path(settings.upload_dir)
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+def extract_pdf_text(file_path: str) -> str:
+    """Extract text from a PDF. Runs in the CPU process pool."""
+    with pdfplumber.open(file_path) as pdf:
+        return "\n".join([page.extract_text() for page in pdf.pages if page.extract_text()])
+
+def _load_plan_languages(study_plan_id: int):
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
+        if not plan:
+            return None
+        return plan.question_language or "English", plan.answer_language or "English"
+
+def _set_plan_status(study_plan_id: int, status: StudyPlanStatus, error_type: Optional[str] = None):
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
+        if plan:
+            plan.status = status
+            if error_type:
+                plan.error_type = error_type
+            db.commit()
+
+def _save_material_summary(study_plan_id: int, category: str, analysis: dict, detected_languages: list) -> int:
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        # Check if summary already exists (for idempotency)
+        existing_summary = db.query(MaterialSummary).filter(
+            MaterialSummary.study_plan_id == study_plan_id
+        ).first()
+        
+        if existing_summary:
+            print(f"  Material summary already exists for plan {study_plan_id}, reusing it")
+            summary_id = existing_summary.id
+        else:
+            summary = MaterialSummary(
+                study_plan_id=study_plan_id,
+                category=MaterialCategory(category),
+                title=analysis.get("title", "Study Material"),
+                main_topics=analysis.get("main_topics", []),
+                learning_goals=analysis.get("learning_goals", []),
+                difficulty_assessment=analysis.get("difficulty_assessment", "medium"),
+                recommended_study_approach=analysis.get("recommended_study_approach", ""),
+                checklist_items=analysis.get("checklist_items", [])
+            )
+            db.add(summary)
+            db.commit()
+            db.refresh(summary)
+            summary_id = summary.id
+            print(f"  Created material summary with ID: {summary_id}")
+        
+        # Update plan category and detected languages
+        plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
+        if plan:
+            plan.category = MaterialCategory(category)
+            if detected_languages:
+                plan.detected_languages = detected_languages
+            db.commit()
+        return summary_id
+
+def _count_flashcards(study_plan_id: int) -> int:
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        return db.query(Flashcard).filter(Flashcard.study_plan_id == study_plan_id).count()
+
+def _save_flashcard_content(study_plan_id: int, card_data: dict, mcqs: list, sentences: list):
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        flashcard = Flashcard(
+            study_plan_id=study_plan_id,
+            front_text=card_data["front"],
+            back_text=card_data["back"],
+            difficulty=card_data.get("difficulty", "medium")
+        )
+        db.add(flashcard)
+        db.flush()
+        
+        for mcq_data in mcqs[:3]:  # Limit to 3 MCQs
+            db.add(MCQQuestion(
+                flashcard_id=flashcard.id,
+                question_text=mcq_data.get("question_text", ""),
+                options=mcq_data.get("options", []),
+                correct_answer_index=mcq_data.get("correct_answer_index", 0),
+                question_type=mcq_data.get("question_type", "standard"),
+                rationale=mcq_data.get("rationale", "")
+            ))
+        
+        for sent_data in sentences[:5]:  # Limit to 5 sentences
+            db.add(VocabularySentence(
+                flashcard_id=flashcard.id,
+                sentence_text=sent_data.get("sentence_text", ""),
+                highlighted_words=sent_data.get("highlighted_words", [])
+            ))
+        
+        db.commit()
+
+def _generate_pre_assessment(study_plan_id: int):
+    from app.database import SessionLocal
+    from app.services.pre_assessment import PreAssessmentService
+    with SessionLocal() as db:
+        PreAssessmentService(db).generate_pre_assessment(study_plan_id)
+
+def _finalize_plan_status(study_plan_id: int, success: bool, flashcard_count: int):
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
+        if not plan:
+            print(f"  ERROR: Plan {study_plan_id} not found for final status update")
+            return
+        
+        if success and flashcard_count > 0:
+            # Auto-activate
+            plan.status = StudyPlanStatus.ACTIVE
+            
+            # Only create pre-assessment for FULL plans (with exam date)
+            if plan.plan_mode == "full" or plan.plan_mode is None:
+                # Create pre-assessment test task for day 1
+                from datetime import timezone, datetime
+                today = datetime.now(timezone.utc).date()
+                
+                # Check if task already exists
+                existing_task = db.query(Task).filter(
+                    Task.study_plan_id == study_plan_id,
+                    Task.title == "Pre-Assessment Test"
+                ).first()
+                
+                if not existing_task:
+                    pre_assessment_task = Task(
+                        study_plan_id=study_plan_id,
+                        title="Pre-Assessment Test",
+                        description="Take this test to assess your current level with the vocabulary. This will help us create a personalized study schedule.",
+                        type=TaskType.COMPREHENSIVE_TEST,
+                        mode=StudyMode.SHORT_TEST,
+                        estimated_minutes=30,
+                        day_number=1,
+                        rationale="Pre-assessment to determine your current vocabulary level and adapt the study plan accordingly.",
+                        scheduled_date=today,
+                        planned_date=today,
+                        order=0,
+                        completion_status=False
+                    )
+                    db.add(pre_assessment_task)
+                
+                print(f"  Status updated to ACTIVE and pre-assessment task created")
+            else:
+                # Simple plan - no pre-assessment or schedule
+                print(f"  Status updated to ACTIVE (simple plan - no pre-assessment created)")
+        else:
+            # Fallback to awaiting approval if error (so user can retry or see summary)
+            plan.status = StudyPlanStatus.AWAITING_APPROVAL
+            print(f"  Status updated to AWAITING_APPROVAL (processing failed or zero flashcards)")
+
+        db.commit()
+
 async def process_materials_background(
     study_plan_id: int,
     user_id: int,
     text_content: Optional[str] = None,
     file_paths: Optional[List[str]] = None
 ):
-    """Background task to process materials and generate flashcards."""
-    from app.database import SessionLocal
+    """Background task to process materials and generate flashcards.
     
+    Only orchestration runs on the event loop: PDF parsing and image decoding go to
+    the CPU process pool, AI calls and DB sessions to the bounded I/O thread pool.
+    """
     # Initialize variables before try block to avoid UnboundLocalError
     success = False
     flashcard_count = 0
@@ -41,15 +200,11 @@ async def process_materials_background(
     
     # 1. Initial Check & Setup (Quick DB op)
     print(f"[STEP 1/7] Starting material processing for plan {study_plan_id}")
-    with SessionLocal() as db:
-        plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
-        if not plan:
-            print(f"Plan {study_plan_id} not found, aborting.")
-            return
-        # We don't keep the plan object bound to session after this block
-        # but we might need some info like languages.
-        question_language = plan.question_language or "English"
-        answer_language = plan.answer_language or "English"
+    languages = await run_io(_load_plan_languages, study_plan_id)
+    if not languages:
+        print(f"Plan {study_plan_id} not found, aborting.")
+        return
+    question_language, answer_language = languages
 
     try:
         # 2. Extract Text (No DB)
@@ -63,15 +218,15 @@ async def process_materials_background(
                 
                 if file_ext == ".pdf":
                     # Extract text from PDF
-                    with pdfplumber.open(file_path) as pdf:
-                        pdf_text = "\n".join([page.extract_text() for page in pdf.pages if page.extract_text()])
-                        combined_text += "\n\n" + pdf_text
-                        print(f"  Extracted {len(pdf_text)} characters from PDF")
+                    pdf_text = await run_cpu(extract_pdf_text, file_path)
+                    combined_text += "\n\n" + pdf_text
+                    print(f"  Extracted {len(pdf_text)} characters from PDF")
                 
                 elif file_ext in [".jpg", ".jpeg", ".png", ".heic"]:
                     # Extract text from image using AI
                     try:
-                        image_text = ai_service.extract_text_from_image(file_path)
+                        image_data, mime_type = await run_cpu(encode_image_for_vision, file_path)
+                        image_text = await run_io(ai_service.extract_text_from_encoded_image, image_data, mime_type)
                         combined_text += "\n\n" + image_text
                         print(f"  Extracted {len(image_text)} characters from image")
                     except Exception as e:
@@ -83,16 +238,12 @@ async def process_materials_background(
         
         if not combined_text.strip():
             print(f"  Warning: No text content extracted for plan {study_plan_id}")
-            with SessionLocal() as db:
-                plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
-                if plan:
-                    plan.status = StudyPlanStatus.AWAITING_APPROVAL
-                    db.commit()
+            await run_io(_set_plan_status, study_plan_id, StudyPlanStatus.AWAITING_APPROVAL)
             return
         
         # 3. Analyze Material (AI - Slow, No DB)
         print("[STEP 3/7] Analyzing material with AI...")
-        analysis = ai_service.analyze_material(combined_text)
+        analysis = await run_io(ai_service.analyze_material, combined_text)
         
         # Check category
         category = analysis.get("category", "other")
@@ -100,12 +251,7 @@ async def process_materials_background(
         
         if category != "vocabulary":
             print(f"  ERROR: Category '{category}' not supported. Only vocabulary is supported.")
-            with SessionLocal() as db:
-                plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
-                if plan:
-                    plan.status = StudyPlanStatus.ERROR
-                    plan.error_type = "not_vocabulary"
-                    db.commit()
+            await run_io(_set_plan_status, study_plan_id, StudyPlanStatus.ERROR, "not_vocabulary")
             raise ValueError(f"Category '{category}' not supported")
         
         # Store detected languages for vocabulary
@@ -115,52 +261,16 @@ async def process_materials_background(
         
         # 4. Save Material Summary (Quick DB op)
         print("[STEP 4/7] Creating material summary...")
-        with SessionLocal() as db:
-            # Check if summary already exists (for idempotency)
-            existing_summary = db.query(MaterialSummary).filter(
-                MaterialSummary.study_plan_id == study_plan_id
-            ).first()
-            
-            if existing_summary:
-                print(f"  Material summary already exists for plan {study_plan_id}, reusing it")
-                summary_id = existing_summary.id
-            else:
-                summary = MaterialSummary(
-                    study_plan_id=study_plan_id,
-                    category=MaterialCategory(category),
-                    title=analysis.get("title", "Study Material"),
-                    main_topics=analysis.get("main_topics", []),
-                    learning_goals=analysis.get("learning_goals", []),
-                    difficulty_assessment=analysis.get("difficulty_assessment", "medium"),
-                    recommended_study_approach=analysis.get("recommended_study_approach", ""),
-                    checklist_items=analysis.get("checklist_items", [])
-                )
-                db.add(summary)
-                db.commit()
-                db.refresh(summary)
-                summary_id = summary.id
-                print(f"  Created material summary with ID: {summary_id}")
-            
-            # Update plan category and detected languages
-            plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
-            if plan:
-                plan.category = MaterialCategory(category)
-                if detected_languages:
-                    plan.detected_languages = detected_languages
-                db.commit()
+        await run_io(_save_material_summary, study_plan_id, category, analysis, detected_languages)
         
         # 5. Check if flashcards already exist (for idempotency)
         print("[STEP 5/7] Checking for existing flashcards...")
-        with SessionLocal() as db:
-            existing_flashcards = db.query(Flashcard).filter(
-                Flashcard.study_plan_id == study_plan_id
-            ).count()
-            
-            if existing_flashcards > 0:
-                print(f"  Flashcards already exist for plan {study_plan_id} (count: {existing_flashcards}), skipping generation")
-                flashcard_count = existing_flashcards
-                success = True
-                return
+        existing_flashcards = await run_io(_count_flashcards, study_plan_id)
+        if existing_flashcards > 0:
+            print(f"  Flashcards already exist for plan {study_plan_id} (count: {existing_flashcards}), skipping generation")
+            flashcard_count = existing_flashcards
+            success = True
+            return
         
         # 6. Generate Flashcards with MCQs and Sentences (AI - Slow, then DB)
         print("[STEP 6/7] Generating flashcards with MCQs and sentences...")
@@ -177,60 +287,29 @@ async def process_materials_background(
                 
                 print(f"  Processing flashcard {idx}/{len(flashcard_data)}: '{front}' -> '{back}'")
                 
-                with SessionLocal() as db:
-                    # Create flashcard
-                    flashcard = Flashcard(
-                        study_plan_id=study_plan_id,
-                        front_text=front,
-                        back_text=back,
-                        difficulty=card_data.get("difficulty", "medium")
-                    )
-                    db.add(flashcard)
-                    db.commit()
-                    db.refresh(flashcard)
-                    
-                    # Generate MCQs
-                    print(f"    Generating MCQs for flashcard {idx}...")
-                    mcqs = ai_service.generate_mcq_questions(
-                        {"front_text": front, "back_text": back}, 
-                        question_language, 
+                # MCQs and sentences are independent AI calls, so run them side by side
+                mcqs, sentences = await asyncio.gather(
+                    run_io(
+                        ai_service.generate_mcq_questions,
+                        {"front_text": front, "back_text": back},
+                        question_language,
                         answer_language
-                    )
-                    
-                    for mcq_data in mcqs[:3]:  # Limit to 3 MCQs
-                        mcq = MCQQuestion(
-                            flashcard_id=flashcard.id,
-                            question_text=mcq_data.get("question_text", ""),
-                            options=mcq_data.get("options", []),
-                            correct_answer_index=mcq_data.get("correct_answer_index", 0),
-                            question_type=mcq_data.get("question_type", "standard"),
-                            rationale=mcq_data.get("rationale", "")
-                        )
-                        db.add(mcq)
-                    
-                    # Generate sentences
-                    print(f"    Generating example sentences for flashcard {idx}...")
-                    sentences = ai_service.generate_vocabulary_sentences(
-                        front, back, answer_language
-                    )
-                    
-                    for sent_data in sentences[:5]:  # Limit to 5 sentences
-                        sentence = VocabularySentence(
-                            flashcard_id=flashcard.id,
-                            sentence_text=sent_data.get("sentence_text", ""),
-                            highlighted_words=sent_data.get("highlighted_words", [])
-                        )
-                        db.add(sentence)
-                    
-                    db.commit()
-                    flashcard_count += 1
+                    ),
+                    run_io(ai_service.generate_vocabulary_sentences, front, back, answer_language)
+                )
+                
+                await run_io(
+                    _save_flashcard_content,
+                    study_plan_id,
+                    {"front": front, "back": back, "difficulty": card_data.get("difficulty", "medium")},
+                    mcqs,
+                    sentences
+                )
+                flashcard_count += 1
             
             # AUTOMATE PRE-ASSESSMENT GENERATION
             print(f"  Generating pre-assessment for plan {study_plan_id}...")
-            from app.services.pre_assessment import PreAssessmentService
-            with SessionLocal() as db:
-                pre_service = PreAssessmentService(db)
-                pre_service.generate_pre_assessment(study_plan_id)
+            await run_io(_generate_pre_assessment, study_plan_id)
         
         if flashcard_count == 0:
             print(f"  Warning: All flashcards were empty for plan {study_plan_id}")
@@ -254,55 +333,7 @@ async def process_materials_background(
         # ALWAYS update status, even if there was an error
         print(f"[FINAL] Updating final status for plan {study_plan_id} (success={success}, flashcards={flashcard_count})")
         try:
-            with SessionLocal() as db:
-                plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
-                if plan:
-                    if success and flashcard_count > 0:
-                        # Auto-activate
-                        plan.status = StudyPlanStatus.ACTIVE
-                        
-                        # Only create pre-assessment for FULL plans (with exam date)
-                        if plan.plan_mode == "full" or plan.plan_mode is None:
-                            # Create pre-assessment test task for day 1
-                            from datetime import timezone, datetime
-                            today = datetime.now(timezone.utc).date()
-                            
-                            # Check if task already exists
-                            existing_task = db.query(Task).filter(
-                                Task.study_plan_id == study_plan_id,
-                                Task.title == "Pre-Assessment Test"
-                            ).first()
-                            
-                            if not existing_task:
-                                pre_assessment_task = Task(
-                                    study_plan_id=study_plan_id,
-                                    title="Pre-Assessment Test",
-                                    description="Take this test to assess your current level with the vocabulary. This will help us create a personalized study schedule.",
-                                    type=TaskType.COMPREHENSIVE_TEST,
-                                    mode=StudyMode.SHORT_TEST,
-                                    estimated_minutes=30,
-                                    day_number=1,
-                                    rationale="Pre-assessment to determine your current vocabulary level and adapt the study plan accordingly.",
-                                    scheduled_date=today,
-                                    order=0,
-                                    completion_status=False
-                                )
-                                db.add(pre_assessment_task)
-                                plan.tasks_total_static = 1
-                                plan.tasks_completed_static = 0
-                            
-                            print(f"  Status updated to ACTIVE and pre-assessment task created")
-                        else:
-                            # Simple plan - no pre-assessment or schedule
-                            print(f"  Status updated to ACTIVE (simple plan - no pre-assessment created)")
-                    else:
-                        # Fallback to awaiting approval if error (so user can retry or see summary)
-                        plan.status = StudyPlanStatus.AWAITING_APPROVAL
-                        print(f"  Status updated to AWAITING_APPROVAL (processing failed or zero flashcards)")
-
-                    db.commit()
-                else:
-                    print(f"  ERROR: Plan {study_plan_id} not found for final status update")
+            await run_io(_finalize_plan_status, study_plan_id, success, flashcard_count)
         except Exception as final_error:
             print(f"  CRITICAL ERROR updating final status: {final_error}")
             import traceback
@@ -379,21 +410,23 @@ async def upload_materials(
 @router.get("/{study_plan_id}/summary", response_model=MaterialSummaryResponse)
 async def get_material_summary(
     study_plan_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get material summary for a study plan."""
-    plan = db.query(StudyPlan).filter(
-        StudyPlan.id == study_plan_id,
-        StudyPlan.user_id == current_user.id
-    ).first()
+    not_modified = conditional_plan_response(request, response, db, study_plan_id, current_user.id, "summary")
+    if not_modified:
+        return not_modified
     
-    if not plan:
-        raise HTTPException(status_code=404, detail="Study plan not found")
+    summary = db.query(MaterialSummary).filter(
+        MaterialSummary.study_plan_id == study_plan_id
+    ).first()
     
-    if not plan.material_summary:
+    if not summary:
         raise HTTPException(status_code=404, detail="Material summary not found")
     
-    return plan.material_summary
+    return summary
 
 
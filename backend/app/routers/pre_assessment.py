@@ -5,7 +5,7 @@ from typing import List
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User, StudyPlan, PreAssessment
-from app.schemas import PreAssessmentResponseModel, PreAssessmentSubmit
+from app.schemas import PreAssessmentResponseModel, PreAssessmentSubmit, PreAssessmentResponseSubmit
 from app.services.pre_assessment import PreAssessmentService
 from app.services.adaptive_learning import AdaptiveLearningService
 
@@ -36,7 +36,46 @@ async def submit_pre_assessment(
         
     service = PreAssessmentService(db)
     result = service.submit_assessment(assessment.id, submission.responses)
+    _start_schedule_generation(assessment, background_tasks, current_user.id, db)
     
+    return result
+
+@router.post("/{plan_id}/answer", response_model=PreAssessmentResponseModel)
+async def answer_pre_assessment_question(
+    plan_id: int,
+    answer: PreAssessmentResponseSubmit,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Answer the current question of the adaptive pre-assessment. Returns the
+    assessment with the next question appended, or completed once the
+    ability estimate is precise enough.
+    """
+    assessment = db.query(PreAssessment).join(StudyPlan).filter(
+        PreAssessment.study_plan_id == plan_id,
+        StudyPlan.user_id == current_user.id
+    ).first()
+    
+    if not assessment:
+        raise HTTPException(status_code=404, detail="Pre-assessment not found")
+        
+    if assessment.status == "completed":
+        raise HTTPException(status_code=400, detail="Assessment already completed")
+        
+    service = PreAssessmentService(db)
+    try:
+        result = service.answer(assessment, answer.flashcard_id, answer.is_correct, answer.response_time_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if result.status == "completed":
+        _start_schedule_generation(assessment, background_tasks, current_user.id, db)
+    
+    return result
+
+def _start_schedule_generation(assessment: PreAssessment, background_tasks: BackgroundTasks, user_id: int, db: Session):
     # TRIGGER ADAPTIVE SCHEDULE GENERATION (As background task to prevent UI hang)
     from app.models import StudyPlanStatus
     assessment.study_plan.status = StudyPlanStatus.GENERATING
@@ -45,11 +84,9 @@ async def submit_pre_assessment(
     from app.routers.tasks import generate_schedule_background
     background_tasks.add_task(
         generate_schedule_background,
-        plan_id,
-        current_user.id
+        assessment.study_plan_id,
+        user_id
     )
-    
-    return result
 
 @router.post("/{plan_id}/generate", response_model=PreAssessmentResponseModel)
 async def generate_pre_assessment(
@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response, Query
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User, StudyPlan, StudyPlanStatus, MaterialCategory, Flashcard, MCQQuestion
-from app.schemas import StudyPlanCreate, StudyPlanResponse, FlashcardWithQuestions
+from app.schemas import (
+    StudyPlanCreate, StudyPlanResponse, FlashcardWithQuestions, StudyBundleResponse, DueFlashcardResponse,
+    StudySessionRequest, ComposedSessionResponse, PlanProgressResponse
+)
 from app.ai_service import ai_service
+from app.http_cache import (
+    conditional_plan_response, get_plan_content_version, plan_content_etag, etag_matches, cache_headers,
+    set_cache_headers, negotiated_representation
+)
+from app.serialization import flashcard_content_rows, flashcard_progress_rows, serialized_response
+from app.services.srs import SpacedRepetitionService
+from app.services.session_composer import SessionComposer
 
 router = APIRouter()
 
@@ -63,8 +73,8 @@ async def get_study_plans(
     db: Session = Depends(get_db)
 ):
     """Get all study plans for current user."""
-    from sqlalchemy.orm import joinedload
-    plans = db.query(StudyPlan).options(joinedload(StudyPlan.tasks)).filter(StudyPlan.user_id == current_user.id).all()
+    # Progress fields are stored counters, so no task rows are loaded here
+    plans = db.query(StudyPlan).filter(StudyPlan.user_id == current_user.id).all()
     return plans
 
 @router.get("/{plan_id}", response_model=StudyPlanResponse)
@@ -167,8 +177,6 @@ async def approve_study_plan(
         if existing_task:
             # Task already exists, just update plan status
             plan.status = StudyPlanStatus.ACTIVE
-            if plan.tasks_total == 0:
-                plan.tasks_total = 1
             db.commit()
             return {"message": "Pre-assessment test already exists. Please complete it to generate your personalized study schedule."}
         
@@ -186,13 +194,11 @@ async def approve_study_plan(
             day_number=1,
             rationale="Pre-assessment to determine your current vocabulary level and adapt the study plan accordingly.",
             scheduled_date=today,
+            planned_date=today,
             order=0,
             completion_status=False
         )
         db.add(pre_assessment_task)
-        
-        plan.tasks_total = 1
-        plan.tasks_completed = 0
         db.commit()
         
         # Verify task was created
@@ -238,23 +244,111 @@ async def get_plan_flashcards(
 @router.get("/{plan_id}/quiz", response_model=List[FlashcardWithQuestions])
 async def get_plan_quiz(
     plan_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all quiz questions for a study plan, grouped by flashcard."""
-    plan = db.query(StudyPlan).filter(
+    not_modified = conditional_plan_response(request, response, db, plan_id, current_user.id, "quiz")
+    if not_modified:
+        return not_modified
+    
+    # Column projections + orjson/msgpack instead of one Pydantic model per row
+    return serialized_response(request, flashcard_content_rows(db, plan_id), response)
+
+@router.get("/{plan_id}/bundle", response_model=StudyBundleResponse)
+async def get_study_bundle(
+    plan_id: int,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get everything a study mode needs (cards, MCQs, sentences) in one response."""
+    version = get_plan_content_version(db, plan_id, current_user.id)
+    etag = plan_content_etag(plan_id, version, negotiated_representation(request, "bundle"))
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    set_cache_headers(response, etag)
+    
+    # Three set-based queries regardless of deck size: cards, MCQs and sentences
+    return serialized_response(request, {
+        "study_plan_id": plan_id,
+        "version": str(version),
+        "flashcards": flashcard_content_rows(db, plan_id, include_sentences=True)
+    }, response)
+
+@router.get("/{plan_id}/progress", response_model=PlanProgressResponse)
+async def get_plan_progress(
+    plan_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Per-card mastery and study count, kept out of the versioned deck payloads."""
+    plan_exists = db.query(StudyPlan.id).filter(
         StudyPlan.id == plan_id,
         StudyPlan.user_id == current_user.id
     ).first()
     
-    if not plan:
+    if not plan_exists:
         raise HTTPException(status_code=404, detail="Study plan not found")
     
-    # Get all flashcards for this plan with their questions
-    # SQLAlchemy will handle the relationship loading
-    flashcards = db.query(Flashcard).filter(Flashcard.study_plan_id == plan_id).all()
+    return serialized_response(request, {
+        "study_plan_id": plan_id,
+        "flashcards": flashcard_progress_rows(db, plan_id)
+    })
+
+@router.get("/{plan_id}/due", response_model=List[DueFlashcardResponse])
+async def get_due_flashcards(
+    plan_id: int,
+    request: Request,
+    limit: int = Query(20, ge=1, le=200),
+    include_new: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Cards due for review now, most overdue first, topped up with never-reviewed cards."""
+    plan_exists = db.query(StudyPlan.id).filter(
+        StudyPlan.id == plan_id,
+        StudyPlan.user_id == current_user.id
+    ).first()
     
-    return flashcards
+    if not plan_exists:
+        raise HTTPException(status_code=404, detail="Study plan not found")
+    
+    cards = SpacedRepetitionService(db).due_cards(plan_id, limit, include_new=include_new)
+    return serialized_response(request, cards)
+
+@router.post("/{plan_id}/sessions", response_model=ComposedSessionResponse)
+async def compose_study_session(
+    plan_id: int,
+    session_request: StudySessionRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    A study session of the plan's most urgent cards (weak, fading or just
+    missed), with their MCQs and sentences. Replaces downloading the whole
+    deck and picking cards on the client.
+    """
+    plan_exists = db.query(StudyPlan.id).filter(
+        StudyPlan.id == plan_id,
+        StudyPlan.user_id == current_user.id
+    ).first()
+    
+    if not plan_exists:
+        raise HTTPException(status_code=404, detail="Study plan not found")
+    
+    cards = SessionComposer(db).compose(
+        current_user.id,
+        plan_id,
+        session_request.size,
+        exclude=session_request.exclude_flashcard_ids
+    )
+    return serialized_response(request, {"study_plan_id": plan_id, "cards": cards})
 
 @router.get("/{plan_id}/status")
 async def get_study_plan_status(
@@ -279,6 +373,6 @@ async def get_study_plan_status(
         "progress_percentage": plan.progress_percentage,
         "tasks_total": plan.tasks_total,
         "tasks_completed": plan.tasks_completed,
-        "flashcard_count": len(plan.flashcards)
+        "flashcard_count": db.query(Flashcard).filter(Flashcard.study_plan_id == plan_id).count()
     }
 
@@ -1,34 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User, StudyPlan, Task, TaskType, StudyMode, StudyPlanStatus
 from app.schemas import TaskResponse, TaskComplete
 from app.ai_service import ai_service
+from app.workers import run_io
+from app.services.mastery import MasteryService
+from app.services.rescheduler import TaskRescheduler
+from app.services.study_activity import StudyActivityService, day_bounds, utc_today
+from app.services.user_scheduler import UserScheduler
 
 router = APIRouter()
 
-async def generate_schedule_background_with_results(
-    study_plan_id: int, 
-    user_id: int,
-    test_result_id: Optional[int] = None
-):
-    """Background task to generate study schedule using pre-assessment test results."""
+def _load_schedule_inputs(study_plan_id: int, user_id: int, test_result_id: Optional[int] = None):
+    """Read everything the schedule generator needs into plain dicts (runs in the I/O pool)."""
     from app.database import SessionLocal
-    db = SessionLocal()
-    
-    try:
+    with SessionLocal() as db:
         plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
         if not plan or not plan.flashcards:
-            return
+            return None
         
         # Get user preferences
         user = db.query(User).filter(User.id == user_id).first()
         
         # Get test results if available
-        test_results = None
         vocab_mastery = {}
         if test_result_id:
             from app.models import TestResult
@@ -63,131 +61,95 @@ async def generate_schedule_background_with_results(
             "study_hours_per_week": user.study_hours_per_week
         }
         
-        # Generate schedule with test results
-        tasks_data = ai_service.generate_study_schedule(
-            plan_data, 
-            flashcards_data, 
-            user_prefs,
-            test_results=test_results.vocab_details if test_results else None
-        )
-        
-        # Delete existing tasks (except pre-assessment if it exists)
-        db.query(Task).filter(
-            Task.study_plan_id == study_plan_id,
-            Task.title != "Pre-Assessment Test"
-        ).delete()
+        return plan_data, flashcards_data, user_prefs, vocab_mastery or None
+
+def _replace_schedule(study_plan_id: int, tasks_data: List[dict], keep_pre_assessment: bool, today: Optional[date] = None):
+    """Bring the plan's tasks in line with the generated schedule in one transaction (runs in the I/O pool)."""
+    from app.database import SessionLocal
+    with SessionLocal() as db:
+        plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
+        if not plan:
+            return
         
-        # Create tasks
-        today = datetime.utcnow().date()
+        today = today or utc_today()
+        desired = []
         for task_data in tasks_data:
             day_num = task_data.get("day_number", 1)
-            scheduled_date = today + timedelta(days=day_num - 1)
-            
-            task = Task(
-                study_plan_id=study_plan_id,
-                title=task_data.get("title", "Study Task"),
-                description=None,
-                type=TaskType(task_data.get("type", "flashcard_review")),
-                mode=StudyMode(task_data.get("mode", "learn")),
-                estimated_minutes=task_data.get("estimated_minutes", 20),
-                day_number=day_num,
-                rationale=task_data.get("rationale"),
-                scheduled_date=scheduled_date,
-                order=task_data.get("order", 0)
-            )
-            db.add(task)
+            desired.append({
+                "title": task_data.get("title", "Study Task"),
+                "description": None,
+                "type": TaskType(task_data.get("type", "flashcard_review")),
+                "mode": StudyMode(task_data.get("mode", "learn")),
+                "estimated_minutes": task_data.get("estimated_minutes", 20),
+                "day_number": day_num,
+                "rationale": task_data.get("rationale"),
+                "scheduled_date": today + timedelta(days=day_num - 1),
+                "order": task_data.get("order", 0)
+            })
         
-        # Update plan
-        existing_tasks = db.query(Task).filter(Task.study_plan_id == study_plan_id).count()
-        plan.tasks_total_static = existing_tasks
+        # Minimal inserts/updates/deletes; tasks keep their ids across regenerations
+        TaskRescheduler(db).apply(
+            study_plan_id, desired, keep_completed=False, keep_pre_assessment=keep_pre_assessment
+        )
         plan.status = StudyPlanStatus.ACTIVE
         db.commit()
         
-    except Exception as e:
-        print(f"Error generating schedule with results: {e}")
-        import traceback
-        print(traceback.format_exc())
+        # Fit the new schedule into the user's daily budget next to their other plans
+        UserScheduler(db).rebalance(plan.user_id, today, schedule_changed=True)
+
+def _reactivate_plan(study_plan_id: int):
+    from app.database import SessionLocal
+    with SessionLocal() as db:
         plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
         if plan:
             plan.status = StudyPlanStatus.ACTIVE
             db.commit()
-    finally:
-        db.close()
 
-async def generate_schedule_background(study_plan_id: int, user_id: int):
-    """Background task to generate study schedule."""
-    from app.database import SessionLocal
-    db = SessionLocal()
-    
+async def generate_schedule_background_with_results(
+    study_plan_id: int, 
+    user_id: int,
+    test_result_id: Optional[int] = None
+):
+    """Background task to generate study schedule using pre-assessment test results."""
     try:
-        plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
-        if not plan or not plan.flashcards:
+        inputs = await run_io(_load_schedule_inputs, study_plan_id, user_id, test_result_id)
+        if not inputs:
             return
+        plan_data, flashcards_data, user_prefs, vocab_mastery = inputs
         
-        # Get user preferences
-        user = db.query(User).filter(User.id == user_id).first()
-        
-        # Prepare data for AI
-        plan_data = {
-            "name": plan.name,
-            "exam_date": plan.exam_date.isoformat() if plan.exam_date else None,
-            "type": plan.type.value
-        }
+        # Generate schedule with test results
+        tasks_data = await run_io(
+            ai_service.generate_study_schedule,
+            plan_data, 
+            flashcards_data, 
+            user_prefs,
+            test_results=vocab_mastery
+        )
         
-        flashcards_data = [
-            {
-                "front_text": fc.front_text,
-                "back_text": fc.back_text,
-                "difficulty": fc.difficulty,
-                "mastery_level": fc.mastery_level
-            }
-            for fc in plan.flashcards
-        ]
+        await run_io(_replace_schedule, study_plan_id, tasks_data, True)
         
-        user_prefs = {
-            "learning_speed": user.learning_speed.value,
-            "study_hours_per_week": user.study_hours_per_week
-        }
+    except Exception as e:
+        print(f"Error generating schedule with results: {e}")
+        import traceback
+        print(traceback.format_exc())
+        await run_io(_reactivate_plan, study_plan_id)
+
+async def generate_schedule_background(study_plan_id: int, user_id: int):
+    """Background task to generate study schedule."""
+    try:
+        inputs = await run_io(_load_schedule_inputs, study_plan_id, user_id)
+        if not inputs:
+            return
+        plan_data, flashcards_data, user_prefs, _ = inputs
         
         # Generate schedule
-        tasks_data = ai_service.generate_study_schedule(plan_data, flashcards_data, user_prefs)
+        tasks_data = await run_io(ai_service.generate_study_schedule, plan_data, flashcards_data, user_prefs)
         
-        # Delete existing tasks
-        db.query(Task).filter(Task.study_plan_id == study_plan_id).delete()
-        
-        # Create tasks
-        today = datetime.utcnow().date()
-        for task_data in tasks_data:
-            day_num = task_data.get("day_number", 1)
-            scheduled_date = today + timedelta(days=day_num - 1)
-            
-            task = Task(
-                study_plan_id=study_plan_id,
-                title=task_data.get("title", "Study Task"),
-                description=None,
-                type=TaskType(task_data.get("type", "flashcard_review")),
-                mode=StudyMode(task_data.get("mode", "learn")),
-                estimated_minutes=task_data.get("estimated_minutes", 20),
-                day_number=day_num,
-                rationale=task_data.get("rationale"),
-                scheduled_date=scheduled_date,
-                order=task_data.get("order", 0)
-            )
-            db.add(task)
-        
-        # Update plan
-        plan.tasks_total_static = len(tasks_data)
-        plan.status = StudyPlanStatus.ACTIVE
-        db.commit()
+        await run_io(_replace_schedule, study_plan_id, tasks_data, False)
         
     except Exception as e:
         print(f"Error generating schedule: {e}")
-        plan = db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
-        if plan:
-            plan.status = StudyPlanStatus.ACTIVE
-            db.commit()
-    finally:
-        db.close()
+        await run_io(_reactivate_plan, study_plan_id)
 
 @router.get("/study-plan/{plan_id}", response_model=List[TaskResponse])
 async def get_tasks(
@@ -216,13 +178,15 @@ async def get_today_tasks(
     db: Session = Depends(get_db)
 ):
     """Get all tasks due today for current user."""
-    today = datetime.utcnow().date()
+    start, end = day_bounds(utc_today())
     
+    # Across plans; the nearest exam first (UserScheduler keeps the total within the daily budget)
     tasks = db.query(Task).join(StudyPlan).filter(
         StudyPlan.user_id == current_user.id,
-        Task.scheduled_date == today,
+        Task.scheduled_date >= start,
+        Task.scheduled_date < end,
         Task.completion_status == False
-    ).order_by(Task.order).all()
+    ).order_by(StudyPlan.exam_date.is_(None), StudyPlan.exam_date, Task.order).all()
     
     return tasks
 
@@ -260,12 +224,13 @@ async def complete_task(
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    newly_completed = not task.completion_status
     task.completion_status = True
     task.completed_at = datetime.utcnow()
     
-    # Update study plan progress
+    # Flushing fires the counter events, which refresh the plan's progress
     plan = task.study_plan
-    plan.tasks_completed_static += 1
+    db.flush()
     
     # Check if this is a pre-assessment test
     is_pre_assessment = (
@@ -300,21 +265,20 @@ async def complete_task(
             db.flush()
             test_result_id = test_result.id
             
-            # Update flashcard mastery levels based on test results
-            from app.models import Flashcard
+            # Update flashcard mastery levels based on test results (one statement for all cards)
+            levels = {}
             for flashcard_id_str, result_data in vocab_details.items():
                 try:
-                    flashcard_id = int(flashcard_id_str)
-                    mastery = result_data.get("mastery", 0.0)
-                    flashcard = db.query(Flashcard).filter(Flashcard.id == flashcard_id).first()
-                    if flashcard:
-                        flashcard.mastery_level = mastery
-                except (ValueError, KeyError):
+                    levels[int(flashcard_id_str)] = float(result_data.get("mastery", 0.0))
+                except (ValueError, TypeError, AttributeError):
                     continue
+            MasteryService(db).set_user_mastery(current_user.id, levels)
         
         # Generate full schedule in background using test results
         plan.status = StudyPlanStatus.GENERATING
         db.commit()
+        if newly_completed:
+            StudyActivityService(db).record_task_completed(current_user.id)
         
         from app.routers.tasks import generate_schedule_background_with_results
         background_tasks.add_task(
@@ -331,5 +295,8 @@ async def complete_task(
         plan.status = StudyPlanStatus.COMPLETED
     
     db.commit()
+    if newly_completed:
+        StudyActivityService(db).record_task_completed(current_user.id)
+        UserScheduler(db).rebalance(current_user.id)
     return {"message": "Task completed"}
 
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User, StudyPlan, TestResult
 from app.schemas import TestResultCreate, TestResultResponse
+from app.serialization import test_result_rows, serialized_response
 
 router = APIRouter()
 
@@ -43,6 +44,7 @@ async def create_test_result(
 @router.get("/study-plan/{plan_id}", response_model=List[TestResultResponse])
 async def get_test_results(
     plan_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -55,9 +57,5 @@ async def get_test_results(
     if not plan:
         raise HTTPException(status_code=404, detail="Study plan not found")
     
-    results = db.query(TestResult).filter(
-        TestResult.study_plan_id == plan_id
-    ).order_by(TestResult.created_at.desc()).all()
-    
-    return results
+    return serialized_response(request, test_result_rows(db, plan_id))
 
@@ -1,16 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from datetime import datetime, timezone
 from app.database import get_db
 from app.auth import get_current_user
-from app.models import User, StudySessionTracking, StudyPlan, Flashcard
-from app.schemas import TrackingLog, TrackingResponse
-from datetime import datetime
-
-from app.services.analytics_service import AnalyticsService
+from app.config import settings
+from app.models import User, StudyPlan, Flashcard, StudySessionTracking
+from app.schemas import TrackingLog, TrackingResponse, TrackingBatch, TrackingBatchResponse
+from app.tracking_buffer import tracking_buffer
 
 router = APIRouter()
 
-@router.post("/log", response_model=TrackingResponse)
+def _event_time(client_timestamp, now: datetime) -> datetime:
+    """Client timestamp as naive UTC (like server_default now()), never in the future."""
+    if client_timestamp is None:
+        return now
+    if client_timestamp.tzinfo is not None:
+        client_timestamp = client_timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(client_timestamp, now)
+
+def _tracking_event(user_id: int, log_data: TrackingLog, now: datetime) -> dict:
+    return {
+        "user_id": user_id,
+        "study_plan_id": log_data.study_plan_id,
+        "mode": log_data.mode,
+        "flashcard_id": log_data.flashcard_id,
+        "is_correct": log_data.is_correct,
+        "response_time_ms": log_data.response_time_ms,
+        "attempts_needed": log_data.attempts_needed,
+        "client_event_id": log_data.client_event_id,
+        "created_at": _event_time(log_data.client_timestamp, now)
+    }
+
+def _buffer_full():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Tracking buffer is full, retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
+@router.post("/log", response_model=TrackingResponse, status_code=status.HTTP_202_ACCEPTED)
 async def log_study_activity(
     log_data: TrackingLog,
     current_user: User = Depends(get_current_user),
@@ -18,33 +46,87 @@ async def log_study_activity(
 ):
     """
     Log a micro-interaction during a study session (e.g. answering a flashcard).
+    The event is buffered and written in bulk (see app/tracking_buffer.py).
     """
-    # Simply record the data
-    tracking_entry = StudySessionTracking(
-        user_id=current_user.id,
-        study_plan_id=log_data.study_plan_id,
-        mode=log_data.mode,
-        flashcard_id=log_data.flashcard_id,
-        is_correct=log_data.is_correct,
-        response_time_ms=log_data.response_time_ms,
-        attempts_needed=log_data.attempts_needed
+    # Same ownership rule as /log-batch, in one query: the flush rewrites the card's SRS state
+    query = db.query(StudyPlan.id).filter(
+        StudyPlan.id == log_data.study_plan_id,
+        StudyPlan.user_id == current_user.id
     )
+    if log_data.flashcard_id:
+        query = query.join(Flashcard, Flashcard.study_plan_id == StudyPlan.id).filter(
+            Flashcard.id == log_data.flashcard_id
+        )
+    owned = query.first()
+    # Nothing is written on this connection; release it before returning
+    db.close()
+    if not owned:
+        raise HTTPException(status_code=404, detail="Study plan or flashcard not found")
     
-    db.add(tracking_entry)
+    if not tracking_buffer.submit(_tracking_event(current_user.id, log_data, datetime.utcnow())):
+        raise _buffer_full()
     
-    # Also update Flashcard real-time stats
-    if log_data.flashcard_id:
-        flashcard = db.query(Flashcard).filter(Flashcard.id == log_data.flashcard_id).first()
-        if flashcard:
-            flashcard.times_studied += 1
-            flashcard.last_studied = datetime.utcnow()
+    return {"status": "queued"}
 
-    db.commit()
+@router.post("/log-batch", response_model=TrackingBatchResponse, status_code=status.HTTP_202_ACCEPTED)
+async def log_study_activity_batch(
+    batch: TrackingBatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Log several micro-interactions at once (buffered client-side during a session).
+    Events are validated with one query per table instead of one per event; events
+    whose client_event_id was already received are skipped, so retries are safe.
+    """
+    events = batch.events
+    if len(events) > settings.TRACKING_BATCH_MAX_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.TRACKING_BATCH_MAX_EVENTS} events per batch"
+        )
+    
+    plan_ids = {event.study_plan_id for event in events}
+    owned_plans = {
+        plan_id for (plan_id,) in db.query(StudyPlan.id).filter(
+            StudyPlan.user_id == current_user.id,
+            StudyPlan.id.in_(plan_ids)
+        )
+    } if plan_ids else set()
+    
+    flashcard_ids = {event.flashcard_id for event in events if event.flashcard_id}
+    card_plans = dict(db.query(Flashcard.id, Flashcard.study_plan_id).filter(
+        Flashcard.id.in_(flashcard_ids)
+    ).all()) if flashcard_ids else {}
+    
+    event_ids = {event.client_event_id for event in events if event.client_event_id}
+    seen_ids = tracking_buffer.pending_event_ids(current_user.id, event_ids)
+    if event_ids - seen_ids:
+        seen_ids |= {
+            event_id for (event_id,) in db.query(StudySessionTracking.client_event_id).filter(
+                StudySessionTracking.user_id == current_user.id,
+                StudySessionTracking.client_event_id.in_(event_ids - seen_ids)
+            )
+        }
+    # Nothing is written on this connection; release it before returning
+    db.close()
+    
+    now = datetime.utcnow()
+    accepted, rejected, duplicates = [], [], 0
+    for index, event in enumerate(events):
+        if event.study_plan_id not in owned_plans or (
+            event.flashcard_id and card_plans.get(event.flashcard_id) != event.study_plan_id
+        ):
+            rejected.append(index)
+            continue
+        if event.client_event_id:
+            if event.client_event_id in seen_ids:
+                duplicates += 1
+                continue
+            seen_ids.add(event.client_event_id)
+        accepted.append(_tracking_event(current_user.id, event, now))
     
-    # TRIGGER ANALYTICS UPDATE (Lite version / sampling)
-    # Only update every 5th log to save resources, or check if user is completing a session
-    # For now, simplistic approach: call it.
-    analytics_service = AnalyticsService(db)
-    analytics_service.update_profile_after_session(current_user.id)
+    if accepted and not tracking_buffer.submit_many(accepted):
+        raise _buffer_full()
     
-    return {"status": "logged"}
+    return {"accepted": len(accepted), "duplicates": duplicates, "rejected": rejected}
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import date, datetime
 from app.models import LearningSpeed, StudyPlanType, MaterialCategory, StudyPlanStatus, TaskType, StudyMode
 
 # User Schemas
@@ -108,22 +108,48 @@ class FlashcardCreate(BaseModel):
     back_text: str
     difficulty: Optional[str] = "medium"
 
-class FlashcardResponse(BaseModel):
+class FlashcardContent(BaseModel):
     id: int
     front_text: str
     back_text: str
     difficulty: str
+    
+    class Config:
+        from_attributes = True
+
+class FlashcardResponse(FlashcardContent):
+    mastery_level: float
+    times_studied: int
+
+class FlashcardProgress(BaseModel):
+    id: int
     mastery_level: float
     times_studied: int
     
     class Config:
         from_attributes = True
 
+class DueFlashcardResponse(FlashcardResponse):
+    srs_stability: Optional[float] = None
+    srs_difficulty: Optional[float] = None
+    srs_reps: Optional[int] = 0
+    srs_lapses: Optional[int] = 0
+    srs_last_review_at: Optional[datetime] = None
+    due_at: Optional[datetime] = None  # None: never reviewed
+    recall: Optional[float] = None  # Predicted recall now
+
 class FlashcardUpdate(BaseModel):
     front_text: Optional[str] = None
     back_text: Optional[str] = None
     difficulty: Optional[str] = None
 
+class MasteryUpdate(BaseModel):
+    flashcard_id: int
+    mastery_level: float  # 0-100, clamped
+
+class MasteryBatchUpdate(BaseModel):
+    updates: List[MasteryUpdate] = Field(..., max_length=1000)
+
 class MCQQuestionResponse(BaseModel):
     id: int
     flashcard_id: int
@@ -136,12 +162,49 @@ class MCQQuestionResponse(BaseModel):
     class Config:
         from_attributes = True
 
-class FlashcardWithQuestions(FlashcardResponse):
+# Deck payloads are versioned by content_version and carry no per-user progress
+class FlashcardWithQuestions(FlashcardContent):
     mcq_questions: List[MCQQuestionResponse] = []
     
     class Config:
         from_attributes = True
 
+class VocabularySentenceResponse(BaseModel):
+    id: int
+    sentence_text: str
+    highlighted_words: Optional[List[Any]] = None
+    
+    class Config:
+        from_attributes = True
+
+class FlashcardWithContent(FlashcardWithQuestions):
+    vocabulary_sentences: List[VocabularySentenceResponse] = []
+    
+    class Config:
+        from_attributes = True
+
+class SessionCardResponse(FlashcardWithContent):
+    mastery_level: float
+    times_studied: int
+    priority: float  # Higher: more in need of study right now
+
+class StudySessionRequest(BaseModel):
+    size: int = Field(20, ge=1, le=100)
+    exclude_flashcard_ids: List[int] = []  # Cards already shown this sitting
+
+class ComposedSessionResponse(BaseModel):
+    study_plan_id: int
+    cards: List[SessionCardResponse]  # Most urgent first
+
+class StudyBundleResponse(BaseModel):
+    study_plan_id: int
+    version: str  # Changes whenever any card, MCQ or sentence in the deck changes
+    flashcards: List[FlashcardWithContent]
+
+class PlanProgressResponse(BaseModel):
+    study_plan_id: int
+    flashcards: List[FlashcardProgress]  # Not versioned: changes after every study session
+
 # Task Schemas
 class TaskResponse(BaseModel):
     id: int
@@ -171,6 +234,7 @@ class StudySessionCreate(BaseModel):
 class StudySessionResponse(BaseModel):
     id: int
     date: datetime
+    day: Optional[date] = None
     tasks_available: int
     tasks_completed: int
     is_complete_day: bool
@@ -178,6 +242,17 @@ class StudySessionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class StudyStreakResponse(BaseModel):
+    streak: int
+    longest_streak: int
+    last_active_day: Optional[date] = None
+
+class ActivityDay(BaseModel):
+    day: date
+    tasks_available: int
+    tasks_completed: int
+    is_complete_day: bool
+
 # Test Result Schemas
 class TestResultCreate(BaseModel):
     test_type: str
@@ -229,7 +304,10 @@ class PreAssessmentResponseModel(BaseModel):
     id: int
     total_questions: int
     status: str
-    questions_data: Optional[List[Dict[str, Any]]]
+    questions_data: Optional[List[Dict[str, Any]]]  # While pending, the last one is the next question
+    correct_score: Optional[float] = None
+    ability_estimate: Optional[float] = None
+    ability_se: Optional[float] = None
     
     class Config:
         from_attributes = True
@@ -242,7 +320,18 @@ class TrackingLog(BaseModel):
     is_correct: bool
     response_time_ms: int
     attempts_needed: int = 1
+    client_event_id: Optional[str] = Field(None, max_length=64)  # Makes retries idempotent
+    client_timestamp: Optional[datetime] = None  # When the card was answered
 
 class TrackingResponse(BaseModel):
     status: str = "logged"
 
+class TrackingBatch(BaseModel):
+    events: List[TrackingLog]
+
+class TrackingBatchResponse(BaseModel):
+    status: str = "queued"
+    accepted: int
+    duplicates: int
+    rejected: List[int] = []  # Indexes of events referencing plans/cards the user doesn't own
+
@@ -0,0 +1,197 @@
+"""
+Fast serialization for the large deck/result list endpoints.
+
+Instead of building one Pydantic model per ORM row and encoding with the
+stdlib json module, these helpers select only the columns the response schema
+exposes (plain tuples, no identity map), turn them into dicts and encode them
+with orjson. Clients that send `Accept: application/msgpack` get MessagePack.
+
+The response schemas stay the source of truth: the column lists are derived
+from their fields, and the endpoints keep them as `response_model` for the docs.
+"""
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Collection, Dict, Iterable, List, Optional, Type
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.models import Flashcard, MCQQuestion, VocabularySentence, TestResult
+from app.schemas import (
+    FlashcardContent, FlashcardProgress, FlashcardResponse, MCQQuestionResponse, VocabularySentenceResponse, TestResultResponse
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack negotiation is disabled
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+def _schema_columns(model, schema: Type[BaseModel], extra: Iterable[str] = ()) -> list:
+    """Model columns for every scalar field of `schema` (plus `extra` helper columns)."""
+    names = [name for name in schema.model_fields if hasattr(model.__table__.c, name)]
+    names += [name for name in extra if name not in names]
+    return [getattr(model, name) for name in names]
+
+FLASHCARD_COLUMNS = _schema_columns(Flashcard, FlashcardResponse)
+FLASHCARD_CONTENT_COLUMNS = _schema_columns(Flashcard, FlashcardContent)
+FLASHCARD_PROGRESS_COLUMNS = _schema_columns(Flashcard, FlashcardProgress)
+MCQ_COLUMNS = _schema_columns(MCQQuestion, MCQQuestionResponse)
+SENTENCE_COLUMNS = _schema_columns(VocabularySentence, VocabularySentenceResponse, extra=("flashcard_id",))
+TEST_RESULT_COLUMNS = _schema_columns(TestResult, TestResultResponse)
+
+def _rows_as_dicts(rows) -> List[Dict[str, Any]]:
+    return [row._asdict() for row in rows]
+
+def _group_by_flashcard(rows, drop_key: bool = False) -> Dict[int, List[Dict[str, Any]]]:
+    grouped = defaultdict(list)
+    for row in rows:
+        item = row._asdict()
+        flashcard_id = item.pop("flashcard_id") if drop_key else item["flashcard_id"]
+        grouped[flashcard_id].append(item)
+    return grouped
+
+def flashcard_rows(
+    db: Session,
+    plan_id: int,
+    flashcard_ids: Optional[Collection[int]] = None,
+    progress: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Rows for List[FlashcardContent], or List[FlashcardResponse] with
+    `progress` (only `flashcard_ids` if given). Versioned deck payloads leave
+    progress out so study sessions don't change their ETag.
+    """
+    columns = FLASHCARD_COLUMNS if progress else FLASHCARD_CONTENT_COLUMNS
+    query = db.query(*columns).filter(Flashcard.study_plan_id == plan_id)
+    if flashcard_ids is not None:
+        query = query.filter(Flashcard.id.in_(list(flashcard_ids)))
+    return _rows_as_dicts(query.order_by(Flashcard.id))
+
+def flashcard_content_rows(
+    db: Session,
+    plan_id: int,
+    include_sentences: bool = False,
+    flashcard_ids: Optional[Collection[int]] = None,
+    progress: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Rows for List[FlashcardWithQuestions] (or FlashcardWithContent with
+    `include_sentences`): one query per table, joined on the plan id rather than
+    an IN list so the statement size doesn't grow with the deck. With
+    `flashcard_ids` (a session's worth of cards) only those cards are read.
+    `progress` adds mastery_level and times_studied as in flashcard_rows().
+    """
+    cards = flashcard_rows(db, plan_id, flashcard_ids, progress)
+
+    def _for_cards(query, model):
+        if flashcard_ids is not None:
+            return query.filter(model.flashcard_id.in_([card["id"] for card in cards]))
+        return query.join(Flashcard, model.flashcard_id == Flashcard.id).filter(Flashcard.study_plan_id == plan_id)
+
+    mcqs = _group_by_flashcard(
+        _for_cards(db.query(*MCQ_COLUMNS), MCQQuestion).order_by(MCQQuestion.id)
+    )
+    for card in cards:
+        card["mcq_questions"] = mcqs.get(card["id"], [])
+
+    if include_sentences:
+        sentences = _group_by_flashcard(
+            _for_cards(db.query(*SENTENCE_COLUMNS), VocabularySentence).order_by(VocabularySentence.id),
+            drop_key=True
+        )
+        for card in cards:
+            card["vocabulary_sentences"] = sentences.get(card["id"], [])
+
+    return cards
+
+def flashcard_progress_rows(db: Session, plan_id: int) -> List[Dict[str, Any]]:
+    """Rows for List[FlashcardProgress]: the per-card progress left out of the deck payloads."""
+    return _rows_as_dicts(
+        db.query(*FLASHCARD_PROGRESS_COLUMNS).filter(Flashcard.study_plan_id == plan_id).order_by(Flashcard.id)
+    )
+
+def test_result_rows(db: Session, plan_id: int) -> List[Dict[str, Any]]:
+    """Rows for List[TestResultResponse], newest first."""
+    return _rows_as_dicts(
+        db.query(*TEST_RESULT_COLUMNS).filter(TestResult.study_plan_id == plan_id)
+        .order_by(TestResult.created_at.desc())
+    )
+
+def _accept_qualities(accept: str) -> Dict[str, float]:
+    """Media range -> q of an Accept header (1 if not given, 0 if malformed)."""
+    qualities: Dict[str, float] = {}
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities.setdefault(media_type.lower(), quality)
+    return qualities
+
+def wants_msgpack(request: Request) -> bool:
+    """MessagePack if the client names it with q > 0 and prefers it at least as much as JSON."""
+    if msgpack is None:
+        return False
+    qualities = _accept_qualities(request.headers.get("accept", ""))
+    msgpack_quality = max(qualities.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES)
+    if msgpack_quality <= 0:
+        return False
+    json_quality = next(
+        (qualities[media_range] for media_range in (JSON_MEDIA_TYPE, "application/*", "*/*") if media_range in qualities),
+        0.0
+    )
+    return msgpack_quality >= json_quality
+
+def add_vary(headers, *fields: str):
+    """Add `fields` to the Vary header of `headers`, keeping the ones already listed."""
+    listed = [field.strip() for field in headers.get("vary", "").split(",") if field.strip()]
+    known = {field.lower() for field in listed}
+    listed += [field for field in fields if field.lower() not in known]
+    headers["Vary"] = ", ".join(listed)
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+def encode_json(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
+
+def encode_msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, default=_default, use_bin_type=True)
+
+def serialized_response(request: Request, payload: Any, response: Optional[Response] = None) -> Response:
+    """
+    Encode `payload` as MessagePack if the client asked for it, JSON otherwise.
+    Headers already set on the endpoint's `response` parameter (ETag etc.) are kept.
+    """
+    if wants_msgpack(request):
+        body, media_type = encode_msgpack(payload), MSGPACK_MEDIA_TYPES[0]
+    else:
+        body, media_type = encode_json(payload), JSON_MEDIA_TYPE
+    encoded = Response(content=body, media_type=media_type)
+    if response is not None:
+        for name, value in response.headers.items():
+            if name not in ("content-length", "content-type"):
+                encoded.headers[name] = value
+    add_vary(encoded.headers, "Accept")
+    return encoded
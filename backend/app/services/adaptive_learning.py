@@ -1,11 +1,14 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime, timedelta
+from typing import Optional
 import math
 from app.models import (
-    StudyPlan, Flashcard, UserLearningProfile, Task, TaskType, StudyMode, 
+    StudyPlan, Flashcard, UserLearningProfile, TaskType, StudyMode, 
     PreAssessment, MaterialCategory, User
 )
+from app.services.rescheduler import TaskRescheduler, schedule_day
+from app.services.user_scheduler import UserScheduler
 
 class AdaptiveLearningService:
     def __init__(self, db: Session):
@@ -50,11 +53,13 @@ class AdaptiveLearningService:
         final_speed = base_speed * subject_modifier * assessment_modifier
         return round(final_speed, 1)
 
-    def generate_adaptive_schedule(self, study_plan_id: int):
+    def generate_adaptive_schedule(self, study_plan_id: int, now: Optional[datetime] = None):
         """
         Regenerates tasks for the study plan based on adaptive logic.
         Progressive Difficulty: Quiz (Easy) -> Flashcard (Med) -> Write (Hard)
+        `now` (naive UTC) defaults to the current time; the simulation harness passes its clock.
         """
+        now = now or datetime.utcnow()
         plan = self.db.query(StudyPlan).filter(StudyPlan.id == study_plan_id).first()
         if not plan:
             return None
@@ -77,7 +82,7 @@ class AdaptiveLearningService:
             # Default to 7 days if no date
             days_available = 7
         else:
-            days_available = (plan.exam_date.replace(tzinfo=None) - datetime.utcnow()).days
+            days_available = (plan.exam_date.replace(tzinfo=None) - now).days
             days_available = max(1, days_available)
             
         # 3. Calculate Daily Load
@@ -94,12 +99,7 @@ class AdaptiveLearningService:
         daily_capacity = speed_items_per_hour * daily_hours
         
         # 4. Generate Phases
-        # Clear existing tasks (except completed ones? For now simplified: clear all incomplete)
-        self.db.query(Task).filter(
-            Task.study_plan_id == study_plan_id, 
-            Task.completion_status == False
-        ).delete()
-        
+        # Only open tasks are rescheduled; completed ones stay as history
         tasks_to_create = []
         
         # Phase 1: Recognition (First 30% of days) - Quiz & Match
@@ -110,22 +110,25 @@ class AdaptiveLearningService:
         phase3_days = days_available - phase1_days - phase2_days
         
         current_day = 1
+        today = now.date()
+        # Day numbers count from the plan's start, so a replan doesn't renumber every task
+        plan_start = schedule_day(plan.created_at).date() if plan.created_at else today
         
         # Helper to create daily tasks
         def create_daily_task(day, mode, title, duration, rationale):
-            return Task(
-                study_plan_id=study_plan_id,
-                title=title,
-                description=f"Adaptive session focusing on {len(learning_items)} items.",
-                type=TaskType.FLASHCARD_REVIEW, # Generic type mapping for now
-                mode=mode,
-                priority=1,
-                estimated_minutes=int(duration),
-                day_number=day,
-                rationale=rationale,
-                completion_status=False,
-                scheduled_date=datetime.utcnow() + timedelta(days=day-1)
-            )
+            scheduled = today + timedelta(days=day-1)
+            return {
+                "title": title,
+                "description": f"Adaptive session focusing on {len(learning_items)} items.",
+                "type": TaskType.FLASHCARD_REVIEW, # Generic type mapping for now
+                "mode": mode,
+                "priority": 1,
+                "estimated_minutes": int(duration),
+                "day_number": max(1, (scheduled - plan_start).days + 1),
+                "rationale": rationale,
+                "scheduled_date": scheduled,
+                "order": 0
+            }
 
         # Generate Phase 1
         for d in range(phase1_days):
@@ -154,7 +157,9 @@ class AdaptiveLearningService:
             ))
             current_day += 1
 
-        self.db.add_all(tasks_to_create)
+        # Diff against the open tasks: unchanged days keep their rows and ids
+        TaskRescheduler(self.db).apply(study_plan_id, tasks_to_create)
         self.db.commit()
+        UserScheduler(self.db).rebalance(user.id, today, schedule_changed=True)
         
         return len(tasks_to_create)
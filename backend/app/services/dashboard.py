@@ -0,0 +1,165 @@
+"""
+Materialized dashboard statistics.
+
+/analytics/dashboard used to rebuild its response from about ten queries on
+every load. DashboardService keeps the serialized response per user in
+dashboard_snapshots and rebuilds it only when the snapshot was invalidated
+(task, test result, plan, pre-assessment, session or profile writes; see the
+flush events in app/models.py) or has expired (UTC midnight, or an upcoming
+exam date passing).
+
+Every invalidation bumps the snapshot's version, and a rebuild is only stored
+if the version it started from is still current, so a write that lands while
+the dashboard is being computed is never masked by an older snapshot.
+"""
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import (
+    User, StudyPlan, StudyPlanStatus, Task, TestResult, PreAssessment, UserLearningProfile,
+    DashboardSnapshot, TaskType, StudyMode
+)
+from app.schemas import DashboardStats, StudyPlanResponse, TaskResponse
+from app.serialization import encode_json
+from app.services.study_activity import StudyActivityService, day_bounds
+
+ACTIVE_STATUSES = (StudyPlanStatus.ACTIVE, StudyPlanStatus.AWAITING_APPROVAL)
+
+def _utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    return value
+
+
+class DashboardService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_payload(self, user: User) -> bytes:
+        """The user's dashboard as JSON bytes: one keyed read unless the snapshot must be rebuilt."""
+        now = datetime.utcnow()
+        snapshot = self.db.query(
+            DashboardSnapshot.payload,
+            DashboardSnapshot.version,
+            DashboardSnapshot.stale,
+            DashboardSnapshot.valid_until
+        ).filter(DashboardSnapshot.user_id == user.id).first()
+
+        if snapshot and snapshot.payload and not snapshot.stale and snapshot.valid_until and snapshot.valid_until > now:
+            return snapshot.payload
+
+        version = snapshot.version if snapshot else self._create_snapshot_row(user.id)
+        stats, valid_until = self.compute(user, now)
+        payload = encode_json(stats.model_dump(mode="json"))
+
+        snapshots = DashboardSnapshot.__table__
+        self.db.execute(
+            update(snapshots)
+            .where(snapshots.c.user_id == user.id, snapshots.c.version == version)
+            .values(payload=payload, stale=False, valid_until=valid_until, computed_at=now)
+        )
+        self.db.commit()
+        return payload
+
+    def _create_snapshot_row(self, user_id: int) -> int:
+        """
+        Insert an empty, stale snapshot before the first build so invalidations
+        that race with it have a row to bump. Returns its version.
+        """
+        try:
+            self.db.add(DashboardSnapshot(user_id=user_id, version=0, stale=True))
+            self.db.commit()
+            return 0
+        except IntegrityError:
+            # A concurrent request created it first
+            self.db.rollback()
+            return self.db.query(DashboardSnapshot.version).filter(DashboardSnapshot.user_id == user_id).scalar()
+
+    def compute(self, user: User, now: Optional[datetime] = None) -> Tuple[DashboardStats, datetime]:
+        """Build the dashboard from the database. Returns it with the time it stops being valid."""
+        now = now or datetime.utcnow()
+        today = now.date()
+        valid_until = datetime.combine(today + timedelta(days=1), datetime.min.time())
+
+        # All plan-level figures come from one read of the user's plans
+        plans = self.db.query(StudyPlan).filter(
+            StudyPlan.user_id == user.id
+        ).order_by(StudyPlan.created_at.desc()).all()
+        plans_by_id = {plan.id: plan for plan in plans}
+
+        active_plans = [plan for plan in plans if plan.status in ACTIVE_STATUSES]
+        overall_progress = 0.0
+        if active_plans:
+            overall_progress = sum(p.progress_percentage for p in active_plans) / len(active_plans)
+
+        upcoming = sorted(
+            (plan for plan in plans
+             if plan.status == StudyPlanStatus.ACTIVE and plan.exam_date is not None
+             and _utc_naive(plan.exam_date) > now),
+            key=lambda plan: _utc_naive(plan.exam_date)
+        )[:5]
+        if upcoming:
+            # The list changes as soon as the nearest exam has passed
+            valid_until = min(valid_until, _utc_naive(upcoming[0].exam_date))
+
+        avg_score_result = self.db.query(func.avg(TestResult.score)).join(StudyPlan).filter(
+            StudyPlan.user_id == user.id
+        ).scalar()
+
+        study_streak = StudyActivityService(self.db).get_streak(user.id, today)["streak"]
+
+        # Same tasks and order as /tasks/today: an index range on scheduled_date, nearest exam first
+        today_start, today_end = day_bounds(today)
+        today_tasks = self.db.query(Task).join(StudyPlan).filter(
+            StudyPlan.user_id == user.id,
+            Task.scheduled_date >= today_start,
+            Task.scheduled_date < today_end,
+            Task.completion_status == False
+        ).order_by(StudyPlan.exam_date.is_(None), StudyPlan.exam_date, Task.order).all()
+        today_tasks_response = [TaskResponse.from_orm(t) for t in today_tasks]
+
+        # Pending pre-assessments come first as synthetic tasks
+        pending_plan_ids = [
+            plan_id for (plan_id,) in self.db.query(PreAssessment.study_plan_id).join(StudyPlan).filter(
+                StudyPlan.user_id == user.id,
+                PreAssessment.status == "pending"
+            )
+        ]
+        for plan_id in pending_plan_ids:
+            today_tasks_response.insert(0, TaskResponse(
+                id=0,  # Dummy ID, not used for pre-assessment navigation
+                study_plan_id=plan_id,
+                title=f"Initial Assessment: {plans_by_id[plan_id].name}",
+                description="Complete the initial assessment to personalize your study plan.",
+                type=TaskType.PRE_ASSESSMENT,
+                mode=StudyMode.PRE_ASSESSMENT,
+                estimated_minutes=15,
+                day_number=0,
+                rationale="Essential for calibrating your learning path.",
+                completion_status=False,
+                scheduled_date=now,
+                order=-1
+            ))
+
+        profile = self.db.query(
+            UserLearningProfile.learning_efficiency_factor,
+            UserLearningProfile.subject_strengths
+        ).filter(UserLearningProfile.user_id == user.id).first()
+
+        stats = DashboardStats(
+            total_study_plans=len(plans),
+            average_test_score=float(avg_score_result) if avg_score_result else 0.0,
+            overall_progress=overall_progress,
+            study_streak=study_streak,
+            tests_rocked=sum(1 for plan in plans if plan.status == StudyPlanStatus.COMPLETED),
+            active_study_plan=StudyPlanResponse.from_orm(active_plans[0]) if active_plans else None,
+            today_tasks=today_tasks_response,
+            upcoming_exams=[StudyPlanResponse.from_orm(p) for p in upcoming],
+            learning_efficiency=profile.learning_efficiency_factor if profile else 1.0,
+            subject_strengths=profile.subject_strengths if profile else {}
+        )
+        return stats, valid_until
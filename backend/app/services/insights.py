@@ -0,0 +1,374 @@
+"""
+Learning insights computed from the raw study events.
+
+Events are loaded as one structured numpy array (app/event_store.RECORD_DTYPE:
+time, user, plan, card, response time, mode, correctness) - memory-mapped from
+the event store, or read from study_session_tracking when the store is
+disabled - and every figure is a handful of vectorized passes (lexsort,
+np.unique, bincount, cumsum) over the whole array. There is no Python loop
+per event or per card, so 100k events take milliseconds.
+
+- per mode: events, accuracy, response-time percentiles
+- per card: learning curve (accuracy by attempt number) and recent accuracy
+- time of day: accuracy and response time per hour
+- per plan: cards known now and projected at the exam date
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.auth_cache import TTLCache
+from app.config import settings
+from app.event_store import event_store, RECORD_DTYPE
+from app.models import StudyPlan, StudyPlanStatus, Flashcard, StudySessionTracking
+from app.serialization import encode_json
+
+CURVE_ATTEMPTS = 10          # Learning curves track attempts 1..10 (10 = "10 or later")
+RECENT_ATTEMPTS = 3          # Window for a card's recent accuracy
+KNOWN_ACCURACY = 0.8         # Recent accuracy from which a card counts as known
+MIN_EVENTS_PER_HOUR = 10     # Hours with fewer events are not considered for best_hour
+RT_PERCENTILES = (0.5, 0.9)
+DAY_MS = 86_400_000
+
+insights_cache = TTLCache(settings.INSIGHTS_CACHE_MAX_ENTRIES, settings.INSIGHTS_CACHE_TTL_SECONDS)
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+def _positions(sorted_ids: np.ndarray, values: np.ndarray):
+    """Index of each value in `sorted_ids`, and the mask of values that occur there."""
+    index = np.searchsorted(sorted_ids, values)
+    clipped = np.minimum(index, len(sorted_ids) - 1)
+    return clipped, (index < len(sorted_ids)) & (sorted_ids[clipped] == values)
+
+def _round(value, digits: int = 3) -> Optional[float]:
+    return None if value is None or np.isnan(value) else round(float(value), digits)
+
+def _pack(high: np.ndarray, low: np.ndarray) -> np.ndarray:
+    """
+    Two unsigned columns (< 2**32) as one uint64 that sorts by `high`, then
+    `low`: one np.sort on it is several times faster than np.lexsort.
+    """
+    return (high.astype(np.uint64) << np.uint64(32)) | low.astype(np.uint64)
+
+def _runs(sorted_keys: np.ndarray):
+    """(unique keys, run starts, run lengths) of an already sorted array, without np.unique's re-sort."""
+    if len(sorted_keys) == 0:
+        return sorted_keys, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+    counts = np.diff(np.append(starts, len(sorted_keys)))
+    return sorted_keys[starts], starts, counts
+
+def group_quantiles(keys: np.ndarray, values: np.ndarray, quantiles: Sequence[float]):
+    """Linear-interpolated quantiles of `values` per distinct key: (unique keys, [groups x quantiles])."""
+    packed = np.sort(_pack(keys, values))
+    sorted_keys = (packed >> np.uint64(32)).astype(keys.dtype)
+    sorted_values = (packed & np.uint64(0xFFFFFFFF)).astype("f8")
+    unique_keys, starts, counts = _runs(sorted_keys)
+    result = np.empty((len(unique_keys), len(quantiles)))
+    for column, q in enumerate(quantiles):
+        position = (counts - 1) * q
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        fraction = position - low
+        result[:, column] = sorted_values[starts + low] * (1 - fraction) + sorted_values[starts + high] * fraction
+    return unique_keys, result
+
+
+def order_by_card(records: np.ndarray, mask: np.ndarray):
+    """
+    Order the masked events by card, then time. Returns (order into
+    records[mask], card ids, run starts, run lengths). Store scans are already
+    (nearly) time-ordered, so the time sort is usually skipped.
+    """
+    ts = records["ts_ms"][mask]
+    cards = records["flashcard_id"][mask]
+    time_order = np.arange(len(ts)) if np.all(ts[1:] >= ts[:-1]) else np.argsort(ts, kind="stable")
+    by_card = (np.sort(_pack(cards[time_order], np.arange(len(ts)))) & np.uint64(0xFFFFFFFF)).astype(np.int64)
+    order = time_order[by_card]
+    card_ids, starts, counts = _runs(cards[order])
+    return order, card_ids, starts, counts
+
+
+# --- vectorized passes ---------------------------------------------------------
+
+def mode_insights(records: np.ndarray, mode_names: Dict[int, str]) -> List[Dict[str, Any]]:
+    if len(records) == 0:
+        return []
+    # Mode codes are one byte, so bincount over them directly
+    codes = records["mode"]
+    all_events = np.bincount(codes, minlength=256)
+    modes = np.flatnonzero(all_events)
+    events = all_events[modes]
+    answered = np.bincount(codes, weights=records["is_correct"] >= 0, minlength=256)[modes]
+    correct = np.bincount(codes, weights=records["is_correct"] == 1, minlength=256)[modes]
+    accuracy = _ratio(correct, answered)
+
+    timed = records["response_time_ms"] > 0
+    percentiles = {}
+    if timed.any():
+        timed_modes, values = group_quantiles(records["mode"][timed], records["response_time_ms"][timed], RT_PERCENTILES)
+        percentiles = dict(zip(timed_modes.tolist(), values.tolist()))
+
+    result = []
+    for i, code in enumerate(modes.tolist()):
+        quantiles = percentiles.get(code)
+        result.append({
+            "mode": mode_names.get(code, str(code)),
+            "events": int(events[i]),
+            "accuracy": _round(accuracy[i]),
+            "response_time_ms": {
+                f"p{int(q * 100)}": round(quantiles[j]) if quantiles else None
+                for j, q in enumerate(RT_PERCENTILES)
+            },
+        })
+    return sorted(result, key=lambda row: -row["events"])
+
+def card_stats(records: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-card arrays (cards sorted by id): plan, attempts, accuracy, recent accuracy, curve, known."""
+    has_card = records["flashcard_id"] > 0
+    if not has_card.any():
+        empty = np.zeros(0)
+        return {"flashcard_id": empty.astype("u4"), "plan_id": empty.astype("u4"), "attempts": empty,
+                "accuracy": empty, "recent_accuracy": empty, "curve": np.zeros((0, CURVE_ATTEMPTS)),
+                "known": empty.astype(bool), "first_ts_ms": empty}
+
+    order, card_ids, starts, counts = order_by_card(records, has_card)
+    is_correct = records["is_correct"][has_card][order]
+    ts = records["ts_ms"][has_card]
+    ends = starts + counts
+
+    # Attempt number of each event within its card (0-based), capped for the curve
+    attempt = np.arange(len(order)) - np.repeat(starts, counts)
+    card_index = np.repeat(np.arange(len(card_ids)), counts)
+    answered = is_correct >= 0
+    correct = is_correct == 1
+
+    bucket = card_index * CURVE_ATTEMPTS + np.minimum(attempt, CURVE_ATTEMPTS - 1)
+    size = len(card_ids) * CURVE_ATTEMPTS
+    curve = _ratio(
+        np.bincount(bucket, weights=correct, minlength=size),
+        np.bincount(bucket, weights=answered, minlength=size)
+    ).reshape(len(card_ids), CURVE_ATTEMPTS)
+
+    # Totals and the last RECENT_ATTEMPTS window from prefix sums
+    correct_sums = np.concatenate([[0], np.cumsum(correct)])
+    answered_sums = np.concatenate([[0], np.cumsum(answered)])
+    recent_starts = np.maximum(starts, ends - RECENT_ATTEMPTS)
+    accuracy = _ratio(correct_sums[ends] - correct_sums[starts], answered_sums[ends] - answered_sums[starts])
+    recent_accuracy = _ratio(
+        correct_sums[ends] - correct_sums[recent_starts],
+        answered_sums[ends] - answered_sums[recent_starts]
+    )
+    last_correct = correct[ends - 1]
+
+    return {
+        "flashcard_id": card_ids,
+        "plan_id": records["plan_id"][has_card][order[starts]],
+        "attempts": counts,
+        "accuracy": accuracy,
+        "recent_accuracy": recent_accuracy,
+        "curve": curve,
+        "known": last_correct & (np.nan_to_num(recent_accuracy) >= KNOWN_ACCURACY),
+        "first_ts_ms": ts[order[starts]],
+    }
+
+def card_curves(stats: Dict[str, np.ndarray], limit: int) -> List[Dict[str, Any]]:
+    """The `limit` weakest cards (lowest recent accuracy first) with their learning curves."""
+    order = np.argsort(np.nan_to_num(stats["recent_accuracy"], nan=-1.0), kind="stable")[:limit]
+    return [
+        {
+            "flashcard_id": int(stats["flashcard_id"][i]),
+            "study_plan_id": int(stats["plan_id"][i]),
+            "attempts": int(stats["attempts"][i]),
+            "accuracy": _round(stats["accuracy"][i]),
+            "recent_accuracy": _round(stats["recent_accuracy"][i]),
+            "known": bool(stats["known"][i]),
+            "curve": [_round(value) for value in stats["curve"][i][:min(int(stats["attempts"][i]), CURVE_ATTEMPTS)]],
+        }
+        for i in order.tolist()
+    ]
+
+def time_of_day(records: np.ndarray, tz_offset_minutes: int = 0) -> Dict[str, Any]:
+    hours = ((records["ts_ms"] // 1000 + tz_offset_minutes * 60) // 3600) % 24
+    answered = records["is_correct"] >= 0
+    timed = records["response_time_ms"] > 0
+    events = np.bincount(hours, minlength=24)
+    accuracy = _ratio(
+        np.bincount(hours, weights=records["is_correct"] == 1, minlength=24),
+        np.bincount(hours, weights=answered, minlength=24)
+    )
+    response_time = _ratio(
+        np.bincount(hours, weights=np.where(timed, records["response_time_ms"], 0), minlength=24),
+        np.bincount(hours, weights=timed, minlength=24)
+    )
+    eligible = np.where(events >= MIN_EVENTS_PER_HOUR, np.nan_to_num(accuracy, nan=-1.0), -1.0)
+    return {
+        "hours": [
+            {"hour": hour, "events": int(events[hour]), "accuracy": _round(accuracy[hour]),
+             "avg_response_time_ms": _round(response_time[hour], 0)}
+            for hour in range(24)
+        ],
+        "best_hour": int(np.argmax(eligible)) if eligible.max() >= 0 else None,
+    }
+
+def plan_readiness(records: np.ndarray, stats: Dict[str, np.ndarray], plans: Dict[int, Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """
+    Share of each plan's cards known now, and projected at the exam date from
+    the plan's pace so far (cards known per day since its first event).
+    """
+    now_ms = int((now - datetime(1970, 1, 1)).total_seconds() * 1000)
+    plan_ids = np.array(sorted(plans), dtype="u4")
+    if len(plan_ids) == 0:
+        return []
+
+    # Per plan: cards studied/known and the first event, via bincount over the card arrays
+    card_plan, in_plans = _positions(plan_ids, stats["plan_id"])
+    card_plan, known = card_plan[in_plans], stats["known"][in_plans]
+    studied_cards = np.bincount(card_plan, minlength=len(plan_ids))
+    known_cards = np.bincount(card_plan, weights=known, minlength=len(plan_ids))
+    first_ts = np.full(len(plan_ids), now_ms, dtype="i8")
+    np.minimum.at(first_ts, card_plan, stats["first_ts_ms"][in_plans])
+
+    # Accuracy over the last 7 days per plan
+    event_plan, in_plans = _positions(plan_ids, records["plan_id"])
+    recent = (records["ts_ms"] >= now_ms - 7 * DAY_MS) & in_plans
+    recent_plan = event_plan[recent]
+    recent_accuracy = _ratio(
+        np.bincount(recent_plan, weights=records["is_correct"][recent] == 1, minlength=len(plan_ids)),
+        np.bincount(recent_plan, weights=records["is_correct"][recent] >= 0, minlength=len(plan_ids))
+    )
+
+    result = []
+    for i, plan_id in enumerate(plan_ids.tolist()):
+        plan = plans[plan_id]
+        total = max(plan["card_count"], int(studied_cards[i]))
+        days_studying = max((now_ms - first_ts[i]) / DAY_MS, 1.0)
+        cards_per_day = known_cards[i] / days_studying
+        exam_date = plan["exam_date"]
+        days_left = max((exam_date - now).total_seconds() / 86400, 0.0) if exam_date else None
+        projected = None
+        if total and days_left is not None:
+            projected = min(total, known_cards[i] + cards_per_day * days_left) / total
+        result.append({
+            "study_plan_id": plan_id,
+            "name": plan["name"],
+            "cards": total,
+            "cards_studied": int(studied_cards[i]),
+            "cards_known": int(known_cards[i]),
+            "readiness": _round(known_cards[i] / total) if total else None,
+            "accuracy_7d": _round(recent_accuracy[i]),
+            "cards_known_per_day": _round(cards_per_day, 2),
+            "days_until_exam": _round(days_left, 1),
+            "projected_readiness": _round(projected),
+        })
+    return result
+
+
+# --- loading + caching ---------------------------------------------------------
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = (value - value.utcoffset()).replace(tzinfo=None)
+    return value
+
+
+def load_event_records(
+    db: Session,
+    user_id: Optional[int] = None,
+    plan_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+):
+    """
+    (records, mode code -> name) for the matching events: memory-mapped from the
+    event store, or read from study_session_tracking when the store is disabled.
+    """
+    if settings.EVENT_STORE_ENABLED:
+        return event_store.load(user_id=user_id, plan_id=plan_id, start=start), event_store.mode_names()
+
+    query = db.query(
+        StudySessionTracking.created_at,
+        StudySessionTracking.user_id,
+        StudySessionTracking.study_plan_id,
+        StudySessionTracking.flashcard_id,
+        StudySessionTracking.response_time_ms,
+        StudySessionTracking.mode,
+        StudySessionTracking.is_correct
+    )
+    if user_id is not None:
+        query = query.filter(StudySessionTracking.user_id == user_id)
+    if plan_id is not None:
+        query = query.filter(StudySessionTracking.study_plan_id == plan_id)
+    if start is not None:
+        query = query.filter(StudySessionTracking.created_at >= start)
+    rows = query.all()
+
+    mode_codes: Dict[str, int] = {}
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    if rows:
+        created_at, user_ids, plan_ids, card_ids, response_times, modes, is_correct = zip(*rows)
+        epoch = datetime(1970, 1, 1)
+        records["ts_ms"] = [int((_naive_utc(value) - epoch).total_seconds() * 1000) for value in created_at]
+        records["user_id"] = user_ids
+        records["plan_id"] = plan_ids
+        records["flashcard_id"] = [card_id or 0 for card_id in card_ids]
+        records["response_time_ms"] = [max(value or 0, 0) for value in response_times]
+        records["mode"] = [mode_codes.setdefault(mode, len(mode_codes) + 1) for mode in modes]
+        records["is_correct"] = [-1 if value is None else int(value) for value in is_correct]
+    return records, {code: mode for mode, code in mode_codes.items()}
+
+
+class InsightsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _plans(self, user_id: int, plan_id: Optional[int]) -> Dict[int, Dict[str, Any]]:
+        query = self.db.query(StudyPlan.id, StudyPlan.name, StudyPlan.exam_date).filter(StudyPlan.user_id == user_id)
+        if plan_id is not None:
+            query = query.filter(StudyPlan.id == plan_id)
+        else:
+            query = query.filter(StudyPlan.status.in_([StudyPlanStatus.ACTIVE, StudyPlanStatus.AWAITING_APPROVAL]))
+        plans = {
+            id_: {"name": name, "exam_date": _naive_utc(exam_date), "card_count": 0}
+            for id_, name, exam_date in query
+        }
+        if plans:
+            for id_, count in self.db.query(Flashcard.study_plan_id, func.count(Flashcard.id)).filter(
+                Flashcard.study_plan_id.in_(list(plans))
+            ).group_by(Flashcard.study_plan_id):
+                plans[id_]["card_count"] = count
+        return plans
+
+    def compute(
+        self,
+        user_id: int,
+        plan_id: Optional[int] = None,
+        days: Optional[int] = None,
+        tz_offset_minutes: int = 0,
+        card_limit: int = 50,
+    ) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        start = now - timedelta(days=days) if days else None
+        records, mode_names = load_event_records(self.db, user_id, plan_id, start)
+        stats = card_stats(records)
+        return {
+            "generated_at": now.isoformat(),
+            "events": int(len(records)),
+            "modes": mode_insights(records, mode_names),
+            "cards": card_curves(stats, card_limit),
+            "time_of_day": time_of_day(records, tz_offset_minutes),
+            "plans": plan_readiness(records, stats, self._plans(user_id, plan_id), now),
+        }
+
+    def get_payload(self, user_id: int, **params) -> bytes:
+        """Serialized insights, cached per user and parameters for INSIGHTS_CACHE_TTL_SECONDS."""
+        key = (user_id, tuple(sorted(params.items())))
+        payload = insights_cache.get(key)
+        if payload is None:
+            payload = encode_json(self.compute(user_id, **params))
+            insights_cache.set(key, payload)
+        return payload
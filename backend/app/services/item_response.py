@@ -0,0 +1,157 @@
+"""
+Item response theory for the adaptive pre-assessment.
+
+The chance that a student of ability theta answers a card of difficulty b
+correctly is the Rasch model
+
+    P(correct) = 1 / (1 + exp(-(theta - b)))
+
+Cards belong to one user's deck, so a card is answered in at most one or two
+pre-assessments and its own difficulty can't be estimated from its answers.
+Instead b is a linear function of features every card has (linear logistic
+test model):
+
+    b = weights . [1, easy, hard, log(1 + len(front)), log(1 + len(back))]
+
+The weights are calibrated offline over every PreAssessmentResponse of all
+users (calibrate_items.py), jointly with one ability per assessment, by
+full-batch Adam on the log likelihood with a N(0, 1) prior on the abilities
+(which fixes the scale). Each calibration is stored as an ItemCalibration row
+and the newest one is used; before the first one, only the difficulty label
+counts (DEFAULT_WEIGHTS).
+
+During an assessment the ability is the posterior mean (EAP) on a grid under
+the same N(0, 1) prior, which stays finite when every answer is right or
+every answer is wrong; its standard error is the posterior standard deviation.
+"""
+import logging
+import math
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import Flashcard, ItemCalibration, PreAssessmentResponse
+
+logger = logging.getLogger("studyahead.item_response")
+
+FEATURES = ("intercept", "easy", "hard", "log_front_length", "log_back_length")
+DEFAULT_WEIGHTS = (0.0, -1.0, 1.0, 0.0, 0.0)
+PRIOR_SD = 1.0
+ABILITY_GRID = np.linspace(-4.0, 4.0, 161)
+L2_WEIGHTS = 1e-3
+
+def item_design(labels: Sequence[str], front_lengths: Sequence[int], back_lengths: Sequence[int]) -> np.ndarray:
+    """Feature matrix (one row per card, FEATURES columns)."""
+    labels = [(label or "medium").lower() for label in labels]
+    return np.column_stack([
+        np.ones(len(labels)),
+        np.array([label == "easy" for label in labels], dtype=float),
+        np.array([label == "hard" for label in labels], dtype=float),
+        np.log1p(np.array(front_lengths, dtype=float)),
+        np.log1p(np.array(back_lengths, dtype=float)),
+    ])
+
+def p_correct(theta, difficulty):
+    return 1 / (1 + np.exp(-(np.asarray(theta) - np.asarray(difficulty))))
+
+def item_information(theta: float, difficulty: np.ndarray) -> np.ndarray:
+    """Fisher information of each item at `theta`: p (1 - p) under the Rasch model."""
+    p = p_correct(theta, difficulty)
+    return p * (1 - p)
+
+def estimate_ability(difficulties: Sequence[float], correct: Sequence[bool]) -> Tuple[float, float]:
+    """EAP ability and its standard error from the answers so far (prior alone if there are none)."""
+    log_posterior = -0.5 * (ABILITY_GRID / PRIOR_SD) ** 2
+    if len(difficulties):
+        p = np.clip(p_correct(ABILITY_GRID[:, None], np.asarray(difficulties)[None, :]), 1e-9, 1 - 1e-9)
+        y = np.asarray(correct, dtype=float)[None, :]
+        log_posterior = log_posterior + (y * np.log(p) + (1 - y) * np.log(1 - p)).sum(axis=1)
+    posterior = np.exp(log_posterior - log_posterior.max())
+    posterior /= posterior.sum()
+    mean = float(posterior @ ABILITY_GRID)
+    return mean, float(math.sqrt(posterior @ (ABILITY_GRID - mean) ** 2))
+
+def _log_loss(predicted: np.ndarray, correct: np.ndarray) -> float:
+    predicted = np.clip(predicted, 1e-6, 1 - 1e-6)
+    return float(-np.mean(correct * np.log(predicted) + (1 - correct) * np.log(1 - predicted)))
+
+
+class ItemCalibrationService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def current_weights(self) -> np.ndarray:
+        row = self.db.query(ItemCalibration.weights).order_by(ItemCalibration.id.desc()).first()
+        return np.array(row.weights if row is not None else DEFAULT_WEIGHTS, dtype=float)
+
+    def deck_difficulties(self, study_plan_id: int) -> Tuple[List[int], np.ndarray]:
+        """Ids and difficulties of every card of the plan, in id order (one column-only read)."""
+        rows = self.db.query(
+            Flashcard.id,
+            Flashcard.difficulty,
+            func.length(Flashcard.front_text),
+            func.length(Flashcard.back_text)
+        ).filter(Flashcard.study_plan_id == study_plan_id).order_by(Flashcard.id).all()
+        if not rows:
+            return [], np.zeros(0)
+        card_ids, labels, front_lengths, back_lengths = zip(*rows)
+        return list(card_ids), item_design(labels, front_lengths, back_lengths) @ self.current_weights()
+
+    def calibrate(self, iterations: int = 500, learning_rate: float = 0.05) -> Dict[str, Any]:
+        """Fit the feature weights on every pre-assessment answer and store them as a new calibration."""
+        rows = self.db.query(
+            PreAssessmentResponse.pre_assessment_id,
+            PreAssessmentResponse.is_correct,
+            Flashcard.difficulty,
+            func.length(Flashcard.front_text),
+            func.length(Flashcard.back_text)
+        ).join(Flashcard, PreAssessmentResponse.flashcard_id == Flashcard.id).all()
+        if not rows:
+            return {"responses": 0}
+
+        assessment_ids, correct, labels, front_lengths, back_lengths = zip(*rows)
+        assessments, person = np.unique(np.array(assessment_ids), return_inverse=True)
+        correct = np.array(correct, dtype=float)
+        design = item_design(labels, front_lengths, back_lengths)
+        n = len(correct)
+
+        weights = np.array(DEFAULT_WEIGHTS, dtype=float)
+        abilities = np.zeros(len(assessments))
+        params = [weights, abilities]
+        moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, iterations + 1):
+            # d NLL / d logit, logit = ability - design . weights
+            grad_z = p_correct(abilities[person], design @ weights) - correct
+            grads = [
+                -design.T @ grad_z / n + L2_WEIGHTS * weights,
+                (np.bincount(person, weights=grad_z, minlength=len(abilities)) + abilities / PRIOR_SD ** 2) / n,
+            ]
+            for param, grad, (m, v) in zip(params, grads, moments):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                param -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+        calibration = ItemCalibration(
+            responses=n,
+            assessments=len(assessments),
+            weights=[round(float(value), 4) for value in weights],
+            log_loss=_log_loss(p_correct(abilities[person], design @ weights), correct),
+            baseline_log_loss=_log_loss(np.full(n, correct.mean()), correct)
+        )
+        self.db.add(calibration)
+        self.db.commit()
+
+        summary = {
+            "responses": n,
+            "assessments": len(assessments),
+            "weights": dict(zip(FEATURES, calibration.weights)),
+            "log_loss": calibration.log_loss,
+            "baseline_log_loss": calibration.baseline_log_loss,
+        }
+        logger.info("Item calibration: %s", summary)
+        return summary
@@ -0,0 +1,144 @@
+"""
+Streaming learning statistics.
+
+Each tracking event updates a handful of LearningStat rows (global, the plan's
+category and the study mode) in constant time: the running sums are decayed by
+0.5 ** (elapsed / half-life) and the new event is added, so accuracy and
+response time follow recent performance without re-reading history.
+Response times go into a decayed log-scale histogram from which quantiles are
+estimated.
+"""
+import math
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import LearningStat, StudyPlan
+
+GLOBAL_SCOPE = ("global", "all")
+
+# Bucket i covers [100 * 2**(i/2), 100 * 2**((i+1)/2)) ms: 100ms up to ~7 minutes
+RT_BUCKET_BASE_MS = 100
+RT_BUCKETS = 24
+
+def response_time_bucket(response_time_ms: float) -> int:
+    ratio = max(response_time_ms, RT_BUCKET_BASE_MS) / RT_BUCKET_BASE_MS
+    return min(int(2 * math.log2(ratio)), RT_BUCKETS - 1)
+
+def response_time_quantile(histogram: List[float], q: float) -> Optional[float]:
+    """Approximate q-quantile (ms) from a bucket histogram: geometric middle of the bucket."""
+    total = sum(histogram or [])
+    if total <= 0:
+        return None
+    target = q * total
+    running = 0.0
+    for bucket, weight in enumerate(histogram):
+        running += weight
+        if running >= target:
+            return RT_BUCKET_BASE_MS * 2 ** ((bucket + 0.5) / 2)
+    return RT_BUCKET_BASE_MS * 2 ** ((RT_BUCKETS - 0.5) / 2)
+
+def decay_factor(elapsed_seconds: float, half_life_hours: Optional[float] = None) -> float:
+    half_life = (half_life_hours or settings.LEARNING_STATS_HALF_LIFE_HOURS) * 3600
+    return 0.5 ** (max(elapsed_seconds, 0.0) / half_life)
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    return value.replace(tzinfo=None) if value is not None and value.tzinfo is not None else value
+
+def apply_event(stat: LearningStat, is_correct: Optional[bool], response_time_ms: Optional[int], at: datetime):
+    """Fold one event into `stat` in O(1)."""
+    at = _naive(at)
+    last = _naive(stat.last_event_at)
+    histogram = list(stat.response_time_histogram or [0.0] * RT_BUCKETS)
+
+    if last is None or at >= last:
+        # Age the running sums to `at`, then add the event at full weight
+        decay = decay_factor((at - last).total_seconds()) if last is not None else 1.0
+        stat.decayed_weight = (stat.decayed_weight or 0.0) * decay
+        stat.decayed_correct = (stat.decayed_correct or 0.0) * decay
+        histogram = [weight * decay for weight in histogram]
+        weight = 1.0
+        stat.last_event_at = at
+    else:
+        # Late event (client timestamps in a batch): add it already aged
+        weight = decay_factor((last - at).total_seconds())
+
+    stat.events = (stat.events or 0) + 1
+    stat.decayed_weight += weight
+    if is_correct:
+        stat.decayed_correct += weight
+
+    if response_time_ms is not None and response_time_ms >= 0:
+        histogram[response_time_bucket(response_time_ms)] += weight
+        if stat.response_time_ewma is None:
+            stat.response_time_ewma = float(response_time_ms)
+        else:
+            # Same decay as the sums: the new value's share is weight / total weight
+            alpha = weight / stat.decayed_weight
+            stat.response_time_ewma += alpha * (response_time_ms - stat.response_time_ewma)
+    stat.response_time_histogram = histogram
+
+def accuracy(stat: Optional[LearningStat]) -> Optional[float]:
+    if stat is None or not stat.decayed_weight:
+        return None
+    return stat.decayed_correct / stat.decayed_weight
+
+
+class LearningStatsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_events(self, events: Iterable[Dict[str, Any]]) -> Dict[Tuple[int, str, str], LearningStat]:
+        """
+        Apply a batch of tracking events (dicts as buffered by app/tracking_buffer.py).
+        Reads each touched stat row once and the batch's plan categories in one
+        query; returns the touched stats keyed by (user_id, scope, key).
+        Does not commit.
+        """
+        events = sorted(events, key=lambda event: _naive(event["created_at"]))
+        if not events:
+            return {}
+
+        plan_ids = {event["study_plan_id"] for event in events}
+        categories = {
+            plan_id: category.value if category else None
+            for plan_id, category in self.db.query(StudyPlan.id, StudyPlan.category).filter(StudyPlan.id.in_(plan_ids))
+        }
+
+        keyed_events = []
+        for event in events:
+            scopes = [GLOBAL_SCOPE, ("mode", event["mode"])]
+            category = categories.get(event["study_plan_id"])
+            if category:
+                scopes.append(("category", category))
+            for scope, key in scopes:
+                keyed_events.append(((event["user_id"], scope, key), event))
+
+        stat_keys = {stat_key for stat_key, _ in keyed_events}
+        stats = {
+            (stat.user_id, stat.scope, stat.key): stat
+            for stat in self.db.query(LearningStat).filter(
+                tuple_(LearningStat.user_id, LearningStat.scope, LearningStat.key).in_(list(stat_keys))
+            )
+        }
+
+        for stat_key, event in keyed_events:
+            stat = stats.get(stat_key)
+            if stat is None:
+                user_id, scope, key = stat_key
+                stat = LearningStat(
+                    user_id=user_id, scope=scope, key=key,
+                    events=0, decayed_weight=0.0, decayed_correct=0.0,
+                    response_time_histogram=[0.0] * RT_BUCKETS
+                )
+                self.db.add(stat)
+                stats[stat_key] = stat
+            apply_event(stat, event.get("is_correct"), event.get("response_time_ms"), event["created_at"])
+
+        return {stat_key: stats[stat_key] for stat_key in stat_keys}
+
+    def get_user_stats(self, user_id: int) -> List[LearningStat]:
+        return self.db.query(LearningStat).filter(LearningStat.user_id == user_id).all()
@@ -0,0 +1,78 @@
+"""
+Set-based flashcard mastery writes.
+
+Tests, pre-assessments and study sessions update the mastery of many cards at
+once. MasteryService writes any number of them with one executemany UPDATE
+(plus, for user-facing writes, one IN query that keeps only the user's own
+cards) and leaves the single commit to the caller, so a 200-question test
+costs the same handful of statements as a 2-question one.
+
+Mastery is progress, not deck content: it is served by
+/study-plans/{id}/progress and leaves content_version (and the deck ETags)
+alone.
+"""
+from datetime import datetime
+from typing import Collection, Dict, Mapping, Optional
+
+from sqlalchemy import bindparam, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.models import Flashcard, StudyPlan
+
+def clamp_mastery(level: float) -> float:
+    return max(0.0, min(100.0, float(level)))
+
+
+class MasteryService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def owned_cards(self, user_id: int, flashcard_ids: Collection[int]) -> Dict[int, int]:
+        """Study plan id of each of `flashcard_ids` that belongs to the user (one IN query)."""
+        if not flashcard_ids:
+            return {}
+        return dict(self.db.query(Flashcard.id, Flashcard.study_plan_id).join(StudyPlan).filter(
+            Flashcard.id.in_(list(flashcard_ids)),
+            StudyPlan.user_id == user_id
+        ).all())
+
+    def set_mastery(
+        self,
+        levels: Mapping[int, float],
+        studied: bool = False,
+        unstudied_only: bool = False,
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Set the mastery of every card in `levels` (card id -> 0-100, clamped).
+        `studied` also counts a study (times_studied + 1, last_studied = now);
+        `unstudied_only` leaves cards that were ever studied alone. Does not
+        commit. Returns the number of cards written.
+        """
+        if not levels:
+            return 0
+        cards = Flashcard.__table__
+        values = {
+            "mastery_level": bindparam("new_mastery"),
+            "updated_at": cards.c.updated_at,  # Progress, not a content edit
+        }
+        if studied:
+            values["times_studied"] = func.coalesce(cards.c.times_studied, 0) + 1
+            values["last_studied"] = now or datetime.utcnow()
+        statement = update(cards).where(cards.c.id == bindparam("card_id"))
+        if unstudied_only:
+            statement = statement.where(or_(cards.c.times_studied == 0, cards.c.times_studied.is_(None)))
+
+        self.db.connection().execute(
+            statement.values(**values),
+            [{"card_id": card_id, "new_mastery": clamp_mastery(level)} for card_id, level in levels.items()]
+        )
+        return len(levels)
+
+    def set_user_mastery(self, user_id: int, levels: Mapping[int, float], studied: bool = False,
+                         now: Optional[datetime] = None) -> Dict[int, float]:
+        """set_mastery() for the cards of `levels` that belong to the user; the others are skipped. Does not commit."""
+        owned = self.owned_cards(user_id, levels.keys())
+        written = {card_id: clamp_mastery(level) for card_id, level in levels.items() if card_id in owned}
+        self.set_mastery(written, studied=studied, now=now)
+        return written
@@ -0,0 +1,51 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from app.models import StudyPlan, Task, recount_plan_counters, invalidate_dashboards
+
+class PlanProgressService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def recount(self, study_plan_id: int):
+        """
+        Recomputes one plan's counters from its task rows.
+        Needed after bulk Query.delete()/update() calls, which skip the Task flush events.
+        Also marks the owner's dashboard snapshot stale.
+        """
+        self.db.flush()
+        recount_plan_counters(self.db.connection(), study_plan_id)
+        invalidate_dashboards(self.db.connection(), plan_ids=[study_plan_id])
+        plan = self.db.get(StudyPlan, study_plan_id)
+        if plan is not None:
+            self.db.expire(plan, ["tasks_total_static", "tasks_completed_static", "progress_percentage_static"])
+
+    def reconcile(self, user_id: int = None):
+        """
+        Compares the stored counters with the task rows (one grouped query) and
+        repairs every plan that drifted. Returns the ids of the repaired plans.
+        """
+        counts = self.db.query(
+            Task.study_plan_id,
+            func.count(Task.id),
+            func.sum(case((Task.completion_status == True, 1), else_=0))
+        ).group_by(Task.study_plan_id)
+        actual = {plan_id: (total, completed or 0) for plan_id, total, completed in counts}
+
+        plans = self.db.query(
+            StudyPlan.id,
+            StudyPlan.tasks_total_static,
+            StudyPlan.tasks_completed_static
+        )
+        if user_id is not None:
+            plans = plans.filter(StudyPlan.user_id == user_id)
+
+        repaired = []
+        for plan_id, stored_total, stored_completed in plans:
+            total, completed = actual.get(plan_id, (0, 0))
+            if (stored_total or 0) != total or (stored_completed or 0) != completed:
+                recount_plan_counters(self.db.connection(), plan_id)
+                repaired.append(plan_id)
+        invalidate_dashboards(self.db.connection(), plan_ids=repaired)
+
+        self.db.commit()
+        return repaired
@@ -1,21 +1,44 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.models import (
-    StudyPlan, Flashcard, PreAssessment, PreAssessmentResponse, 
-    PreAssessmentResponse as PreAssessmentResponseModel, # Alias if needed
-    UserLearningProfile
-)
+"""
+Adaptive pre-assessment.
+
+Instead of a fixed random sample of the deck, questions are asked one at a
+time. Each answer updates the student's ability estimate (EAP under the
+Rasch model, see app/services/item_response.py) and the next question is the
+unasked card with the most information at that estimate, i.e. the one the
+student is closest to 50/50 on. The assessment stops once the estimate's
+standard error is at most PRE_ASSESSMENT_TARGET_SE (after at least
+PRE_ASSESSMENT_MIN_QUESTIONS, at most PRE_ASSESSMENT_MAX_QUESTIONS).
+
+The result covers the whole deck: answered cards get the mastery of a right or
+wrong answer, every other never-studied card gets the expected mastery at the
+estimated ability, KNOWN_MASTERY * P(correct).
+"""
 import random
 from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import settings
+from app.models import Flashcard, PreAssessment, PreAssessmentResponse
+from app.services.item_response import ItemCalibrationService, estimate_ability, item_information, p_correct
+from app.services.mastery import MasteryService
+
+KNOWN_MASTERY = 80.0  # Mastery of a card answered correctly
+RANDOMESQUE_ITEMS = 5  # Next question is drawn from this many most informative cards
+
 
 class PreAssessmentService:
     def __init__(self, db: Session):
         self.db = db
+        self.items = ItemCalibrationService(db)
 
     def generate_pre_assessment(self, study_plan_id: int):
         """
-        Generates a pre-assessment for a given study plan.
-        Samples 20-30% of flashcards.
+        Starts the pre-assessment of a study plan with its first question.
+        Further questions are added by answer().
         """
         # Check if already exists
         existing = self.db.query(PreAssessment).filter(
@@ -24,104 +47,157 @@ class PreAssessmentService:
         if existing:
             return existing
 
-        # Get all flashcards
-        flashcards = self.db.query(Flashcard).filter(
-            Flashcard.study_plan_id == study_plan_id
-        ).all()
-        
-        if not flashcards:
+        card_ids, difficulties = self.items.deck_difficulties(study_plan_id)
+        if not card_ids:
             return None
 
-        total_cards = len(flashcards)
-        # Sample size: 25% or max 20 items to keep it short
-        sample_size = min(max(5, int(total_cards * 0.25)), 20)
-        sample_size = min(sample_size, total_cards) # Ensure not more than exists
-        
-        selected_flashcards = random.sample(flashcards, sample_size)
-        
-        # Create questions structure
-        questions_data = []
-        for fc in selected_flashcards:
-            # Prefer MCQ if available, else Flashcard
-            question_type = "flashcard"
-            options = []
-            
-            if fc.mcq_questions:
-                # Use the first MCQ question found
-                mcq = fc.mcq_questions[0]
-                question_type = "mcq"
-                options = mcq.options
-                question_text = mcq.question_text
-            else:
-                question_text = fc.front_text
-                
-            questions_data.append({
-                "flashcard_id": fc.id,
-                "type": question_type,
-                "text": question_text,
-                "options": options,
-                "back_text": fc.back_text # For checking in frontend if needed, strictly front/back
-            })
-
-        # Create Record
+        theta, se = estimate_ability([], [])
+        first = self._next_card(card_ids, difficulties, theta, asked=set())
         pre_assessment = PreAssessment(
             study_plan_id=study_plan_id,
             status="pending",
-            total_questions=len(questions_data),
-            questions_data=questions_data
+            total_questions=1,
+            questions_data=[self._question(first)],
+            ability_estimate=theta,
+            ability_se=se
         )
         self.db.add(pre_assessment)
         self.db.commit()
         self.db.refresh(pre_assessment)
-        
+
         return pre_assessment
 
+    def answer(self, assessment: PreAssessment, flashcard_id: int, is_correct: bool, response_time_ms: Optional[int] = None):
+        """
+        Records the answer to an asked question, updates the ability estimate
+        and either adds the next question or completes the assessment.
+        Raises ValueError for cards that weren't asked or were already answered.
+        """
+        asked = {question["flashcard_id"] for question in assessment.questions_data or []}
+        answers = self._answers(assessment.id)
+        if flashcard_id not in asked:
+            raise ValueError("This card is not part of the assessment")
+        if flashcard_id in answers:
+            raise ValueError("This question was already answered")
+
+        self.db.add(PreAssessmentResponse(
+            pre_assessment_id=assessment.id,
+            flashcard_id=flashcard_id,
+            is_correct=is_correct,
+            response_time_ms=response_time_ms
+        ))
+        answers[flashcard_id] = is_correct
+
+        card_ids, difficulties = self.items.deck_difficulties(assessment.study_plan_id)
+        theta, se = self._estimate(answers, card_ids, difficulties)
+        assessment.ability_estimate, assessment.ability_se = theta, se
+
+        answered = len(answers)
+        if (answered >= min(settings.PRE_ASSESSMENT_MAX_QUESTIONS, len(card_ids))
+                or (answered >= settings.PRE_ASSESSMENT_MIN_QUESTIONS and se <= settings.PRE_ASSESSMENT_TARGET_SE)):
+            self._complete(assessment, answers, theta, card_ids, difficulties)
+        elif asked <= set(answers):
+            # Only ask the next question once every asked one is answered
+            next_card = self._next_card(card_ids, difficulties, theta, asked)
+            assessment.questions_data = assessment.questions_data + [self._question(next_card)]
+            assessment.total_questions = len(assessment.questions_data)
+
+        self.db.commit()
+        return assessment
+
     def submit_assessment(self, pre_assessment_id: int, responses: list):
         """
-        Processes the submission.
+        Processes a batch of answers at once and completes the assessment.
         Updates Flashcard mastery based on results.
         """
         assessment = self.db.query(PreAssessment).filter(PreAssessment.id == pre_assessment_id).first()
         if not assessment:
             return None
-            
-        correct_count = 0
-        
+
+        card_ids, difficulties = self.items.deck_difficulties(assessment.study_plan_id)
+        deck = set(card_ids)
+        answers = self._answers(assessment.id)
+        rows = []
         for resp in responses:
-            is_correct = resp.is_correct
-            if is_correct:
-                correct_count += 1
-            
-            # Record response
-            db_response = PreAssessmentResponse(
-                pre_assessment_id=assessment.id,
-                flashcard_id=resp.flashcard_id,
-                is_correct=is_correct,
-                response_time_ms=resp.response_time_ms
-            )
-            self.db.add(db_response)
-            
-            # UPDATE FLASHCARD MASTERY
-            # If correct in pre-assessment -> High Mastery (Skip for a while)
-            # If incorrect -> Low Mastery (Need to learn)
-            flashcard = self.db.query(Flashcard).filter(Flashcard.id == resp.flashcard_id).first()
-            if flashcard:
-                if is_correct:
-                    flashcard.mastery_level = 80.0  # High mastery
-                    flashcard.times_studied = 1
-                    flashcard.last_studied = datetime.utcnow()
-                    flashcard.difficulty = "easy" # Mark as easy for now
-                else:
-                    flashcard.mastery_level = 0.0
-                    flashcard.times_studied = 1 # We "studied" it by failing
-                    flashcard.last_studied = datetime.utcnow()
-                    # Keep existing difficulty or set to hard? Keep default "medium" usually.
-        
-        # Update Assessment Status
-        score = (correct_count / assessment.total_questions) * 100 if assessment.total_questions > 0 else 0
-        assessment.correct_score = score
-        assessment.status = "completed"
-        assessment.completed_at = datetime.utcnow()
-        
+            if resp.flashcard_id in answers or resp.flashcard_id not in deck:
+                continue
+            rows.append({
+                "pre_assessment_id": assessment.id,
+                "flashcard_id": resp.flashcard_id,
+                "is_correct": resp.is_correct,
+                "response_time_ms": resp.response_time_ms,
+            })
+            answers[resp.flashcard_id] = resp.is_correct
+        if rows:
+            self.db.connection().execute(insert(PreAssessmentResponse.__table__), rows)
+
+        theta, se = self._estimate(answers, card_ids, difficulties)
+        assessment.ability_estimate, assessment.ability_se = theta, se
+        self._complete(assessment, answers, theta, card_ids, difficulties)
+
         self.db.commit()
         return assessment
+
+    def _answers(self, pre_assessment_id: int) -> Dict[int, bool]:
+        return dict(self.db.query(PreAssessmentResponse.flashcard_id, PreAssessmentResponse.is_correct).filter(
+            PreAssessmentResponse.pre_assessment_id == pre_assessment_id
+        ).all())
+
+    def _estimate(self, answers: Dict[int, bool], card_ids: List[int], difficulties: np.ndarray):
+        difficulty_of = dict(zip(card_ids, difficulties.tolist()))
+        answered = [card_id for card_id in answers if card_id in difficulty_of]
+        return estimate_ability([difficulty_of[card_id] for card_id in answered], [answers[card_id] for card_id in answered])
+
+    def _next_card(self, card_ids: List[int], difficulties: np.ndarray, theta: float, asked: set) -> int:
+        information = item_information(theta, difficulties)
+        ranked = [card_ids[index] for index in np.argsort(-information) if card_ids[index] not in asked]
+        # A random pick among the best few keeps decks of look-alike cards from always starting at the same card
+        return random.choice(ranked[:RANDOMESQUE_ITEMS])
+
+    def _question(self, flashcard_id: int) -> dict:
+        fc = self.db.query(Flashcard).options(
+            selectinload(Flashcard.mcq_questions)
+        ).filter(Flashcard.id == flashcard_id).first()
+
+        # Prefer MCQ if available, else Flashcard
+        if fc.mcq_questions:
+            mcq = fc.mcq_questions[0]
+            question_type, question_text, options = "mcq", mcq.question_text, mcq.options
+        else:
+            question_type, question_text, options = "flashcard", fc.front_text, []
+
+        return {
+            "flashcard_id": fc.id,
+            "type": question_type,
+            "text": question_text,
+            "options": options,
+            "back_text": fc.back_text # For checking in frontend if needed, strictly front/back
+        }
+
+    def _complete(self, assessment: PreAssessment, answers: Dict[int, bool], theta: float,
+                  card_ids: List[int], difficulties: np.ndarray):
+        """Set mastery for the whole deck from the answers and the ability estimate."""
+        now = datetime.utcnow()
+        deck = set(card_ids)
+        mastery = MasteryService(self.db)
+
+        # Answered cards: high mastery if right (skip for a while), none if wrong (need to learn)
+        mastery.set_mastery(
+            {card_id: KNOWN_MASTERY if correct else 0.0 for card_id, correct in answers.items() if card_id in deck},
+            studied=True,
+            now=now
+        )
+        # Everything else that was never studied: expected mastery at the estimated ability
+        mastery.set_mastery(
+            {
+                card_id: round(KNOWN_MASTERY * p, 1)
+                for card_id, p in zip(card_ids, p_correct(theta, difficulties).tolist()) if card_id not in answers
+            },
+            unstudied_only=True
+        )
+
+        correct_count = sum(answers.values())
+        assessment.total_questions = len(answers)
+        assessment.correct_score = correct_count / len(answers) * 100 if answers else 0
+        assessment.status = "completed"
+        assessment.completed_at = now
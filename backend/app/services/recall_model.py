@@ -0,0 +1,230 @@
+"""
+Forgetting-curve model per flashcard (half-life regression).
+
+Recall of a card decays as p = 2 ** (-elapsed / h). The half-life h (hours) is
+predicted as
+
+    log2 h = theta . [1, sqrt(1 + right), sqrt(1 + wrong)] + user_bias + card_bias
+
+where right / wrong are the card's earlier correct / wrong answers. The model
+is fitted in batch over every review in the tracking history (each answer
+after the first one on a card is a training example: elapsed time since the
+previous answer and whether it was recalled), with full-batch Adam on
+whole-array numpy operations, so the fit covers all cards and users at once.
+
+The fitted half-life of every studied card, its recall probability at fit time
+and the time at which recall drops to RECALL_TARGET (the next review) are
+stored on the flashcard. Readers can re-evaluate recall for any moment with
+recall_probability() instead of refitting.
+"""
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Flashcard
+from app.services.insights import load_event_records, order_by_card
+
+logger = logging.getLogger("studyahead.recall_model")
+
+LN2 = math.log(2)
+MIN_HALF_LIFE_HOURS = 0.25
+MAX_HALF_LIFE_HOURS = 274 * 24
+MIN_ELAPSED_HOURS = 1 / 60
+HALF_LIFE_WEIGHT = 0.01      # Weight of the log half-life term next to the recall term
+L2_WEIGHTS = 1e-4
+L2_BIASES = 1e-2             # Keeps card/user biases near 0 until there is evidence
+INITIAL_HALF_LIFE_HOURS = 24.0
+
+def recall_probability(half_life_hours: Optional[float], last_review: Optional[datetime], now: Optional[datetime] = None) -> Optional[float]:
+    """Predicted recall at `now` for a card with the given half-life, last reviewed at `last_review`."""
+    if not half_life_hours or last_review is None:
+        return None
+    if last_review.tzinfo is not None:
+        last_review = (last_review - last_review.utcoffset()).replace(tzinfo=None)
+    elapsed = max(((now or datetime.utcnow()) - last_review).total_seconds() / 3600, 0.0)
+    return 2 ** (-elapsed / half_life_hours)
+
+def review_interval_hours(half_life_hours: float, target: Optional[float] = None) -> float:
+    """Time after a review at which predicted recall falls to `target`."""
+    return half_life_hours * math.log2(1 / (target or settings.RECALL_TARGET))
+
+
+def review_features(records: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Training examples and per-card totals from raw events.
+    Examples: every answered event that has an earlier event on the same card.
+    """
+    has_card = (records["flashcard_id"] > 0) & (records["is_correct"] >= 0)
+    if not has_card.any():
+        empty = np.zeros(0)
+        empty_ids = np.zeros(0, dtype=np.int64)
+        return {
+            "right": empty, "wrong": empty, "elapsed_hours": empty, "recalled": empty,
+            "card": empty_ids, "user": empty_ids,
+            "card_ids": empty_ids, "card_users": empty_ids, "users": empty_ids,
+            "card_right": empty, "card_wrong": empty, "card_last_ts_ms": empty,
+        }
+    order, card_ids, starts, counts = order_by_card(records, has_card)
+    events = records[has_card][order]
+    ends = starts + counts
+
+    correct = events["is_correct"] == 1
+    correct_sums = np.concatenate([[0], np.cumsum(correct)])
+    group_starts = np.repeat(starts, counts)
+    position = np.arange(len(events))
+    right_before = correct_sums[position] - correct_sums[group_starts]
+    wrong_before = (position - group_starts) - right_before
+
+    example = position > group_starts
+    previous_ts = np.roll(events["ts_ms"], 1)
+    elapsed = np.maximum((events["ts_ms"] - previous_ts) / 3_600_000, MIN_ELAPSED_HOURS)
+
+    users, card_users = np.unique(events["user_id"][starts], return_inverse=True)
+    card_index = np.repeat(np.arange(len(card_ids)), counts)
+    return {
+        "right": right_before[example],
+        "wrong": wrong_before[example],
+        "elapsed_hours": elapsed[example],
+        "recalled": correct[example].astype("f8"),
+        "card": card_index[example],
+        "user": card_users[card_index[example]],
+        # Per card, after its last answer
+        "card_ids": card_ids,
+        "card_users": card_users,
+        "users": users,
+        "card_right": correct_sums[ends] - correct_sums[starts],
+        "card_wrong": counts - (correct_sums[ends] - correct_sums[starts]),
+        "card_last_ts_ms": events["ts_ms"][ends - 1],
+    }
+
+def _log_loss(predicted: np.ndarray, recalled: np.ndarray) -> float:
+    predicted = np.clip(predicted, 1e-6, 1 - 1e-6)
+    return float(-np.mean(recalled * np.log(predicted) + (1 - recalled) * np.log(1 - predicted)))
+
+def _design(right: np.ndarray, wrong: np.ndarray) -> np.ndarray:
+    return np.column_stack([np.ones(len(right)), np.sqrt(1 + right), np.sqrt(1 + wrong)])
+
+
+class HalfLifeRegression:
+    def __init__(self, iterations: int = 300, learning_rate: float = 0.05):
+        self.iterations = iterations
+        self.learning_rate = learning_rate
+        self.theta = np.array([math.log2(INITIAL_HALF_LIFE_HOURS), 0.0, 0.0])
+        self.user_bias = np.zeros(0)
+        self.card_bias = np.zeros(0)
+
+    def log2_half_life(self, design: np.ndarray, users: np.ndarray, cards: np.ndarray) -> np.ndarray:
+        z = design @ self.theta + self.user_bias[users] + self.card_bias[cards]
+        return np.clip(z, math.log2(MIN_HALF_LIFE_HOURS), math.log2(MAX_HALF_LIFE_HOURS))
+
+    def fit(self, features: Dict[str, np.ndarray]) -> Dict[str, float]:
+        users, cards = features["user"], features["card"]
+        self.user_bias = np.zeros(len(features["users"]))
+        self.card_bias = np.zeros(len(features["card_ids"]))
+        n = len(cards)
+        if n == 0:
+            return {"examples": 0}
+
+        design = _design(features["right"], features["wrong"])
+        elapsed, recalled = features["elapsed_hours"], features["recalled"]
+        target_recall = np.clip(recalled, 1e-4, 1 - 1e-4)
+        target_z = np.log2(np.clip(-elapsed / np.log2(target_recall), MIN_HALF_LIFE_HOURS, MAX_HALF_LIFE_HOURS))
+
+        params = [self.theta, self.user_bias, self.card_bias]
+        moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, self.iterations + 1):
+            z = self.log2_half_life(design, users, cards)
+            half_life = 2 ** z
+            predicted = 2 ** (-elapsed / half_life)
+            # d loss / d z for (p - y)^2 + w (z - z_target)^2
+            grad_z = (2 * (predicted - recalled) * predicted * LN2 * LN2 * elapsed / half_life
+                      + 2 * HALF_LIFE_WEIGHT * (z - target_z))
+            grads = [
+                design.T @ grad_z / n + L2_WEIGHTS * self.theta,
+                np.bincount(users, weights=grad_z, minlength=len(self.user_bias)) / n + L2_BIASES * self.user_bias,
+                np.bincount(cards, weights=grad_z, minlength=len(self.card_bias)) / n + L2_BIASES * self.card_bias,
+            ]
+            for param, grad, (m, v) in zip(params, grads, moments):
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                param -= self.learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+
+        predicted = 2 ** (-elapsed / 2 ** self.log2_half_life(design, users, cards))
+        baseline = 2 ** (-elapsed / INITIAL_HALF_LIFE_HOURS)
+        return {
+            "examples": n,
+            "log_loss": _log_loss(predicted, recalled),
+            "baseline_log_loss": _log_loss(baseline, recalled),
+            "theta": [round(float(value), 4) for value in self.theta],
+        }
+
+    def card_half_lives(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """Half-life (hours) of every card after its last answer."""
+        design = _design(features["card_right"], features["card_wrong"])
+        return 2 ** self.log2_half_life(design, features["card_users"], np.arange(len(features["card_ids"])))
+
+
+class RecallModelService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def refit(self, user_id: Optional[int] = None, iterations: int = 300) -> Dict[str, Any]:
+        """
+        Fit the model on the tracking history (all users, or one) and store each
+        studied card's half-life, recall probability now and next review time.
+        """
+        now = datetime.utcnow()
+        records, _ = load_event_records(self.db, user_id=user_id)
+        features = review_features(records)
+        model = HalfLifeRegression(iterations=iterations)
+        summary = model.fit(features)
+
+        card_ids = features["card_ids"]
+        if not len(card_ids):
+            logger.info("Recall model refit: no review history")
+            return {"examples": 0, "cards": 0}
+        half_lives = model.card_half_lives(features)
+        now_ms = (now - datetime(1970, 1, 1)).total_seconds() * 1000
+        elapsed = np.maximum((now_ms - features["card_last_ts_ms"]) / 3_600_000, 0.0)
+        recall = 2 ** (-elapsed / half_lives)
+        intervals = half_lives * math.log2(1 / settings.RECALL_TARGET)
+        epoch = datetime(1970, 1, 1)
+        rows = [
+            {
+                "card_id": card_id,
+                "half_life": round(half_life, 3),
+                "recall": round(p, 4),
+                "next_review": epoch + timedelta(milliseconds=last_ms) + timedelta(hours=interval),
+            }
+            for card_id, half_life, p, last_ms, interval in zip(
+                card_ids.tolist(), half_lives.tolist(), recall.tolist(),
+                features["card_last_ts_ms"].tolist(), intervals.tolist()
+            )
+        ]
+        cards = Flashcard.__table__
+        self.db.connection().execute(
+            update(cards)
+            .where(cards.c.id == bindparam("card_id"))
+            .values(
+                half_life_hours=bindparam("half_life"),
+                recall_probability=bindparam("recall"),
+                next_review_at=bindparam("next_review"),
+                recall_updated_at=now,
+                updated_at=cards.c.updated_at  # A model refresh is not a content edit
+            ),
+            rows
+        )
+        self.db.commit()
+
+        summary["cards"] = int(len(card_ids))
+        logger.info("Recall model refit: %s", summary)
+        return summary
@@ -0,0 +1,138 @@
+"""
+Diff-based task rescheduling.
+
+Schedule generators used to delete a plan's tasks and insert the new schedule
+from scratch, so every replan rewrote every row, dropped the task ids clients
+hold and invalidated everything derived from them. TaskRescheduler takes the
+desired schedule as plain dicts, matches it against the existing open tasks
+on (planned day, order) and applies only the difference in one transaction:
+
+- matched tasks whose fields changed are updated in place (same id); where
+  UserScheduler placed them (scheduled_date, and the matching shift of
+  day_number) is kept
+- desired tasks without a match are inserted
+- managed tasks without a match are deleted with one DELETE ... IN
+
+Replanning after a missed day therefore touches the missed task and the few
+days whose content moved, not the whole plan.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Task
+from app.services.plan_progress import PlanProgressService
+
+PRE_ASSESSMENT_TITLE = "Pre-Assessment Test"
+
+# Task fields a schedule generator decides; everything else (completion, ids) is kept.
+# A generator's scheduled_date is also the task's planned_date (see UserScheduler).
+SCHEDULE_FIELDS = (
+    "title", "description", "type", "mode", "priority", "estimated_minutes",
+    "day_number", "rationale", "scheduled_date", "planned_date", "order",
+)
+
+def schedule_day(value) -> Optional[datetime]:
+    """Midnight (naive UTC) of the day a task is scheduled for."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = (value - value.utcoffset()).replace(tzinfo=None)
+        value = value.date()
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    raise TypeError(f"Not a schedule date: {value!r}")
+
+def _slot(planned_date, order) -> tuple:
+    return schedule_day(planned_date), order or 0
+
+def _placement_shift(task: Task) -> int:
+    """Days UserScheduler moved the task past its planned day."""
+    scheduled, planned = schedule_day(task.scheduled_date), schedule_day(task.planned_date)
+    if scheduled is None or planned is None:
+        return 0
+    return (scheduled - planned).days
+
+
+class TaskRescheduler:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def apply(
+        self,
+        study_plan_id: int,
+        desired: List[Dict[str, Any]],
+        keep_completed: bool = True,
+        keep_pre_assessment: bool = True
+    ) -> Dict[str, int]:
+        """
+        Make the plan's managed tasks equal to `desired` (dicts of SCHEDULE_FIELDS)
+        with minimal writes. Managed tasks are the plan's open tasks, plus its
+        completed ones unless `keep_completed`; the pre-assessment task is left
+        alone if `keep_pre_assessment`. Only open tasks are reused for a desired
+        task, so a completed task is never turned into new work.
+        Flushes but does not commit. Returns the counts of each kind of write.
+        """
+        query = self.db.query(Task).filter(Task.study_plan_id == study_plan_id)
+        if keep_completed:
+            query = query.filter(Task.completion_status == False)
+        if keep_pre_assessment:
+            query = query.filter(Task.title != PRE_ASSESSMENT_TITLE)
+        existing = query.order_by(Task.planned_date, Task.order, Task.id).all()
+
+        open_by_slot = defaultdict(list)
+        for task in existing:
+            if not task.completion_status:
+                # Tasks from before planned_date existed are planned where they are shown
+                open_by_slot[_slot(task.planned_date or task.scheduled_date, task.order)].append(task)
+
+        matched = set()
+        inserted = updated = 0
+        for fields in desired:
+            day = schedule_day(fields.get("scheduled_date"))
+            fields = dict(fields, scheduled_date=day, planned_date=day, order=fields.get("order") or 0)
+            candidates = open_by_slot.get(_slot(fields["scheduled_date"], fields["order"]))
+            if not candidates:
+                self.db.add(Task(study_plan_id=study_plan_id, completion_status=False, **fields))
+                inserted += 1
+                continue
+            task = candidates.pop(0)
+            matched.add(task.id)
+            # Same planned day: keep the placement, shifting a renumbered day_number along with it
+            if fields.get("day_number") is not None:
+                fields["day_number"] += _placement_shift(task)
+            changes = {
+                name: value for name, value in fields.items()
+                if name in SCHEDULE_FIELDS and name != "scheduled_date" and not self._same(name, getattr(task, name), value)
+            }
+            for name, value in changes.items():
+                setattr(task, name, value)
+            updated += bool(changes)
+
+        stale_ids = [task.id for task in existing if task.id not in matched]
+        if stale_ids:
+            for task in existing:
+                if task.id not in matched:
+                    self.db.expunge(task)
+            self.db.query(Task).filter(Task.id.in_(stale_ids)).delete(synchronize_session=False)
+
+        self.db.flush()
+        if stale_ids:
+            # The bulk delete skips the counter and dashboard flush events
+            PlanProgressService(self.db).recount(study_plan_id)
+
+        return {
+            "inserted": inserted,
+            "updated": updated,
+            "deleted": len(stale_ids),
+            "unchanged": len(matched) - updated,
+        }
+
+    @staticmethod
+    def _same(name: str, current, value) -> bool:
+        if name in ("scheduled_date", "planned_date"):
+            return schedule_day(current) == value
+        return current == value
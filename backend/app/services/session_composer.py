@@ -0,0 +1,96 @@
+"""
+Server-side study session composition.
+
+Study modes used to download the whole deck and shuffle it on the client to
+build a 20-card session. SessionComposer picks the session on the server:
+
+1. one column-only read of the deck's scheduling state (mastery, SRS
+   stability / last review / due time), no card text
+2. one range read of the user's wrong answers on the plan in the last
+   RECENT_MISS_HOURS (ix_study_session_tracking_user_created)
+3. a priority per card, and heapq.nlargest for the top N: O(deck log N)
+4. card text, MCQs and sentences for those N cards only
+
+so the response, and the client's memory, no longer grow with the deck.
+
+Priority (higher first) adds up:
+- low mastery: 1 - mastery / 100
+- forgetting: 1 - predicted recall now (SRS); cards due for review get
+  OVERDUE_BONUS; never-reviewed cards count as half forgotten
+- recently missed: RECENT_MISS_BONUS
+A little random jitter breaks ties so repeated sessions don't show the same
+order.
+"""
+import heapq
+import random
+from datetime import datetime, timedelta
+from typing import Any, Collection, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Flashcard, StudySessionTracking
+from app.serialization import flashcard_content_rows
+from app.services.srs import retrievability
+
+RECENT_MISS_HOURS = 24
+RECENT_MISS_BONUS = 0.75
+OVERDUE_BONUS = 0.5
+NEW_CARD_FORGETTING = 0.5
+JITTER = 0.05
+
+
+class SessionComposer:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def recently_missed(self, user_id: int, plan_id: int, now: datetime) -> set:
+        """Cards of the plan the user answered wrong in the last RECENT_MISS_HOURS."""
+        return {
+            flashcard_id for (flashcard_id,) in self.db.query(StudySessionTracking.flashcard_id).filter(
+                StudySessionTracking.user_id == user_id,
+                StudySessionTracking.created_at >= now - timedelta(hours=RECENT_MISS_HOURS),
+                StudySessionTracking.study_plan_id == plan_id,
+                StudySessionTracking.is_correct == False,
+                StudySessionTracking.flashcard_id.isnot(None)
+            ).distinct()
+        }
+
+    def priorities(self, user_id: int, plan_id: int, exclude: Collection[int] = (), now: Optional[datetime] = None) -> List[tuple]:
+        """(priority, flashcard_id) for every card of the plan not in `exclude`."""
+        now = now or datetime.utcnow()
+        missed = self.recently_missed(user_id, plan_id, now)
+        exclude = set(exclude)
+        jitter = random.Random()
+
+        scored = []
+        for card_id, mastery, stability, last_review, due_at in self.db.query(
+            Flashcard.id,
+            Flashcard.mastery_level,
+            Flashcard.srs_stability,
+            Flashcard.srs_last_review_at,
+            Flashcard.due_at
+        ).filter(Flashcard.study_plan_id == plan_id):
+            if card_id in exclude:
+                continue
+            priority = 1 - (mastery or 0.0) / 100
+            if stability and last_review:
+                priority += 1 - retrievability((now - last_review).total_seconds() / 86400, stability)
+                if due_at is not None and due_at <= now:
+                    priority += OVERDUE_BONUS
+            else:
+                priority += NEW_CARD_FORGETTING
+            if card_id in missed:
+                priority += RECENT_MISS_BONUS
+            scored.append((priority + jitter.uniform(0, JITTER), card_id))
+        return scored
+
+    def compose(self, user_id: int, plan_id: int, size: int, exclude: Collection[int] = (), now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """The `size` highest-priority cards with their MCQs and sentences, most urgent first."""
+        chosen = heapq.nlargest(size, self.priorities(user_id, plan_id, exclude, now))
+        if not chosen:
+            return []
+        rank = {card_id: position for position, (_, card_id) in enumerate(chosen)}
+        cards = flashcard_content_rows(self.db, plan_id, include_sentences=True, flashcard_ids=list(rank), progress=True)
+        for card in cards:
+            card["priority"] = round(chosen[rank[card["id"]]][0], 3)
+        return sorted(cards, key=lambda card: rank[card["id"]])
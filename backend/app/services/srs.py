@@ -0,0 +1,197 @@
+"""
+Spaced repetition scheduling (FSRS family).
+
+Every flashcard carries a memory state: stability S (days until predicted
+recall falls to 90%), difficulty D (1-10), review/lapse counts and due_at.
+Each graded review (AGAIN / HARD / GOOD / EASY) updates the state with the
+FSRS-4.5 equations and moves due_at to the moment predicted recall reaches
+RECALL_TARGET.
+
+Graded reviews arrive with the tracking events (see grade_from_event): the
+write-behind flush applies a whole batch with one SELECT of the touched cards
+and one executemany UPDATE.
+
+Due cards come from one range read of ix_flashcards_plan_due
+(study_plan_id, due_at), so building a session costs the same for a 20-card
+deck as for a 10,000-card one. Never-reviewed cards have due_at NULL and fill
+the rest of the session.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Flashcard
+
+AGAIN, HARD, GOOD, EASY = 1, 2, 3, 4
+
+# FSRS-4.5 default parameters
+W = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+DECAY = -0.5
+FACTOR = 0.9 ** (1 / DECAY) - 1  # R(S, S) = 0.9
+MIN_STABILITY_DAYS = 0.01
+
+STATE_COLUMNS = (
+    "srs_stability", "srs_difficulty", "srs_reps", "srs_lapses", "srs_last_review_at", "due_at",
+)
+
+def grade_from_event(event: Dict[str, Any]) -> Optional[int]:
+    """Grade of a tracking event: wrong -> AGAIN, right after retries -> HARD, right -> GOOD."""
+    if not event.get("flashcard_id") or event.get("is_correct") is None:
+        return None
+    if not event["is_correct"]:
+        return AGAIN
+    return HARD if (event.get("attempts_needed") or 1) > 1 else GOOD
+
+def retrievability(elapsed_days: float, stability: float) -> float:
+    """Predicted recall `elapsed_days` after a review."""
+    return (1 + FACTOR * max(elapsed_days, 0.0) / stability) ** DECAY
+
+def interval_days(stability: float, target: Optional[float] = None) -> float:
+    """Days after a review at which predicted recall falls to `target`."""
+    target = target or settings.RECALL_TARGET
+    interval = stability / FACTOR * (target ** (1 / DECAY) - 1)
+    return min(interval, settings.SRS_MAX_INTERVAL_DAYS)
+
+def _clamp_difficulty(difficulty: float) -> float:
+    return min(max(difficulty, 1.0), 10.0)
+
+def _initial_difficulty(grade: int) -> float:
+    return _clamp_difficulty(W[4] - (grade - 3) * W[5])
+
+def _next_difficulty(difficulty: float, grade: int) -> float:
+    changed = difficulty - W[6] * (grade - 3)
+    # Mean reversion towards the difficulty of a first GOOD answer
+    return _clamp_difficulty(W[7] * _initial_difficulty(GOOD) + (1 - W[7]) * changed)
+
+def _recall_stability(difficulty: float, stability: float, recall: float, grade: int) -> float:
+    hard_penalty = W[15] if grade == HARD else 1.0
+    easy_bonus = W[16] if grade == EASY else 1.0
+    growth = (math.exp(W[8]) * (11 - difficulty) * stability ** -W[9]
+              * (math.exp(W[10] * (1 - recall)) - 1) * hard_penalty * easy_bonus)
+    return stability * (1 + growth)
+
+def _forget_stability(difficulty: float, stability: float, recall: float) -> float:
+    relearned = (W[11] * difficulty ** -W[12] * ((stability + 1) ** W[13] - 1)
+                 * math.exp(W[14] * (1 - recall)))
+    return min(relearned, stability)
+
+def next_state(state: Dict[str, Any], grade: int, reviewed_at: datetime) -> Dict[str, Any]:
+    """
+    Memory state after a review graded `grade` at `reviewed_at` (naive UTC).
+    `state` holds the STATE_COLUMNS of the card; a NULL stability is a new card.
+    """
+    stability = state.get("srs_stability")
+    last_review = state.get("srs_last_review_at")
+    lapses = state.get("srs_lapses") or 0
+
+    if not stability:
+        stability = W[grade - 1]
+        difficulty = _initial_difficulty(grade)
+    else:
+        difficulty = state.get("srs_difficulty") or _initial_difficulty(GOOD)
+        elapsed_days = (reviewed_at - last_review).total_seconds() / 86400 if last_review else 0.0
+        recall = retrievability(elapsed_days, stability)
+        if grade == AGAIN:
+            stability = _forget_stability(difficulty, stability, recall)
+            lapses += 1
+        else:
+            stability = _recall_stability(difficulty, stability, recall, grade)
+        difficulty = _next_difficulty(difficulty, grade)
+
+    stability = max(stability, MIN_STABILITY_DAYS)
+    # Late-arriving events (offline clients) never move the review clock back
+    last_review = max(last_review, reviewed_at) if last_review else reviewed_at
+    return {
+        "srs_stability": stability,
+        "srs_difficulty": difficulty,
+        "srs_reps": (state.get("srs_reps") or 0) + 1,
+        "srs_lapses": lapses,
+        "srs_last_review_at": last_review,
+        "due_at": last_review + timedelta(days=interval_days(stability)),
+    }
+
+
+class SpacedRepetitionService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_reviews(self, events: Iterable[Dict[str, Any]]) -> int:
+        """
+        Apply the graded tracking events to their cards' memory state: one
+        SELECT of the touched cards and one executemany UPDATE. Does not commit.
+        Returns the number of cards updated.
+        """
+        graded = [(event, grade_from_event(event)) for event in events]
+        graded = sorted(
+            ((event, grade) for event, grade in graded if grade is not None),
+            key=lambda item: item[0]["created_at"]
+        )
+        if not graded:
+            return 0
+
+        card_ids = {event["flashcard_id"] for event, _ in graded}
+        columns = [getattr(Flashcard, name) for name in STATE_COLUMNS]
+        states = {
+            row.id: row._asdict()
+            for row in self.db.query(Flashcard.id, *columns).filter(Flashcard.id.in_(card_ids))
+        }
+        for event, grade in graded:
+            state = states.get(event["flashcard_id"])
+            if state is not None:
+                state.update(next_state(state, grade, event["created_at"]))
+
+        if states:
+            cards = Flashcard.__table__
+            self.db.connection().execute(
+                update(cards)
+                .where(cards.c.id == bindparam("card_id"))
+                .values(
+                    **{name: bindparam(f"new_{name}") for name in STATE_COLUMNS},
+                    updated_at=cards.c.updated_at  # Scheduling is not a content edit
+                ),
+                [
+                    {"card_id": card_id, **{f"new_{name}": state[name] for name in STATE_COLUMNS}}
+                    for card_id, state in states.items()
+                ]
+            )
+        return len(states)
+
+    def due_cards(self, plan_id: int, limit: int, include_new: bool = True, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` cards of the plan that are due at `now`, most overdue
+        first, topped up with never-reviewed cards. Each read is one range scan
+        of ix_flashcards_plan_due.
+        """
+        now = now or datetime.utcnow()
+        columns = [
+            Flashcard.id, Flashcard.front_text, Flashcard.back_text, Flashcard.difficulty,
+            Flashcard.mastery_level, Flashcard.times_studied, *[getattr(Flashcard, name) for name in STATE_COLUMNS]
+        ]
+        cards = [
+            row._asdict() for row in self.db.query(*columns).filter(
+                Flashcard.study_plan_id == plan_id,
+                Flashcard.due_at <= now
+            ).order_by(Flashcard.due_at).limit(limit)
+        ]
+        if include_new and len(cards) < limit:
+            cards += [
+                row._asdict() for row in self.db.query(*columns).filter(
+                    Flashcard.study_plan_id == plan_id,
+                    Flashcard.due_at.is_(None)
+                ).order_by(Flashcard.id).limit(limit - len(cards))
+            ]
+
+        for card in cards:
+            if card["srs_stability"] and card["srs_last_review_at"]:
+                elapsed_days = (now - card["srs_last_review_at"]).total_seconds() / 86400
+                card["recall"] = round(retrievability(elapsed_days, card["srs_stability"]), 4)
+            else:
+                card["recall"] = None
+        return cards
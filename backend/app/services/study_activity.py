@@ -0,0 +1,197 @@
+"""
+Day-bucketed study activity and incremental streaks.
+
+study_sessions holds one row per user per UTC day (unique on user_id + day).
+Its task counts are recounted from the tasks scheduled that day, so finishing
+an overdue or future task doesn't count towards today, and tasks the
+schedulers move in or out of the day change both counts.
+When a day becomes complete (all tasks available that day done), the user's
+StudyStreak is advanced in O(1): continued if the previous completed day was
+yesterday, restarted otherwise. Reading the streak is a single keyed lookup,
+and the activity heatmap is one index range scan over (user_id, day).
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import StudySession, StudyStreak, StudyPlan, Task
+
+def utc_today() -> date:
+    return datetime.utcnow().date()
+
+def day_bounds(day: date):
+    """[start, end) datetimes of a UTC day, for range filters on timestamp columns."""
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+class StudyActivityService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # --- day buckets ---
+
+    def get_day(self, user_id: int, day: date) -> Optional[StudySession]:
+        return self.db.query(StudySession).filter(
+            StudySession.user_id == user_id,
+            StudySession.day == day
+        ).first()
+
+    def task_counts(self, user_id: int, day: date):
+        """(scheduled, completed) tasks of the user's plans scheduled on `day`, in one query."""
+        start, end = day_bounds(day)
+        available, completed = self.db.query(
+            func.count(Task.id),
+            func.sum(case((Task.completion_status == True, 1), else_=0))
+        ).join(StudyPlan).filter(
+            StudyPlan.user_id == user_id,
+            Task.scheduled_date >= start,
+            Task.scheduled_date < end
+        ).one()
+        return available, completed or 0
+
+    def get_or_create_day(self, user_id: int, day: Optional[date] = None) -> StudySession:
+        """
+        The user's bucket for `day` (default: today). Creating it counts the
+        tasks scheduled that day. Commits; call it after the caller's own writes.
+        """
+        day = day or utc_today()
+        bucket = self.get_day(user_id, day)
+        if bucket is not None:
+            return bucket
+
+        tasks_available, tasks_completed = self.task_counts(user_id, day)
+        bucket = StudySession(
+            user_id=user_id,
+            date=day_bounds(day)[0],
+            day=day,
+            tasks_available=tasks_available,
+            tasks_completed=tasks_completed
+        )
+        self.db.add(bucket)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # A concurrent request created the bucket first
+            self.db.rollback()
+            bucket = self.get_day(user_id, day)
+        return bucket
+
+    def set_tasks_completed(self, user_id: int, tasks_completed: int, day: Optional[date] = None) -> StudySession:
+        """Record the client's count of completed tasks for the day (POST /study-sessions)."""
+        bucket = self.get_or_create_day(user_id, day)
+        bucket.tasks_completed = tasks_completed
+        self._refresh_completion(bucket)
+        self.db.commit()
+        return bucket
+
+    def record_task_completed(self, user_id: int, day: Optional[date] = None) -> StudySession:
+        """Update the day after a task completion; only tasks scheduled that day count."""
+        return self._recount(self.get_or_create_day(user_id, day))
+
+    def refresh_task_counts(self, user_id: int, day: Optional[date] = None) -> Optional[StudySession]:
+        """Recount the day after tasks moved in or out of it. Only touches an existing bucket."""
+        bucket = self.get_day(user_id, day or utc_today())
+        if bucket is None:
+            return None
+        return self._recount(bucket)
+
+    def _recount(self, bucket: StudySession) -> StudySession:
+        bucket.tasks_available, bucket.tasks_completed = self.task_counts(bucket.user_id, bucket.day)
+        self._refresh_completion(bucket)
+        self.db.commit()
+        return bucket
+
+    def _refresh_completion(self, bucket: StudySession):
+        if bucket.is_complete_day:
+            return
+        if bucket.tasks_available > 0 and bucket.tasks_completed >= bucket.tasks_available:
+            bucket.is_complete_day = True
+            self._advance_streak(bucket.user_id, bucket.day)
+
+    # --- streaks ---
+
+    def _get_or_add_streak(self, user_id: int) -> StudyStreak:
+        streak = self.db.get(StudyStreak, user_id)
+        if streak is None:
+            streak = StudyStreak(user_id=user_id, current_streak=0, longest_streak=0)
+            self.db.add(streak)
+        return streak
+
+    def _advance_streak(self, user_id: int, day: date):
+        streak = self._get_or_add_streak(user_id)
+        last = streak.last_active_day
+        if last is not None and day <= last:
+            if day < last:
+                # A day completed out of order: rebuild from the calendar
+                self.db.flush()
+                self.recompute_streak(user_id)
+            return
+        if last is not None and day - last == timedelta(days=1):
+            streak.current_streak = (streak.current_streak or 0) + 1
+        else:
+            streak.current_streak = 1
+        streak.longest_streak = max(streak.longest_streak or 0, streak.current_streak)
+        streak.last_active_day = day
+
+    def recompute_streak(self, user_id: int) -> StudyStreak:
+        """Rebuild the streak state from the user's completed days (one index scan). Does not commit."""
+        streak = self._get_or_add_streak(user_id)
+        current = longest = 0
+        previous = None
+        for (day,) in self.db.query(StudySession.day).filter(
+            StudySession.user_id == user_id,
+            StudySession.is_complete_day == True,
+            StudySession.day.isnot(None)
+        ).order_by(StudySession.day):
+            current = current + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+            longest = max(longest, current)
+            previous = day
+        streak.current_streak = current
+        streak.longest_streak = longest
+        streak.last_active_day = previous
+        return streak
+
+    def get_streak(self, user_id: int, today: Optional[date] = None) -> Dict[str, Any]:
+        """Current and longest streak. The current streak survives until the end of the day after its last completed day."""
+        today = today or utc_today()
+        row = self.db.query(
+            StudyStreak.current_streak,
+            StudyStreak.longest_streak,
+            StudyStreak.last_active_day
+        ).filter(StudyStreak.user_id == user_id).first()
+        if row is None:
+            return {"streak": 0, "longest_streak": 0, "last_active_day": None}
+        alive = row.last_active_day is not None and today - row.last_active_day <= timedelta(days=1)
+        return {
+            "streak": row.current_streak if alive else 0,
+            "longest_streak": row.longest_streak,
+            "last_active_day": row.last_active_day,
+        }
+
+    # --- calendar ---
+
+    def heatmap(self, user_id: int, start: date, end: date) -> List[Dict[str, Any]]:
+        """Activity per day in [start, end], oldest first; days without a bucket are omitted."""
+        rows = self.db.query(
+            StudySession.day,
+            StudySession.tasks_available,
+            StudySession.tasks_completed,
+            StudySession.is_complete_day
+        ).filter(
+            StudySession.user_id == user_id,
+            StudySession.day >= start,
+            StudySession.day <= end
+        ).order_by(StudySession.day)
+        return [
+            {
+                "day": day,
+                "tasks_available": tasks_available or 0,
+                "tasks_completed": tasks_completed or 0,
+                "is_complete_day": bool(is_complete_day),
+            }
+            for day, tasks_available, tasks_completed, is_complete_day in rows
+        ]
@@ -0,0 +1,166 @@
+"""
+Cross-plan daily scheduling for a user.
+
+Each plan's schedule is generated on its own, as if the user studied nothing
+else, so four active plans meant four full daily loads. UserScheduler treats
+the open tasks of all the user's active plans as one queue and packs them
+into a single daily budget (study_hours_per_week / 7) day by day:
+
+- a task is never moved earlier than its own plan scheduled it
+  (Task.planned_date); overdue tasks are carried forward to today
+- when a day is over budget, tasks of plans with nearer exams keep their
+  place and the others slide to the next day with room
+- a task that reaches its exam day is placed even if that day is full
+
+Every pass packs from the planned days and writes the result to
+scheduled_date (and day_number), the day the task is shown on. A task pushed
+back by a busy day therefore returns towards its planned day once the budget
+frees up, instead of only ever moving later.
+
+The pass is one SELECT of the open tasks, a heap walk over them and one
+executemany UPDATE for the tasks that moved, so it runs on every task
+completion and after every schedule generation.
+"""
+import heapq
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.models import User, StudyPlan, StudyPlanStatus, Task, invalidate_dashboards
+from app.services.rescheduler import schedule_day
+from app.services.study_activity import StudyActivityService, day_bounds, utc_today
+
+DEFAULT_TASK_MINUTES = 20
+
+def daily_budget_minutes(study_hours_per_week: Optional[int]) -> float:
+    return (study_hours_per_week or 10) * 60 / 7
+
+def allocate_days(tasks: List[Dict[str, Any]], budget: float, today: date, used_today: float = 0.0) -> Dict[int, date]:
+    """
+    Day for every task. `tasks` are dicts with id, minutes, day (the day the
+    plan scheduled it, or None), order and deadline (exam day, or None).
+    Earliest deadline first within each day; `used_today` is the budget
+    already spent on tasks completed today.
+    """
+    pending = sorted(
+        tasks,
+        key=lambda task: (max(task["day"] or today, today), task["order"], task["id"])
+    )
+    assigned: Dict[int, date] = {}
+    heap: list = []
+    next_task = 0
+    day = today
+    while next_task < len(pending) or heap:
+        if not heap:
+            day = max(day, pending[next_task]["day"] or today)
+        while next_task < len(pending) and max(pending[next_task]["day"] or today, today) <= day:
+            task = pending[next_task]
+            heapq.heappush(heap, (task["deadline"] or date.max, max(task["day"] or today, today), task["order"], task["id"], task))
+            next_task += 1
+
+        used = used_today if day == today else 0.0
+        skipped = []
+        while heap:
+            entry = heapq.heappop(heap)
+            task = entry[-1]
+            due = task["deadline"] is not None and task["deadline"] <= day
+            # An empty day always takes its first task, however long
+            if due or used + task["minutes"] <= budget or used == 0:
+                assigned[task["id"]] = day
+                used += task["minutes"]
+            else:
+                skipped.append(entry)
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+        day += timedelta(days=1)
+    return assigned
+
+
+class UserScheduler:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def rebalance(self, user_id: int, today: Optional[date] = None, schedule_changed: bool = False) -> int:
+        """
+        Fit the open tasks of all the user's active plans into one daily budget.
+        Today's study activity counts are refreshed when tasks move in or out
+        of today, or always with `schedule_changed` (the caller has just
+        rewritten a plan's tasks). Commits. Returns the number of tasks that moved.
+        """
+        today = today or utc_today()
+        today_start, _ = day_bounds(today)
+        user = self.db.query(User.study_hours_per_week).filter(User.id == user_id).first()
+        if user is None:
+            return 0
+
+        rows = self.db.query(
+            Task.id,
+            Task.estimated_minutes,
+            Task.scheduled_date,
+            Task.planned_date,
+            Task.order,
+            Task.day_number,
+            Task.completion_status,
+            StudyPlan.exam_date
+        ).join(StudyPlan).filter(
+            StudyPlan.user_id == user_id,
+            StudyPlan.status == StudyPlanStatus.ACTIVE,
+            or_(Task.completion_status == False, Task.completed_at >= today_start)
+        ).all()
+
+        used_today = 0.0
+        tasks = []
+        current = {}
+        for row in rows:
+            minutes = row.estimated_minutes or DEFAULT_TASK_MINUTES
+            if row.completion_status:
+                used_today += minutes
+                continue
+            deadline = schedule_day(row.exam_date).date() if row.exam_date else None
+            if deadline is not None and deadline < today:
+                continue  # Exam is over; leave its plan alone
+            scheduled = schedule_day(row.scheduled_date)
+            planned = schedule_day(row.planned_date or row.scheduled_date)
+            current[row.id] = (scheduled.date() if scheduled else None, row.day_number)
+            tasks.append({
+                "id": row.id,
+                "minutes": minutes,
+                "day": planned.date() if planned else None,
+                "order": row.order or 0,
+                "deadline": deadline
+            })
+
+        assigned = allocate_days(tasks, daily_budget_minutes(user.study_hours_per_week), today, used_today)
+        moves = []
+        for task_id, day in assigned.items():
+            old_day, day_number = current[task_id]
+            if day == old_day:
+                continue
+            if day_number is not None and old_day is not None:
+                day_number += (day - old_day).days
+            moves.append({"task_id": task_id, "new_date": schedule_day(day), "new_day_number": day_number})
+
+        if moves:
+            tasks_table = Task.__table__
+            connection = self.db.connection()
+            connection.execute(
+                update(tasks_table)
+                .where(tasks_table.c.id == bindparam("task_id"))
+                .values(
+                    scheduled_date=bindparam("new_date"),
+                    day_number=bindparam("new_day_number"),
+                    # Tasks inserted without a planned day keep the one they had
+                    planned_date=func.coalesce(tasks_table.c.planned_date, tasks_table.c.scheduled_date)
+                ),
+                moves
+            )
+            # Bulk updates skip the dashboard flush events
+            invalidate_dashboards(connection, user_ids=[user_id])
+            self.db.commit()
+        if schedule_changed or any(
+            current[move["task_id"]][0] == today or move["new_date"].date() == today for move in moves
+        ):
+            StudyActivityService(self.db).refresh_task_counts(user_id, today)
+        return len(moves)
@@ -0,0 +1,233 @@
+"""
+Write-behind ingestion for /tracking/log.
+
+Each answered card used to cost a transaction: one INSERT into
+study_session_tracking, one UPDATE of the flashcard and a commit. The endpoint
+now only appends the event to an in-process buffer and answers 202. A
+background task drains the buffer every TRACKING_FLUSH_INTERVAL_MS, or as soon
+as TRACKING_FLUSH_BATCH_SIZE events are waiting, and writes the whole batch in
+one transaction:
+
+- one executemany INSERT for the tracking rows
+- one UPDATE per distinct flashcard (times_studied += n, last_studied = newest)
+- spaced-repetition state of the reviewed cards (one SELECT + one executemany)
+- an append to the columnar event store (app/event_store.py)
+- O(1) streaming learning-stat updates and one profile refresh per user
+
+Memory is bounded by TRACKING_BUFFER_MAX_EVENTS; beyond it submit() refuses
+the event and the endpoint answers 503 + Retry-After. stop() drains whatever is
+left on shutdown.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.event_store import event_store
+from app.models import StudySessionTracking, Flashcard
+from app.services.analytics_service import AnalyticsService
+from app.services.srs import SpacedRepetitionService
+from app.workers import run_io
+
+logger = logging.getLogger("studyahead.tracking")
+
+TRACKING_COLUMNS = (
+    "user_id", "study_plan_id", "mode", "flashcard_id",
+    "is_correct", "response_time_ms", "attempts_needed", "client_event_id", "created_at",
+)
+
+
+def write_tracking_batch(events: List[Dict[str, Any]]) -> int:
+    """
+    Persist a batch of tracking events in one transaction. If the batch is
+    rejected (e.g. a foreign key violation), the events are retried one by one
+    so a single bad event doesn't drop its neighbours. Returns rows written.
+    """
+    try:
+        _write_events(events)
+        return len(events)
+    except SQLAlchemyError as e:
+        if len(events) == 1:
+            logger.warning("Dropping tracking event %s: %s", events[0], e)
+            return 0
+        logger.warning("Tracking batch of %d failed (%s); retrying one by one", len(events), e)
+        return sum(write_tracking_batch([event]) for event in events)
+
+def _write_events(events: List[Dict[str, Any]]):
+    # Coalesce the per-card stat updates: one UPDATE per distinct card
+    card_updates: Dict[int, Dict[str, Any]] = {}
+    for event in events:
+        flashcard_id = event.get("flashcard_id")
+        if not flashcard_id:
+            continue
+        entry = card_updates.setdefault(flashcard_id, {"card_id": flashcard_id, "n": 0, "studied_at": event["created_at"]})
+        entry["n"] += 1
+        entry["studied_at"] = max(entry["studied_at"], event["created_at"])
+
+    cards = Flashcard.__table__
+    with SessionLocal() as db:
+        connection = db.connection()
+        connection.execute(
+            insert(StudySessionTracking.__table__),
+            [{column: event.get(column) for column in TRACKING_COLUMNS} for event in events]
+        )
+        if card_updates:
+            connection.execute(
+                update(cards)
+                .where(cards.c.id == bindparam("card_id"))
+                .values(
+                    times_studied=func.coalesce(cards.c.times_studied, 0) + bindparam("n"),
+                    last_studied=bindparam("studied_at")
+                ),
+                list(card_updates.values())
+            )
+            SpacedRepetitionService(db).record_reviews(events)
+        db.commit()
+
+        if settings.EVENT_STORE_ENABLED:
+            try:
+                event_store.append(events)
+            except (OSError, ValueError) as e:
+                # The row table stays authoritative; export_event_store.py can rebuild
+                logger.warning("Event store append failed for %d events: %s", len(events), e)
+
+        # Streaming stats + one profile refresh per user per batch, no history reads
+        try:
+            AnalyticsService(db).update_profiles_from_events(events)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning("Learning profile update failed for %d events: %s", len(events), e)
+
+
+class TrackingBuffer:
+    def __init__(self, max_events: int, batch_size: int, flush_interval_ms: int):
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self._events: deque = deque()
+        self._pending_ids: set = set()  # (user_id, client_event_id) of buffered events
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        self.max_pending = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._events)
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Queue one event; False means the buffer is full and the client should retry."""
+        return self.submit_many([event])
+
+    def submit_many(self, events: List[Dict[str, Any]]) -> bool:
+        """Queue all events or none of them (False: buffer full, retry later)."""
+        if len(self._events) + len(events) > self.max_events or self._stopping:
+            self.rejected += len(events)
+            return False
+        for event in events:
+            event.setdefault("created_at", datetime.utcnow())
+            if event.get("client_event_id"):
+                self._pending_ids.add((event["user_id"], event["client_event_id"]))
+            self._events.append(event)
+        self.accepted += len(events)
+        self.max_pending = max(self.max_pending, len(self._events))
+        self._ensure_started()
+        if len(self._events) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def pending_event_ids(self, user_id: int, client_event_ids) -> set:
+        """Which of the user's client event ids are buffered but not yet written."""
+        return {event_id for event_id in client_event_ids if (user_id, event_id) in self._pending_ids}
+
+    def start(self):
+        """Accept events again (startup); the flush loop starts with the first event."""
+        self._stopping = False
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _take_batch(self, limit: int) -> List[Dict[str, Any]]:
+        count = min(len(self._events), self.batch_size, limit)
+        return [self._events.popleft() for _ in range(count)]
+
+    async def flush(self):
+        """
+        Write what is buffered right now, batch_size events per transaction.
+        Events arriving meanwhile wait for the next tick, so they coalesce
+        into one batch instead of trickling out one write at a time.
+        """
+        remaining = len(self._events)
+        while remaining > 0 and self._events:
+            batch = self._take_batch(remaining)
+            remaining -= len(batch)
+            started = time.perf_counter()
+            try:
+                written = await run_io(write_tracking_batch, batch)
+            except Exception as e:
+                logger.error("Tracking flush failed, dropping %d events: %s", len(batch), e)
+                written = 0
+            self._forget_ids(batch)
+            self.written += written
+            self.dropped += len(batch) - written
+            self.batches += 1
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    def _forget_ids(self, batch: List[Dict[str, Any]]):
+        for event in batch:
+            if event.get("client_event_id"):
+                self._pending_ids.discard((event["user_id"], event["client_event_id"]))
+
+    async def stop(self):
+        """Refuse new events, let the flush loop finish and drain the buffer (called on shutdown)."""
+        self._stopping = True
+        if self._task is not None and not self._task.done():
+            self._wakeup.set()
+            await self._task
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "max_events": self.max_events,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+        }
+
+
+tracking_buffer = TrackingBuffer(
+    settings.TRACKING_BUFFER_MAX_EVENTS,
+    settings.TRACKING_FLUSH_BATCH_SIZE,
+    settings.TRACKING_FLUSH_INTERVAL_MS,
+)
@@ -0,0 +1,122 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+
+
+class WorkerPool:
+    """Executor wrapper that keeps queue-depth metrics for the background pipelines."""
+
+    def __init__(self, name: str, factory: Callable[[], Executor], max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_seconds = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._factory()
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a free worker (in-flight beyond pool capacity)."""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs) if kwargs else fn
+
+        self.submitted += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            if kwargs:
+                result = await loop.run_in_executor(self.executor, call)
+            else:
+                result = await loop.run_in_executor(self.executor, call, *args)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "max_workers": self.max_workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_in_flight": self.max_in_flight,
+            "avg_seconds": round(self.total_seconds / finished, 4) if finished else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# CPU-bound stages (PDF parsing, image decoding) run in separate processes so they
+# never hold the GIL of the API worker. Functions sent here must be module-level.
+cpu_pool = WorkerPool(
+    "cpu",
+    lambda: ProcessPoolExecutor(max_workers=settings.CPU_POOL_WORKERS),
+    settings.CPU_POOL_WORKERS,
+)
+
+# Blocking I/O stages (OpenAI HTTP calls, sync DB sessions) run in a bounded thread pool.
+io_pool = WorkerPool(
+    "io",
+    lambda: ThreadPoolExecutor(max_workers=settings.IO_POOL_WORKERS, thread_name_prefix="studyahead-io"),
+    settings.IO_POOL_WORKERS,
+)
+
+
+# Password hashing (bcrypt) gets its own small process pool so a burst of logins
+# neither blocks the event loop nor queues behind PDF parsing.
+auth_pool = WorkerPool(
+    "auth",
+    lambda: ProcessPoolExecutor(max_workers=settings.AUTH_POOL_WORKERS),
+    settings.AUTH_POOL_WORKERS,
+)
+
+
+async def run_cpu(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+async def run_auth(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    return await auth_pool.run(fn, *args, **kwargs)
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {pool.name: pool.stats() for pool in (cpu_pool, io_pool, auth_pool)}
+
+
+def shutdown_pools():
+    cpu_pool.shutdown()
+    io_pool.shutdown()
+    auth_pool.shutdown()
@@ -0,0 +1,70 @@
+"""
+Insights benchmark.
+
+Generates synthetic study events (default 100,000 over 500 cards, 4 plans and
+90 days) as event-store records and times each vectorized pass in
+app.services.insights, next to a per-event Python loop computing only the
+per-mode accuracy for comparison.
+
+Usage: python bench_insights.py [events] [repeats]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.event_store import RECORD_DTYPE
+from app.services import insights
+
+MODE_NAMES = {1: "flashcards", 2: "learn", 3: "quiz", 4: "write", 5: "match"}
+
+def synthetic_events(count: int, cards: int = 500, plans: int = 4, days: int = 90) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    now_ms = int((datetime.utcnow() - datetime(1970, 1, 1)).total_seconds() * 1000)
+    records = np.zeros(count, dtype=RECORD_DTYPE)
+    records["ts_ms"] = np.sort(now_ms - rng.integers(0, days * insights.DAY_MS, count))
+    records["user_id"] = 1
+    records["flashcard_id"] = rng.integers(1, cards + 1, count)
+    records["plan_id"] = records["flashcard_id"] % plans + 1
+    records["response_time_ms"] = rng.lognormal(7.5, 0.6, count).astype("u4")
+    records["mode"] = rng.integers(1, len(MODE_NAMES) + 1, count)
+    records["is_correct"] = (rng.random(count) < 0.75).astype("i1")
+    return records
+
+def timed(label: str, repeats: int, fn, *args):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = fn(*args)
+    print(f"  {label:<28} {(time.perf_counter() - started) / repeats * 1000:8.2f} ms")
+    return result
+
+def python_mode_accuracy(records):
+    totals = {}
+    for record in records.tolist():
+        entry = totals.setdefault(record[5], [0, 0])
+        if record[6] >= 0:
+            entry[0] += 1
+            entry[1] += record[6] == 1
+    return {mode: correct / answered for mode, (answered, correct) in totals.items()}
+
+def main(count: int = 100_000, repeats: int = 5):
+    records = synthetic_events(count)
+    now = datetime.utcnow()
+    plans = {
+        plan_id: {"name": f"Plan {plan_id}", "exam_date": now + timedelta(days=30), "card_count": 125}
+        for plan_id in range(1, 5)
+    }
+    print(f"{count:,} events, {repeats} repeats")
+    timed("modes", repeats, insights.mode_insights, records, MODE_NAMES)
+    stats = timed("card stats", repeats, insights.card_stats, records)
+    timed("card curves (50 weakest)", repeats, insights.card_curves, stats, 50)
+    timed("time of day", repeats, insights.time_of_day, records, 0)
+    timed("plan readiness", repeats, insights.plan_readiness, records, stats, plans, now)
+    timed("python loop: mode accuracy", 1, python_mode_accuracy, records)
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    )
@@ -0,0 +1,81 @@
+"""
+Login throughput benchmark.
+
+Fires N concurrent password verifications / logins and reports wall time,
+throughput and the worst event-loop stall (how long a 10ms heartbeat task was
+kept waiting), for:
+
+- inline: bcrypt.checkpw called on the event loop (the old register/login code)
+- pool:   verify_password_async (auth process pool, AUTH_POOL_WORKERS processes)
+- login:  end-to-end POST /api/auth/login against a scratch SQLite database
+
+Usage: python bench_login.py [concurrent] [rounds]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_scratch_dir = tempfile.mkdtemp(prefix="studyahead-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch_dir, 'bench.db')}"
+os.environ.setdefault("USE_MOCK_AI", "true")
+
+async def measure(label: str, jobs):
+    """Run the coroutines concurrently while a heartbeat measures event-loop stalls."""
+    worst_stall = 0.0
+    done = False
+
+    async def heartbeat():
+        nonlocal worst_stall
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            worst_stall = max(worst_stall, time.perf_counter() - started - 0.01)
+
+    beat = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    results = await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - started
+    done = True
+    await beat
+    print(f"{label:<8} {len(results):>5} {elapsed:>9.2f}s {len(results) / elapsed:>10.1f}/s {worst_stall * 1000:>12.0f}ms")
+    return results
+
+async def run_benchmark(concurrent: int = 30, rounds: int = None):
+    from app.config import settings
+    if rounds:
+        settings.BCRYPT_ROUNDS = rounds
+
+    import httpx
+    import main
+    from app.auth import verify_password, get_password_hash, verify_password_async
+    from app.workers import auth_pool, shutdown_pools
+
+    password = "correct horse battery staple"
+    hashed = get_password_hash(password)
+
+    async def inline_verify():
+        return verify_password(password, hashed)
+
+    print(f"Login benchmark: {concurrent} concurrent, bcrypt cost {settings.BCRYPT_ROUNDS}, "
+          f"{settings.AUTH_POOL_WORKERS} auth processes")
+    print(f"{'path':<8} {'calls':>5} {'wall':>10} {'throughput':>12} {'worst stall':>13}")
+
+    await measure("inline", [inline_verify() for _ in range(concurrent)])
+    await verify_password_async(password, hashed)  # start the worker processes
+    await measure("pool", [verify_password_async(password, hashed) for _ in range(concurrent)])
+
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+        await client.post("/api/auth/register", json={"email": "bench@example.com", "password": password})
+        responses = await measure("login", [
+            client.post("/api/auth/login", json={"email": "bench@example.com", "password": password})
+            for _ in range(concurrent)
+        ])
+    assert all(response.status_code == 200 for response in responses)
+    print(f"auth pool: {auth_pool.stats()}")
+    shutdown_pools()
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    asyncio.run(run_benchmark(*args))
@@ -0,0 +1,122 @@
+"""
+Serialization benchmark for the large deck/result list endpoints.
+
+Builds a scratch in-memory SQLite deck (default 2,000 cards with 3 MCQs each
+and 20 test results) and times, per row, the old path - ORM objects validated
+into the response_model and encoded with the stdlib json module, which is what
+FastAPI does for a returned ORM list - against the column projection + orjson
+path in app.serialization (and MessagePack when installed).
+
+Usage: python bench_serialization.py [cards] [repeats]
+"""
+import json
+import sys
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, selectinload
+
+from app.database import Base
+from app.models import User, StudyPlan, StudyPlanType, Flashcard, MCQQuestion, TestResult
+from app.schemas import FlashcardResponse, FlashcardWithQuestions, TestResultResponse
+from app import serialization
+
+def build_deck(db, cards: int):
+    user = User(email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    plan = StudyPlan(user_id=user.id, name="Bench", type=StudyPlanType.FLASHCARD_SET)
+    db.add(plan)
+    db.flush()
+    for i in range(cards):
+        card = Flashcard(study_plan_id=plan.id, front_text=f"word {i}", back_text=f"Wort {i}")
+        card.mcq_questions = [
+            MCQQuestion(
+                question_text=f"What does 'word {i}' mean?",
+                options=[f"Wort {i}", f"Wort {i + 1}", f"Wort {i + 2}", f"Wort {i + 3}"],
+                correct_answer_index=0,
+                rationale="Direct translation.",
+                question_type=question_type
+            )
+            for question_type in ("standard", "reverse", "creative")
+        ]
+        db.add(card)
+    for i in range(20):
+        db.add(TestResult(study_plan_id=plan.id, test_type="short_test", score=80.0,
+                          total_questions=10, correct_answers=8, time_spent=120))
+    db.commit()
+    return plan.id
+
+def old_path(db, query, schema):
+    """ORM load -> response_model validation -> jsonable dump -> json.dumps."""
+    adapter = TypeAdapter(List[schema])
+    rows = query(db).all()
+    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def timed(fn, repeats: int):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def run_benchmark(cards: int = 2000, repeats: int = 5):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        plan_id = build_deck(db, cards)
+
+    cases = {
+        "get_flashcards": (
+            lambda db: db.query(Flashcard).filter(Flashcard.study_plan_id == plan_id),
+            FlashcardResponse,
+            lambda db: serialization.flashcard_rows(db, plan_id),
+        ),
+        "get_plan_quiz": (
+            lambda db: db.query(Flashcard).options(selectinload(Flashcard.mcq_questions))
+            .filter(Flashcard.study_plan_id == plan_id),
+            FlashcardWithQuestions,
+            lambda db: serialization.flashcard_content_rows(db, plan_id),
+        ),
+        "get_test_results": (
+            lambda db: db.query(TestResult).filter(TestResult.study_plan_id == plan_id)
+            .order_by(TestResult.created_at.desc()),
+            TestResultResponse,
+            lambda db: serialization.test_result_rows(db, plan_id),
+        ),
+    }
+
+    print(f"Serialization benchmark: {cards} cards x 3 MCQs, best of {repeats} (times include the queries)")
+    print(f"{'endpoint':<18} {'rows':>6} {'old us/row':>11} {'orjson us/row':>14} {'msgpack us/row':>15} {'speedup':>8}")
+    for name, (query, schema, project) in cases.items():
+        # Fresh session per run so the identity map doesn't carry objects over
+        def run_old():
+            with Session() as db:
+                return old_path(db, query, schema)
+
+        def run_new():
+            with Session() as db:
+                return serialization.encode_json(project(db))
+
+        def run_msgpack():
+            with Session() as db:
+                return serialization.encode_msgpack(project(db))
+
+        with Session() as db:
+            rows = len(project(db))
+            by_id = lambda body: sorted(json.loads(body), key=lambda row: row["id"])
+            assert by_id(old_path(db, query, schema)) == by_id(serialization.encode_json(project(db)))
+
+        old = timed(run_old, repeats) / rows * 1e6
+        new = timed(run_new, repeats) / rows * 1e6
+        packed = timed(run_msgpack, repeats) / rows * 1e6 if serialization.msgpack else float("nan")
+        print(f"{name:<18} {rows:>6} {old:>11.1f} {new:>14.1f} {packed:>15.1f} {old / new:>7.1f}x")
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    run_benchmark(*args)
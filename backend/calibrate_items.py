@@ -0,0 +1,27 @@
+"""
+Recalibrate the card difficulty model of the adaptive pre-assessment
+(app/services/item_response.py) on every pre-assessment answer of all users
+and store it as the current calibration. Run it periodically, e.g. nightly
+from cron.
+
+Usage: python calibrate_items.py
+"""
+import time
+
+from app.database import SessionLocal
+from app.services.item_response import ItemCalibrationService
+
+def main():
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        summary = ItemCalibrationService(db).calibrate()
+    if not summary["responses"]:
+        print("No pre-assessment answers yet; keeping the default difficulty model")
+        return
+    print(f"Calibrated on {summary['responses']} answers from {summary['assessments']} assessments "
+          f"in {time.perf_counter() - started:.2f}s")
+    print(f"  log loss {summary['log_loss']:.3f} (overall accuracy alone: {summary['baseline_log_loss']:.3f})")
+    print(f"  weights {summary['weights']}")
+
+if __name__ == "__main__":
+    main()
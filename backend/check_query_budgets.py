@@ -0,0 +1,103 @@
+"""
+Check that the set-based paths run a fixed number of SQL statements however
+many cards they touch.
+
+Each case runs against a scratch in-memory SQLite deck, once small and once
+large, inside app.query_stats.assert_max_queries with the same budget, so a
+statement count that grows with the deck (or an N+1 loop) fails the check.
+
+Usage: python check_query_budgets.py [small] [large]
+"""
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import User, StudyPlan, StudyPlanType, Flashcard, MCQQuestion, VocabularySentence
+from app.query_stats import QueryBudgetExceeded, assert_max_queries
+from app.schemas import PreAssessmentResponseSubmit
+from app.serialization import flashcard_content_rows, flashcard_progress_rows
+from app.services.mastery import MasteryService
+from app.services.pre_assessment import PreAssessmentService
+from app.services.session_composer import SessionComposer
+
+def build_deck(db, cards: int):
+    user = User(email="budget@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    plan = StudyPlan(user_id=user.id, name="Budget", type=StudyPlanType.FLASHCARD_SET)
+    db.add(plan)
+    db.flush()
+    for i in range(cards):
+        card = Flashcard(study_plan_id=plan.id, front_text=f"word {i}", back_text=f"Wort {i}")
+        card.mcq_questions = [MCQQuestion(
+            question_text=f"What does 'word {i}' mean?",
+            options=[f"Wort {i}", f"Wort {i + 1}", f"Wort {i + 2}", f"Wort {i + 3}"],
+            correct_answer_index=0,
+            question_type="standard"
+        )]
+        card.vocabulary_sentences = [VocabularySentence(sentence_text=f"A sentence with word {i}.")]
+        db.add(card)
+    db.commit()
+    card_ids = [card_id for (card_id,) in db.query(Flashcard.id).filter(Flashcard.study_plan_id == plan.id)]
+    return user.id, plan.id, card_ids
+
+# Each case prepares its inputs outside the budget and returns the call to measure
+def _batch_mastery(db, user_id, plan_id, card_ids):
+    def write():
+        MasteryService(db).set_user_mastery(user_id, {card_id: 40.0 for card_id in card_ids}, studied=True)
+        db.commit()
+    return write
+
+def _pre_assessment_submit(db, user_id, plan_id, card_ids):
+    assessment = PreAssessmentService(db).generate_pre_assessment(plan_id)
+    responses = [
+        PreAssessmentResponseSubmit(flashcard_id=card_id, is_correct=i % 3 == 0, response_time_ms=1500)
+        for i, card_id in enumerate(card_ids)
+    ]
+    return lambda: PreAssessmentService(db).submit_assessment(assessment.id, responses)
+
+def _study_bundle(db, user_id, plan_id, card_ids):
+    return lambda: flashcard_content_rows(db, plan_id, include_sentences=True)
+
+def _plan_progress(db, user_id, plan_id, card_ids):
+    return lambda: flashcard_progress_rows(db, plan_id)
+
+def _composed_session(db, user_id, plan_id, card_ids):
+    return lambda: SessionComposer(db).compose(user_id, plan_id, 20)
+
+# name -> (statement budget, case)
+CASES = {
+    "batch mastery write": (2, _batch_mastery),
+    "pre-assessment submit": (8, _pre_assessment_submit),
+    "study bundle rows": (3, _study_bundle),
+    "plan progress rows": (1, _plan_progress),
+    "composed session": (5, _composed_session),
+}
+
+def scratch_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+def run_checks(small: int = 2, large: int = 200) -> bool:
+    ok = True
+    for name, (budget, case) in CASES.items():
+        counts = []
+        for cards in (small, large):
+            with scratch_session() as db:
+                measured = case(db, *build_deck(db, cards))
+                try:
+                    with assert_max_queries(budget) as stats:
+                        measured()
+                    counts.append(str(stats.count))
+                except QueryBudgetExceeded as e:
+                    counts.append(f"FAILED ({e})")
+                    ok = False
+        print(f"{name:<24} budget {budget:>3}: {small} cards -> {counts[0]}, {large} cards -> {counts[1]}")
+    return ok
+
+if __name__ == "__main__":
+    passed = run_checks(*(int(arg) for arg in sys.argv[1:3]))
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,76 @@
+"""
+Rebuild the columnar event store (app/event_store.py) from study_session_tracking.
+
+The tracking buffer appends new events as they are written, but not events
+of sealed days: history from before the store was enabled, and answers that
+offline clients send late. Insights and the recall model refit read only the
+store, so run this periodically, e.g. nightly before fit_recall_model.py
+(/api/health/tracking shows rebuild_due), and to restore lost segments.
+Only sealed segments (days older than EVENT_STORE_SEAL_HOURS) are rebuilt and
+replaced; the open ones belong to the running server's writer and are left
+alone, so this is safe to run next to it. Rows are streamed in chunks, so
+memory stays flat regardless of table size.
+
+Usage: python export_event_store.py [chunk_size]
+"""
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.database import SessionLocal, engine
+from app.event_store import event_store
+from app.models import StudySessionTracking
+
+EXPORT_COLUMNS = ("user_id", "study_plan_id", "mode", "flashcard_id", "is_correct", "response_time_ms", "created_at")
+
+def table_bytes(db):
+    """Approximate on-disk size of study_session_tracking incl. indexes (None if unknown)."""
+    if engine.dialect.name == "postgresql":
+        return db.execute(text("SELECT pg_total_relation_size('study_session_tracking')")).scalar()
+    if engine.dialect.name == "sqlite":
+        try:
+            return db.execute(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = 'study_session_tracking' "
+                "OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'study_session_tracking')"
+            )).scalar()
+        except Exception:
+            return None  # dbstat is not compiled into every SQLite build
+    return None
+
+def _chunks(rows, chunk_size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(dict(zip(EXPORT_COLUMNS, row)))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def main(chunk_size: int = 10000):
+    now = datetime.utcnow()
+    sealed_until = datetime.combine(event_store.first_open_day(now), datetime.min.time())
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        columns = [getattr(StudySessionTracking, name) for name in EXPORT_COLUMNS]
+        rows = db.query(*columns).filter(
+            StudySessionTracking.created_at < sealed_until
+        ).order_by(StudySessionTracking.id).yield_per(chunk_size)
+        exported = event_store.rebuild_sealed(_chunks(rows, chunk_size), now)
+        table_size = table_bytes(db)
+    finally:
+        db.close()
+
+    usage = event_store.disk_usage()
+    print(f"Exported {exported} events before {sealed_until:%Y-%m-%d} in {time.perf_counter() - started:.1f}s "
+          f"to {usage['segments']} segments in {event_store.directory}")
+    print(f"  event store: {usage['bytes']:>12,} bytes ({usage['bytes'] / max(exported, 1):.0f} bytes/event)")
+    if table_size:
+        print(f"  table+index: {table_size:>12,} bytes ({table_size / max(exported, 1):.0f} bytes/event)")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
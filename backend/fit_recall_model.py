@@ -0,0 +1,32 @@
+"""
+Refit the per-flashcard forgetting-curve model (app/services/recall_model.py).
+
+Fits the half-life regression on the whole tracking history (or one user's)
+and stores every studied card's half-life, recall probability and next review
+time. Run it periodically, e.g. nightly from cron. With the event store
+enabled the history comes from its segments, so run export_event_store.py
+first to include late events.
+
+Usage: python fit_recall_model.py [user_id]
+"""
+import sys
+import time
+
+from app.database import SessionLocal
+from app.services.recall_model import RecallModelService
+
+def main(user_id=None):
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        summary = RecallModelService(db).refit(user_id=user_id)
+    if not summary["cards"]:
+        print("No review history yet; nothing to fit")
+        return
+    print(f"Fitted on {summary['examples']} reviews, updated {summary['cards']} cards "
+          f"in {time.perf_counter() - started:.2f}s")
+    if summary["examples"]:
+        print(f"  log loss {summary['log_loss']:.3f} (fixed 24h half-life: {summary['baseline_log_loss']:.3f})")
+        print(f"  theta {summary['theta']}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,96 @@
+"""
+Index usage report for the hot query paths.
+
+Runs EXPLAIN on the queries behind /tasks/today, the study modes, the dashboard
+and AnalyticsService and flags any that fall back to a full table scan.
+On PostgreSQL it also prints per-index scan counters from pg_stat_user_indexes.
+
+Usage: python index_report.py
+"""
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.database import SessionLocal, engine
+from app.models import (
+    StudyPlan, StudyPlanStatus, Task, Flashcard, MCQQuestion, VocabularySentence,
+    PreAssessment, StudySessionTracking, TestResult, StudySession
+)
+
+def hot_queries(db):
+    today = datetime.utcnow().date()
+    return {
+        "tasks today (/tasks/today, dashboard)": db.query(Task).join(StudyPlan).filter(
+            StudyPlan.user_id == 1,
+            Task.scheduled_date == today,
+            Task.completion_status == False
+        ),
+        "tasks for plan": db.query(Task).filter(Task.study_plan_id == 1).order_by(Task.scheduled_date),
+        "plans by user + status": db.query(StudyPlan).filter(
+            StudyPlan.user_id == 1,
+            StudyPlan.status == StudyPlanStatus.ACTIVE
+        ),
+        "deck (every study mode)": db.query(Flashcard).filter(Flashcard.study_plan_id == 1),
+        "MCQs per card": db.query(MCQQuestion).filter(MCQQuestion.flashcard_id == 1),
+        "sentences per card": db.query(VocabularySentence).filter(VocabularySentence.flashcard_id == 1),
+        "pre-assessment for plan": db.query(PreAssessment).filter(PreAssessment.study_plan_id == 1),
+        "tracking history (AnalyticsService)": db.query(StudySessionTracking).filter(
+            StudySessionTracking.user_id == 1
+        ).order_by(StudySessionTracking.created_at.desc()).limit(100),
+        "test results for plan": db.query(TestResult).filter(
+            TestResult.study_plan_id == 1
+        ).order_by(TestResult.created_at.desc()),
+        "study sessions by user": db.query(StudySession).filter(StudySession.user_id == 1),
+    }
+
+def explain(db, query):
+    dialect = sqlite.dialect() if engine.dialect.name == "sqlite" else postgresql.dialect()
+    compiled = query.statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    rows = db.execute(text(prefix + str(compiled))).fetchall()
+    # SQLite: (id, parent, notused, detail); PostgreSQL: (plan line,)
+    return [row[-1] for row in rows]
+
+def uses_full_scan(plan_lines):
+    for line in plan_lines:
+        upper = line.upper()
+        if engine.dialect.name == "sqlite":
+            # "SCAN tasks" is a full scan, "SCAN tasks USING INDEX ..." / "SEARCH ..." is not
+            if upper.startswith("SCAN") and "USING" not in upper:
+                return True
+        elif "SEQ SCAN" in upper:
+            return True
+    return False
+
+def print_index_stats(db):
+    if engine.dialect.name != "postgresql":
+        return
+    print("\nIndex scan counters (pg_stat_user_indexes):")
+    rows = db.execute(text(
+        "SELECT relname, indexrelname, idx_scan, idx_tup_read "
+        "FROM pg_stat_user_indexes ORDER BY relname, indexrelname"
+    )).fetchall()
+    for table, index, scans, tuples in rows:
+        print(f"  {table:<28} {index:<48} scans={scans:<10} tuples={tuples}")
+
+def run_report():
+    db = SessionLocal()
+    try:
+        print(f"Index usage report ({engine.dialect.name})")
+        full_scans = 0
+        for name, query in hot_queries(db).items():
+            plan_lines = explain(db, query)
+            full_scan = uses_full_scan(plan_lines)
+            full_scans += full_scan
+            print(f"\n[{'FULL SCAN' if full_scan else 'INDEXED'}] {name}")
+            for line in plan_lines:
+                print(f"    {line}")
+        print_index_stats(db)
+        print(f"\n{full_scans} hot query(s) without index support.")
+        return full_scans
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run_report()
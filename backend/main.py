@@ -4,7 +4,14 @@ from fastapi.staticfiles import StaticFiles
 import os
 from pathlib import Path
 
+from app.config import settings
 from app.database import engine, Base
+from app.event_store import event_store
+from app.workers import get_pool_stats, shutdown_pools
+from app.query_stats import QueryStatsMiddleware
+from app.compression import CompressionMiddleware, get_compression_stats
+from app.auth_cache import get_auth_cache_stats
+from app.tracking_buffer import tracking_buffer
 from app.routers import auth, users, study_plans, materials, flashcards, tasks, study_sessions, analytics, test_results, pre_assessment, adaptive_learning, tracking
 
 # Create uploads directory
@@ -26,6 +33,12 @@ app.add_middleware(
     expose_headers=["*"],  # Expose all headers
 )
 
+# Per-request query count/timing headers and N+1 warnings
+app.add_middleware(QueryStatsMiddleware)
+
+# gzip/brotli for large JSON/msgpack bodies, cached per ETag (outermost, so it sees final headers)
+app.add_middleware(CompressionMiddleware)
+
 # Add exception handler to ensure CORS headers are included in error responses
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
@@ -41,6 +54,16 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         }
     )
 
+@app.on_event("startup")
+def start_tracking_buffer():
+    tracking_buffer.start()
+
+@app.on_event("shutdown")
+async def stop_worker_pools():
+    # Drain buffered tracking events before the pools go away
+    await tracking_buffer.stop()
+    shutdown_pools()
+
 # Mount uploads directory
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -66,3 +89,25 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/api/health/workers")
+async def worker_health():
+    """Queue depth and throughput of the background pipeline pools."""
+    return get_pool_stats()
+
+@app.get("/api/health/compression")
+async def compression_health():
+    """Negotiated encodings and hit rate of the precompressed deck cache."""
+    return get_compression_stats()
+
+@app.get("/api/health/auth-cache")
+async def auth_cache_health():
+    """Hit rates of the token and user caches behind get_current_user."""
+    return get_auth_cache_stats()
+
+@app.get("/api/health/tracking")
+async def tracking_health():
+    """Backlog and flush stats of the tracking write-behind buffer, and late events missing from the event store."""
+    stats = tracking_buffer.stats()
+    if settings.EVENT_STORE_ENABLED:
+        stats["event_store"] = event_store.stats()
+    return stats
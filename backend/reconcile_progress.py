@@ -0,0 +1,27 @@
+"""
+Reconciliation job for the denormalized plan progress counters.
+
+The counters are kept in step by the Task flush events; this catches drift from
+bulk updates or manual SQL. Safe to run on a schedule (e.g. nightly cron).
+
+Usage: python reconcile_progress.py [user_id]
+"""
+import sys
+
+from app.database import SessionLocal
+from app.services.plan_progress import PlanProgressService
+
+def run_reconciliation(user_id=None):
+    db = SessionLocal()
+    try:
+        repaired = PlanProgressService(db).reconcile(user_id)
+        if repaired:
+            print(f"Repaired progress counters for {len(repaired)} plan(s): {repaired}")
+        else:
+            print("All plan progress counters are consistent.")
+        return repaired
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run_reconciliation(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,8 @@
+"""
+Synthetic-learner simulation for evaluating and benchmarking the schedulers.
+
+Usage: python -m simulation [--learners N] [--workers N] [--memory exponential|power]
+                            [--scheduler adaptive|srs] [--cards N] [--exam-days N] [--json]
+"""
+from simulation.learners import generate_learners, MEMORY_MODELS
+from simulation.runner import run, simulate_learner, summarize, SCHEDULERS
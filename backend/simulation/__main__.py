@@ -0,0 +1,45 @@
+"""
+Simulate synthetic learners through the scheduling and mastery code paths.
+
+Usage: python -m simulation [--learners N] [--workers N] [--memory exponential|power]
+                            [--scheduler adaptive|ai|srs] [--cards N] [--exam-days N] [--json]
+"""
+import argparse
+import json
+
+from simulation.learners import generate_learners, MEMORY_MODELS
+from simulation.runner import run, SCHEDULERS
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic-learner simulation")
+    parser.add_argument("--learners", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--memory", choices=MEMORY_MODELS, default="exponential")
+    parser.add_argument("--scheduler", choices=SCHEDULERS, default="adaptive")
+    parser.add_argument("--cards", type=int, default=60)
+    parser.add_argument("--exam-days", type=int, default=30)
+    parser.add_argument("--replan-every-days", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    learners = generate_learners(args.learners, args.seed, args.memory, args.cards, args.exam_days)
+    report = run(learners, args.scheduler, args.workers, args.replan_every_days)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['learners']} learners ({args.scheduler}, {args.memory} memory) "
+          f"in {report['wall_seconds']}s, {report['learners_per_second']} learners/s")
+    print("Outcomes (mean / p10 / p50 / p90):")
+    for metric, values in report["outcomes"].items():
+        if metric == "srs_calibration":
+            print(f"  SRS predicted recall {values['predicted']} vs actual {values['actual']}")
+        else:
+            print(f"  {metric:<18} {values['mean']:>9} {values['p10']:>9} {values['p50']:>9} {values['p90']:>9}")
+    print("Latency per call (calls, p50 / p95 / max ms):")
+    for name, values in report["latency"].items():
+        print(f"  {name:<28} {values['calls']:>7} {values['p50_ms']:>8} {values['p95_ms']:>8} {values['max_ms']:>8}")
+
+if __name__ == "__main__":
+    main()
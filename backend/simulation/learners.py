@@ -0,0 +1,110 @@
+"""
+Synthetic learners.
+
+A learner has a weekly study budget, a pace (seconds per card), a chance of
+skipping a day, an ability and a memory model that decides whether a card is
+recalled. The simulator only ever sees the learner's answers, never the
+model's state. Two memory models:
+
+- exponential: recall 2 ** (-t / h); a success multiplies the card's
+  half-life h by `growth`, a lapse divides it by `lapse_factor` but never
+  below the card's starting half-life (the answer is shown, so the card is
+  relearned)
+- power: recall (1 + t / (9 S)) ** -1; stability S grows more when recall was
+  low at review time (spacing effect), as in FSRS
+
+Card difficulty scales the starting half-life / stability; ability scales
+both that and how much each review helps.
+"""
+import math
+import random
+from typing import Any, Dict, List, Optional
+
+MEMORY_MODELS = ("exponential", "power")
+
+
+class ExponentialMemory:
+    def __init__(self, rng: random.Random, card_count: int, ability: float,
+                 growth: float = 2.0, lapse_factor: float = 2.0, initial_half_life_hours: float = 24.0):
+        self.growth = growth * ability
+        self.lapse_factor = lapse_factor
+        self.prior = min(0.5, 0.1 * ability)
+        self.initial = [initial_half_life_hours * ability / rng.lognormvariate(0, 0.5) for _ in range(card_count)]
+        self.half_life: List[Optional[float]] = [None] * card_count
+        self.last_hours: List[float] = [0.0] * card_count
+
+    def recall(self, card: int, hours: float) -> float:
+        if self.half_life[card] is None:
+            return self.prior
+        return 2 ** (-(hours - self.last_hours[card]) / self.half_life[card])
+
+    def review(self, card: int, hours: float, recalled: bool):
+        if self.half_life[card] is None:
+            self.half_life[card] = self.initial[card]
+        elif recalled:
+            self.half_life[card] *= self.growth
+        else:
+            # The answer is shown after a lapse, so the card is relearned, not erased
+            self.half_life[card] = max(self.half_life[card] / self.lapse_factor, self.initial[card])
+        self.last_hours[card] = hours
+
+
+class PowerMemory:
+    def __init__(self, rng: random.Random, card_count: int, ability: float,
+                 initial_stability_days: float = 1.0):
+        self.ability = ability
+        self.prior = min(0.5, 0.1 * ability)
+        self.initial = [initial_stability_days * ability / rng.lognormvariate(0, 0.5) for _ in range(card_count)]
+        self.stability: List[Optional[float]] = [None] * card_count
+        self.last_hours: List[float] = [0.0] * card_count
+
+    def recall(self, card: int, hours: float) -> float:
+        if self.stability[card] is None:
+            return self.prior
+        elapsed_days = (hours - self.last_hours[card]) / 24
+        return (1 + elapsed_days / (9 * self.stability[card])) ** -1
+
+    def review(self, card: int, hours: float, recalled: bool):
+        stability = self.stability[card]
+        if stability is None:
+            self.stability[card] = self.initial[card]
+        elif recalled:
+            recall = self.recall(card, hours)
+            self.stability[card] = stability * (1 + self.ability * math.exp(1.5 * (1 - recall)) * stability ** -0.2)
+        else:
+            self.stability[card] = max(stability * 0.3, self.initial[card])
+        self.last_hours[card] = hours
+
+
+def memory_model(name: str, rng: random.Random, card_count: int, ability: float):
+    if name == "exponential":
+        return ExponentialMemory(rng, card_count, ability)
+    if name == "power":
+        return PowerMemory(rng, card_count, ability)
+    raise ValueError(f"Unknown memory model: {name}")
+
+def generate_learners(
+    count: int,
+    seed: int = 0,
+    memory: str = "exponential",
+    cards: int = 60,
+    exam_days: int = 30
+) -> List[Dict[str, Any]]:
+    """Learner specs (plain dicts, so they pickle cheaply to worker processes)."""
+    if memory not in MEMORY_MODELS:
+        raise ValueError(f"Unknown memory model: {memory}")
+    rng = random.Random(seed)
+    return [
+        {
+            "learner_id": index + 1,
+            "seed": rng.randrange(2 ** 31),
+            "memory": memory,
+            "ability": round(rng.lognormvariate(0, 0.3), 3),
+            "hours_per_week": rng.choice((3, 5, 7, 10, 14)),
+            "seconds_per_card": round(rng.uniform(6, 20), 1),
+            "skip_probability": round(rng.uniform(0.0, 0.3), 2),
+            "cards": cards,
+            "exam_days": exam_days,
+        }
+        for index in range(count)
+    ]
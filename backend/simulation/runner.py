@@ -0,0 +1,312 @@
+"""
+Day-by-day simulation of synthetic learners against the real scheduling code.
+
+Every learner is a user with one plan and a deck, created in a scratch SQLite
+database (one per worker process, so workers never contend for a lock). The
+simulated clock starts at SIM_START and each day the learner:
+
+1. replans every `replan_every_days`: the "adaptive" scheduler with
+   AdaptiveLearningService, the "ai" scheduler through the schedule
+   generation that follows a finished pre-assessment
+   (ai_service.generate_study_schedule with USE_MOCK_AI, then
+   tasks._replace_schedule); the "srs" scheduler has
+   no tasks and just studies due cards for the day's budget
+2. may skip the day (skip_probability)
+3. works through the day's tasks: each one becomes a session of due cards
+   from SpacedRepetitionService.due_cards, answered by the learner's memory
+   model and written through write_tracking_batch, the tracking flush path
+   (SRS state, learning stats, profiles)
+4. updates mastery like the client does and completes the task, which
+   records the activity day and rebalances with UserScheduler
+
+At the exam the learner's true recall of every card is measured. Each
+application call is timed, and the per-call latencies are merged across all
+learners.
+"""
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional
+
+from simulation.learners import memory_model
+
+SIM_START = datetime(2030, 1, 7, 18, 0)
+SCHEDULERS = ("adaptive", "ai", "srs")
+MASTERY_WEIGHT = 0.3  # Client-side moving average of answers, in percent
+
+
+def _init_worker(scratch_dir: str):
+    """Point this process at its own scratch database (before any app import) and create the tables."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch_dir, f'sim-{os.getpid()}.db')}"
+    os.environ["EVENT_STORE_ENABLED"] = "False"
+    os.environ["USE_MOCK_AI"] = "True"  # The "ai" scheduler never calls OpenAI
+    from app.database import Base, engine
+    import app.models  # noqa: F401 - registers the tables
+    Base.metadata.create_all(bind=engine)
+
+def _timed(latencies: Dict[str, List[float]], name: str, fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    latencies[name].append((time.perf_counter() - started) * 1000)
+    return result
+
+def _create_learner(db, spec: Dict[str, Any]):
+    from app.models import (
+        User, StudyPlan, Flashcard, StudyPlanType, StudyPlanStatus, MaterialCategory
+    )
+    user = User(
+        email=f"learner{spec['learner_id']}@sim.local",
+        hashed_password="!",
+        study_hours_per_week=spec["hours_per_week"]
+    )
+    db.add(user)
+    db.flush()
+    plan = StudyPlan(
+        user_id=user.id,
+        name=f"Simulated deck {spec['learner_id']}",
+        type=StudyPlanType.FLASHCARD_SET,
+        category=MaterialCategory.VOCABULARY,
+        exam_date=SIM_START + timedelta(days=spec["exam_days"]),
+        status=StudyPlanStatus.ACTIVE,
+        created_at=SIM_START
+    )
+    db.add(plan)
+    db.flush()
+    db.bulk_insert_mappings(Flashcard, [
+        {"study_plan_id": plan.id, "front_text": f"front {index}", "back_text": f"back {index}"}
+        for index in range(spec["cards"])
+    ])
+    db.commit()
+    first_card = db.query(Flashcard.id).filter(Flashcard.study_plan_id == plan.id).order_by(Flashcard.id).first()[0]
+    return user.id, plan.id, first_card
+
+def _update_mastery(db, levels: Dict[int, float]):
+    """What the client does after a session (one POST /flashcards/update-mastery)."""
+    from app.services.mastery import MasteryService
+    MasteryService(db).set_mastery(levels, studied=True)
+    db.commit()
+
+def _study_session(db, spec, state, latencies, user_id, plan_id, now, minutes) -> float:
+    """Answer due cards for up to `minutes`. Returns the minutes actually spent."""
+    from app.services.srs import SpacedRepetitionService
+    from app.tracking_buffer import write_tracking_batch
+
+    limit = int(minutes * 60 / spec["seconds_per_card"])
+    if limit <= 0:
+        return 0.0
+    cards = _timed(latencies, "due_cards", SpacedRepetitionService(db).due_cards, plan_id, limit, now=now)
+    if not cards:
+        return 0.0
+
+    rng, memory, first_card = state["rng"], state["memory"], state["first_card"]
+    events = []
+    levels = {}
+    at = now
+    for card in cards:
+        hours = (at - SIM_START).total_seconds() / 3600
+        index = card["id"] - first_card
+        recalled = rng.random() < memory.recall(index, hours)
+        memory.review(index, hours, recalled)
+        events.append({
+            "user_id": user_id,
+            "study_plan_id": plan_id,
+            "mode": "learn",
+            "flashcard_id": card["id"],
+            "is_correct": recalled,
+            "response_time_ms": int(spec["seconds_per_card"] * 1000 * rng.uniform(0.5, 1.5)),
+            "attempts_needed": 1,
+            "client_event_id": None,
+            "created_at": at,
+        })
+        score = 100.0 if recalled else 0.0
+        levels[card["id"]] = (card["mastery_level"] or 0.0) * (1 - MASTERY_WEIGHT) + score * MASTERY_WEIGHT
+        at += timedelta(seconds=spec["seconds_per_card"])
+    db.rollback()  # End the read transaction before the flush opens its own session
+    _timed(latencies, "tracking_flush", write_tracking_batch, events)
+    _timed(latencies, "update_mastery", _update_mastery, db, levels)
+    state["reviews"] += len(events)
+    return len(events) * spec["seconds_per_card"] / 60
+
+def _generate_ai_schedule(db, latencies, user_id: int, plan_id: int, now: datetime):
+    """The generate_schedule_background task without the event loop: load inputs, generate, replace the tasks."""
+    from app.ai_service import ai_service
+    from app.routers.tasks import _load_schedule_inputs, _replace_schedule
+    db.rollback()  # The steps open their own sessions
+    inputs = _timed(latencies, "load_schedule_inputs", _load_schedule_inputs, plan_id, user_id)
+    if not inputs:
+        return
+    plan_data, flashcards_data, user_prefs, _ = inputs
+    tasks_data = _timed(latencies, "generate_study_schedule",
+                        ai_service.generate_study_schedule, plan_data, flashcards_data, user_prefs)
+    _timed(latencies, "replace_schedule", _replace_schedule, plan_id, tasks_data, False, today=now.date())
+
+def _complete_task(db, task_id: int, user_id: int, now: datetime):
+    """POST /tasks/{id}/complete without the HTTP layer."""
+    from app.models import Task
+    from app.services.study_activity import StudyActivityService
+    from app.services.user_scheduler import UserScheduler
+    task = db.get(Task, task_id)
+    task.completion_status = True
+    task.completed_at = now
+    db.commit()
+    StudyActivityService(db).record_task_completed(user_id, now.date())
+    UserScheduler(db).rebalance(user_id, now.date())
+
+def simulate_learner(spec: Dict[str, Any], scheduler: str = "adaptive", replan_every_days: int = 7) -> Dict[str, Any]:
+    """Run one learner from SIM_START to the exam. Runs in a worker set up by _init_worker."""
+    from app.database import SessionLocal
+    from app.models import Flashcard, Task, StudyPlan
+    from app.services.adaptive_learning import AdaptiveLearningService
+    from app.services.srs import retrievability
+    from app.services.study_activity import day_bounds
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    rng = random.Random(spec["seed"])
+    minutes_studied = 0.0
+    days_studied = tasks_completed = 0
+    daily_budget = spec["hours_per_week"] * 60 / 7
+
+    with SessionLocal() as db:
+        user_id, plan_id, first_card = _create_learner(db, spec)
+        state = {
+            "rng": rng,
+            "memory": memory_model(spec["memory"], rng, spec["cards"], spec["ability"]),
+            "first_card": first_card,
+            "reviews": 0,
+        }
+
+        for day in range(spec["exam_days"]):
+            now = SIM_START + timedelta(days=day)
+            if scheduler == "adaptive" and day % replan_every_days == 0:
+                _timed(latencies, "generate_adaptive_schedule",
+                       AdaptiveLearningService(db).generate_adaptive_schedule, plan_id, now=now)
+            elif scheduler == "ai" and day % replan_every_days == 0:
+                _generate_ai_schedule(db, latencies, user_id, plan_id, now)
+            if rng.random() < spec["skip_probability"]:
+                continue
+
+            available = daily_budget * rng.uniform(0.7, 1.3)
+            spent = 0.0
+            if scheduler == "srs":
+                spent = _study_session(db, spec, state, latencies, user_id, plan_id, now, available)
+            else:
+                start, end = day_bounds(now.date())
+                todays = _timed(latencies, "tasks_today", lambda: db.query(Task.id, Task.estimated_minutes).join(StudyPlan).filter(
+                    StudyPlan.user_id == user_id,
+                    Task.scheduled_date >= start,
+                    Task.scheduled_date < end,
+                    Task.completion_status == False
+                ).order_by(Task.order).all())
+                for task_id, estimated_minutes in todays:
+                    if spent >= available:
+                        break
+                    session_minutes = min(estimated_minutes or 20, available - spent)
+                    at = now + timedelta(minutes=spent)
+                    spent += _study_session(db, spec, state, latencies, user_id, plan_id, at, session_minutes)
+                    _timed(latencies, "complete_task", _complete_task, db, task_id, user_id, at)
+                    tasks_completed += 1
+            minutes_studied += spent
+            days_studied += spent > 0
+
+        # Outcomes at the exam
+        exam = SIM_START + timedelta(days=spec["exam_days"])
+        exam_hours = spec["exam_days"] * 24.0
+        memory = state["memory"]
+        true_recall = [memory.recall(index, exam_hours) for index in range(spec["cards"])]
+        predicted, actual = [], []
+        for card_id, stability, last_review in db.query(
+            Flashcard.id, Flashcard.srs_stability, Flashcard.srs_last_review_at
+        ).filter(Flashcard.study_plan_id == plan_id, Flashcard.srs_stability.isnot(None)):
+            predicted.append(retrievability((exam - last_review).total_seconds() / 86400, stability))
+            actual.append(true_recall[card_id - first_card])
+
+    return {
+        "learner_id": spec["learner_id"],
+        "recall_at_exam": statistics.fmean(true_recall),
+        "minutes_studied": minutes_studied,
+        "days_studied": days_studied,
+        "tasks_completed": tasks_completed,
+        "reviews": state["reviews"],
+        "srs_predicted_recall": statistics.fmean(predicted) if predicted else None,
+        "srs_actual_recall": statistics.fmean(actual) if actual else None,
+        "latencies": dict(latencies),
+    }
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Outcome distribution over learners and latency per application call."""
+    outcomes = {}
+    for metric in ("recall_at_exam", "minutes_studied", "days_studied", "tasks_completed", "reviews"):
+        values = [result[metric] for result in results]
+        outcomes[metric] = {
+            "mean": round(statistics.fmean(values), 3),
+            "p10": round(_percentile(values, 0.1), 3),
+            "p50": round(_percentile(values, 0.5), 3),
+            "p90": round(_percentile(values, 0.9), 3),
+        }
+    calibrated = [result for result in results if result["srs_predicted_recall"] is not None]
+    if calibrated:
+        outcomes["srs_calibration"] = {
+            "predicted": round(statistics.fmean(r["srs_predicted_recall"] for r in calibrated), 3),
+            "actual": round(statistics.fmean(r["srs_actual_recall"] for r in calibrated), 3),
+        }
+
+    samples = defaultdict(list)
+    for result in results:
+        for name, values in result["latencies"].items():
+            samples[name].extend(values)
+    latency = {
+        name: {
+            "calls": len(values),
+            "p50_ms": round(_percentile(values, 0.5), 2),
+            "p95_ms": round(_percentile(values, 0.95), 2),
+            "max_ms": round(max(values), 2),
+        }
+        for name, values in sorted(samples.items())
+    }
+    return {
+        "learners": len(results),
+        "wall_seconds": round(wall_seconds, 2),
+        "learners_per_second": round(len(results) / wall_seconds, 2) if wall_seconds else None,
+        "outcomes": outcomes,
+        "latency": latency,
+    }
+
+def run(
+    learners: List[Dict[str, Any]],
+    scheduler: str = "adaptive",
+    workers: Optional[int] = None,
+    replan_every_days: int = 7,
+    scratch_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """Simulate all learners across `workers` processes (default: all cores) and summarize."""
+    if scheduler not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler: {scheduler}")
+    workers = workers or os.cpu_count() or 1
+    owns_scratch = scratch_dir is None
+    scratch_dir = scratch_dir or tempfile.mkdtemp(prefix="studyahead-sim-")
+    started = time.perf_counter()
+    try:
+        # Spawned workers import the app only after _init_worker has set their database
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context("spawn"),
+            initializer=_init_worker, initargs=(scratch_dir,)
+        ) as pool:
+            results = list(pool.map(
+                simulate_learner, learners, [scheduler] * len(learners), [replan_every_days] * len(learners),
+                chunksize=max(1, len(learners) // (workers * 4))
+            ))
+    finally:
+        if owns_scratch:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    return summarize(results, time.perf_counter() - started)
@@ -1,6 +1,8 @@
 import { useEffect, useState, useRef } from 'react'
 import { useParams, useNavigate, useSearchParams } from 'react-router-dom'
 import api from '../../services/api'
+import { fetchStudySession } from '../../services/studyBundle'
+import { queueMasteryUpdate, flushMasteryUpdates } from '../../utils/mastery'
 import { ArrowLeft, RotateCcw, Trophy, CheckCircle2, XCircle } from 'lucide-react'
 
 // Reuse LCS diff from WritingPractice
@@ -44,6 +46,42 @@ const compareAnswers = (userAnswer, correctAnswer) => {
   return { isCorrect: false, diff: { user: userDiff, correct: correctDiff } }
 }
 
+// One gap item per card that has an example sentence with a highlighted word
+const buildGapItems = (cards, sentencesMap) => {
+  const items = []
+  for (const card of cards) {
+    const sentences = sentencesMap[card.id] || []
+    if (sentences.length > 0) {
+      const randomSentence = sentences[Math.floor(Math.random() * sentences.length)]
+      let correctWord = ''
+      let hint = card.front_text
+
+      if (randomSentence.highlighted_words && randomSentence.highlighted_words.length > 0) {
+        const firstHighlight = randomSentence.highlighted_words[0]
+        if (typeof firstHighlight === 'string') {
+          const start = randomSentence.sentence_text.indexOf(firstHighlight)
+          correctWord = start !== -1 ? randomSentence.sentence_text.substring(start, start + firstHighlight.length) : firstHighlight
+        } else if (firstHighlight && typeof firstHighlight === 'object') {
+          correctWord = randomSentence.sentence_text.substring(firstHighlight.start_index, firstHighlight.end_index)
+        }
+      }
+
+      if (correctWord) {
+        items.push({
+          flashcardId: card.id,
+          flashcardFront: card.front_text,
+          flashcardBack: card.back_text,
+          sentenceId: randomSentence.id,
+          sentence: randomSentence.sentence_text,
+          correctWord: correctWord,
+          hint: hint
+        })
+      }
+    }
+  }
+  return items
+}
+
 const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
   const { planId: paramPlanId, id: paramId } = useParams()
   const planId = paramPlanId || paramId
@@ -65,6 +103,7 @@ const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
 
   const [vocabularySentences, setVocabularySentences] = useState({})
   const [wordStatus, setWordStatus] = useState({}) // { [id]: { known: bool, attempts: int } }
+  const [sessionGoal, setSessionGoal] = useState(0) // sentences to get right in this session
 
   const inputRef = useRef(null)
 
@@ -76,11 +115,18 @@ const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
     }
   }, [planId, preLoadedCards])
 
-  const fetchData = async () => {
+  // `exclude` holds the cards of the previous session, so a restart moves on
+  // to the next most urgent ones; once the deck is used up it starts over
+  const fetchData = async (exclude = []) => {
     setLoading(true)
     try {
-      const response = await api.get(`/flashcards/study-plan/${planId}`)
-      await prepareGapItems(response.data)
+      // The server composes the session, most urgent cards first
+      let session = await fetchStudySession(planId, { exclude })
+      if (session.flashcards.length === 0 && exclude.length > 0) {
+        session = await fetchStudySession(planId)
+      }
+      const items = await prepareGapItems(session.flashcards)
+      setSessionGoal(items.length)
     } catch (error) {
       console.error('Failed to fetch flashcards:', error)
     } finally {
@@ -99,50 +145,25 @@ const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
     })
     setWordStatus(status)
 
-    // Fetch vocabulary sentences for all flashcards
+    // Composed session cards carry their sentences; only fall back to a fetch otherwise
     let sentencesMap = {}
-    try {
-      const sentencesRes = await api.get(`/flashcards/study-plan/${planId}/sentences`)
-      sentencesMap = sentencesRes.data || {}
-    } catch (error) {
-      console.error('Failed to fetch sentences:', error)
-    }
-
-    const items = []
-    for (const card of cards) {
-      const sentences = sentencesMap[card.id] || []
-      if (sentences.length > 0) {
-        const randomSentence = sentences[Math.floor(Math.random() * sentences.length)]
-        let correctWord = ''
-        let hint = card.front_text
-
-        if (randomSentence.highlighted_words && randomSentence.highlighted_words.length > 0) {
-          const firstHighlight = randomSentence.highlighted_words[0]
-          if (typeof firstHighlight === 'string') {
-            const start = randomSentence.sentence_text.indexOf(firstHighlight)
-            correctWord = start !== -1 ? randomSentence.sentence_text.substring(start, start + firstHighlight.length) : firstHighlight
-          } else if (firstHighlight && typeof firstHighlight === 'object') {
-            correctWord = randomSentence.sentence_text.substring(firstHighlight.start_index, firstHighlight.end_index)
-          }
-        }
-
-        if (correctWord) {
-          items.push({
-            flashcardId: card.id,
-            flashcardFront: card.front_text,
-            flashcardBack: card.back_text,
-            sentenceId: randomSentence.id,
-            sentence: randomSentence.sentence_text,
-            correctWord: correctWord,
-            hint: hint
-          })
-        }
+    if (cards.every(card => Array.isArray(card.vocabulary_sentences))) {
+      cards.forEach(card => {
+        sentencesMap[card.id] = card.vocabulary_sentences
+      })
+    } else {
+      try {
+        const sentencesRes = await api.get(`/flashcards/study-plan/${planId}/sentences`)
+        sentencesMap = sentencesRes.data || {}
+      } catch (error) {
+        console.error('Failed to fetch sentences:', error)
       }
     }
 
+    const items = buildGapItems(cards, sentencesMap)
+    setGapItems(items)
+
     if (items.length > 0) {
-      const shuffled = [...items].sort(() => Math.random() - 0.5)
-      setGapItems(shuffled)
       setVocabularySentences(sentencesMap)
       setLoading(false)
     } else {
@@ -156,6 +177,7 @@ const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
         }
       }
     }
+    return items
   }
 
   const currentGap = gapItems[currentIndex]
@@ -181,8 +203,7 @@ const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
       // Update mastery
       const flashcard = flashcards.find(fc => fc.id === flashcardId)
       if (flashcard) {
-        api.post(`/flashcards/${flashcardId}/update-mastery?mastery_level=${Math.min(100, (flashcard.mastery_level || 0) + 10)}`)
-          .catch(console.error)
+        queueMasteryUpdate(flashcardId, Math.min(100, (flashcard.mastery_level || 0) + 10))
       }
     } else {
       setIncorrectCount(prev => prev + 1)
@@ -192,51 +213,67 @@ const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
     setWordStatus(prev => ({ ...prev, [flashcardId]: status }))
   }
 
-  const handleContinue = () => {
-    if (!currentGap) return
+  // A practice round ran out before the session goal was reached: let the
+  // composer pick the rest of the session from every card not yet known, so
+  // missed words come back from the server instead of being re-inserted here
+  const fetchNextRound = async () => {
+    const knownIds = Object.keys(wordStatus).filter(id => wordStatus[id].known).map(Number)
+    if (knownIds.length >= sessionGoal) return []
+    try {
+      await flushMasteryUpdates()
+      const { flashcards: cards, sentencesByCard } = await fetchStudySession(planId, {
+        size: sessionGoal - knownIds.length,
+        exclude: knownIds
+      })
+      const ids = new Set(cards.map(card => card.id))
+      setFlashcards(prev => [...prev.filter(card => !ids.has(card.id)), ...cards])
+      setWordStatus(prev => {
+        const next = { ...prev }
+        cards.forEach(card => {
+          if (!next[card.id]) next[card.id] = { known: false, attempts: 0 }
+        })
+        return next
+      })
+      setVocabularySentences(prev => ({ ...prev, ...sentencesByCard }))
+      return buildGapItems(cards, sentencesByCard)
+    } catch (error) {
+      console.error('Failed to fetch the next round:', error)
+      return []
+    }
+  }
 
-    const flashcardId = currentGap.flashcardId
-    const status = wordStatus[flashcardId]
+  const handleContinue = async () => {
+    if (!currentGap) return
 
-    if (result?.isCorrect || isTestMode) {
-      // Remove gap from deck
-      const newGaps = gapItems.filter((_, i) => i !== currentIndex)
-      if (newGaps.length === 0) {
-        setCompleted(true)
-        if (onComplete) {
-          onComplete(wordStatus)
-        } else if (window.testFlowCallback) {
-          window.testFlowCallback(wordStatus)
-        } else if (taskId && !isTestMode) {
-          // Mark task as complete for standalone mode
-          api.post(`/tasks/${taskId}/complete`, {}).then(() => {
-            console.log('Task marked as complete')
-          }).catch(err => {
-            console.error('Failed to mark task as complete:', err)
-          })
-        }
-        return
-      }
+    // Answered gaps leave the round either way; a test only asks each one once
+    let newGaps = gapItems.filter((_, i) => i !== currentIndex)
+    let newIndex = currentIndex >= newGaps.length ? newGaps.length - 1 : currentIndex
+    if (newGaps.length === 0 && !isTestMode && !preLoadedCards) {
+      newGaps = await fetchNextRound()
+      newIndex = 0
+    }
 
-      // Adjust index
-      const newIndex = currentIndex >= newGaps.length ? newGaps.length - 1 : currentIndex
-      setGapItems(newGaps)
-      setCurrentIndex(newIndex)
-    } else {
-      // Re-insert 3-5 positions ahead
-      const insertPosition = currentIndex + Math.floor(Math.random() * 3) + 3
-      const newGaps = [...gapItems]
-      newGaps.splice(insertPosition, 0, currentGap)
-      setGapItems(newGaps)
-
-      // Move to next
-      if (currentIndex < gapItems.length - 1) {
-        setCurrentIndex(currentIndex + 1)
-      } else {
-        setCurrentIndex(0)
+    if (newGaps.length === 0) {
+      setCompleted(true)
+      flushMasteryUpdates()
+      if (onComplete) {
+        onComplete(wordStatus)
+      } else if (window.testFlowCallback) {
+        window.testFlowCallback(wordStatus)
+      } else if (taskId && !isTestMode) {
+        // Mark task as complete for standalone mode
+        api.post(`/tasks/${taskId}/complete`, {}).then(() => {
+          console.log('Task marked as complete')
+        }).catch(err => {
+          console.error('Failed to mark task as complete:', err)
+        })
       }
+      return
     }
 
+    setGapItems(newGaps)
+    setCurrentIndex(newIndex)
+
     // Reset state
     setUserAnswer('')
     setSubmitted(false)
@@ -254,11 +291,7 @@ const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
   }
 
   const handleRestart = () => {
-    const status = {}
-    flashcards.forEach(card => {
-      status[card.id] = { known: false, attempts: 0 }
-    })
-    setWordStatus(status)
+    fetchData(Object.keys(wordStatus).map(Number))
     setCorrectCount(0)
     setIncorrectCount(0)
     setCompleted(false)
@@ -266,10 +299,6 @@ const FillTheGaps = ({ preLoadedCards, onComplete, isTestMode }) => {
     setUserAnswer('')
     setSubmitted(false)
     setResult(null)
-
-    // Reshuffle
-    const shuffled = [...gapItems].sort(() => Math.random() - 0.5)
-    setGapItems(shuffled)
   }
 
 
@@ -1,8 +1,10 @@
 import { useEffect, useState, useRef } from 'react'
 import { useParams, useNavigate, useSearchParams } from 'react-router-dom'
 import api from '../../services/api'
-import { logStudyActivity } from '../../utils/tracking'
-import { ArrowLeft, ChevronLeft, ChevronRight, RotateCcw, Shuffle, CheckCircle2, XCircle, RefreshCw } from 'lucide-react'
+import { fetchStudySession } from '../../services/studyBundle'
+import { logStudyActivity, flushStudyActivity } from '../../utils/tracking'
+import { queueMasteryUpdate, flushMasteryUpdates } from '../../utils/mastery'
+import { ArrowLeft, ChevronLeft, ChevronRight, RotateCcw, CheckCircle2, XCircle, RefreshCw } from 'lucide-react'
 
 const LearnMode = () => {
   const { planId: paramPlanId, id: paramId } = useParams()
@@ -20,6 +22,7 @@ const LearnMode = () => {
 
   // Status tracking
   const [cardStatus, setCardStatus] = useState({}) // flashcardId -> { known: false, attempts: 0 }
+  const [sessionGoal, setSessionGoal] = useState(0) // cards to get right in this session
   const [isProcessing, setIsProcessing] = useState(false)
   const [completed, setCompleted] = useState(false)
 
@@ -35,15 +38,21 @@ const LearnMode = () => {
     setStartTime(Date.now())
   }, [currentIndex])
 
-  const fetchData = async () => {
+  // `exclude` holds the cards of the previous session, so a restart moves on
+  // to the next most urgent ones; once the deck is used up it starts over
+  const fetchData = async (exclude = []) => {
     try {
       setLoading(true)
-      // Fetch flashcards
-      const response = await api.get(`/flashcards/study-plan/${planId}`)
-      const cards = response.data
+      // The server composes the session, most urgent cards first
+      let session = await fetchStudySession(planId, { exclude })
+      if (session.flashcards.length === 0 && exclude.length > 0) {
+        session = await fetchStudySession(planId)
+      }
+      const { flashcards: cards, sentencesByCard } = session
 
       if (Array.isArray(cards)) {
         setFlashcards(cards)
+        setSessionGoal(cards.length)
 
         // Initialize status for all cards
         const initialStatus = {}
@@ -51,23 +60,7 @@ const LearnMode = () => {
           initialStatus[card.id] = { known: false, attempts: 0 }
         })
         setCardStatus(initialStatus)
-
-        // Fetch vocabulary sentences for all cards (if needed, or fetch on demand)
-        // For now, let's try to fetch them in batch or individually if the API supports it
-        // Assuming we might need to fetch them one by one or they come with flashcards.
-        // If they don't come with flashcards, we might need a separate call.
-        // Based on previous context, let's assume we fetch them or they are part of the card data?
-        // If not, we can fetch for the current card.
-        // Let's check if we can fetch sentences.
-        try {
-          const sentencesRes = await api.get(`/flashcards/study-plan/${planId}/sentences`)
-          // Store sentences grouped by flashcard ID
-          if (sentencesRes.data) {
-            setVocabularySentences(sentencesRes.data)
-          }
-        } catch (err) {
-          console.log('Could not fetch vocabulary sentences batch', err)
-        }
+        setVocabularySentences(sentencesByCard)
       }
     } catch (error) {
       console.error('Failed to fetch flashcards:', error)
@@ -80,25 +73,37 @@ const LearnMode = () => {
     fetchData()
   }, [planId])
 
-  // Fetch sentences for current card if missing
-  useEffect(() => {
-    const currentCard = flashcards[currentIndex]
-    if (currentCard && !vocabularySentences[currentCard.id]) {
-      api.get(`/flashcards/${currentCard.id}/sentences`)
-        .then(res => {
-          setVocabularySentences(prev => ({
-            ...prev,
-            [currentCard.id]: res.data
-          }))
-        })
-        .catch(err => console.log('No sentences found', err))
-    }
-  }, [currentIndex, flashcards])
-
   const currentCard = flashcards[currentIndex]
   const totalCards = Object.keys(cardStatus).length
   const knownCards = Object.values(cardStatus).filter(s => s.known).length
-  const progress = totalCards > 0 ? (knownCards / totalCards) * 100 : 0
+  const progress = sessionGoal > 0 ? (knownCards / sessionGoal) * 100 : 0
+
+  // A round ran out before the session goal was reached. Send the answers so
+  // far, then let the composer pick the rest of the session from every card
+  // not yet known: missed cards stay urgent and come back from the server
+  // instead of being re-inserted here.
+  const fetchNextRound = async (knownIds) => {
+    if (knownIds.length >= sessionGoal) return []
+    try {
+      await Promise.all([flushStudyActivity(), flushMasteryUpdates()])
+      const { flashcards: cards, sentencesByCard } = await fetchStudySession(planId, {
+        size: sessionGoal - knownIds.length,
+        exclude: knownIds
+      })
+      setCardStatus(prev => {
+        const next = { ...prev }
+        cards.forEach(card => {
+          if (!next[card.id]) next[card.id] = { known: false, attempts: 0 }
+        })
+        return next
+      })
+      setVocabularySentences(prev => ({ ...prev, ...sentencesByCard }))
+      return cards
+    } catch (error) {
+      console.error('Failed to fetch the next round:', error)
+      return []
+    }
+  }
 
   // Swipe gesture handlers
   const handleTouchStart = (e) => {
@@ -183,62 +188,47 @@ const LearnMode = () => {
       const responseTime = Date.now() - startTime
       logStudyActivity(planId, 'learn', cardId, isKnown, responseTime, (cardStatus[cardId]?.attempts || 0) + 1)
 
-      // Update counters
+      // Update mastery level (sent in batches)
       if (isKnown) {
-        // Update mastery level
-        try {
-          const newMastery = Math.min(100, (currentCard.mastery_level || 0) + 10)
-          await api.post(`/flashcards/${cardId}/update-mastery?mastery_level=${newMastery}`)
-        } catch (error) {
-          console.error('Failed to update mastery:', error)
-        }
+        queueMasteryUpdate(cardId, Math.min(100, (currentCard.mastery_level || 0) + 10))
+      }
 
-        // Remove card from deck
-        const newCards = flashcards.filter((_, i) => i !== currentIndex)
-        if (newCards.length === 0) {
-          setCompleted(true)
-
-          // Mark task as complete if taskId is present
-          if (taskId) {
-            try {
-              await api.post(`/tasks/${taskId}/complete`, {
-                time_spent: Math.round((Date.now() - startTime) / 1000)
-              })
-              console.log('Task marked as complete')
-            } catch (error) {
-              console.error('Failed to mark task as complete:', error)
-            }
-          }
+      // Answered cards leave the round either way
+      let newCards = flashcards.filter((_, i) => i !== currentIndex)
+      let newIndex = currentIndex >= newCards.length ? newCards.length - 1 : currentIndex
+      if (newCards.length === 0) {
+        const knownIds = Object.keys(cardStatus)
+          .filter(id => cardStatus[id].known && Number(id) !== cardId)
+          .map(Number)
+        if (isKnown) knownIds.push(cardId)
+        newCards = await fetchNextRound(knownIds)
+        newIndex = 0
+      }
 
-          setIsProcessing(false)
-          setDragOffset({ x: 0, y: 0, rotation: 0 })
-          return
+      if (newCards.length === 0) {
+        setCompleted(true)
+
+        // Mark task as complete if taskId is present
+        if (taskId) {
+          try {
+            await flushMasteryUpdates()
+            await api.post(`/tasks/${taskId}/complete`, {
+              time_spent: Math.round((Date.now() - startTime) / 1000)
+            })
+            console.log('Task marked as complete')
+          } catch (error) {
+            console.error('Failed to mark task as complete:', error)
+          }
         }
 
-        // Adjust index
-        const newIndex = currentIndex >= newCards.length ? newCards.length - 1 : currentIndex
-        setFlashcards(newCards)
-        setCurrentIndex(newIndex)
-      } else {
-        // Re-insert card 3-5 positions ahead
-        const insertPosition = currentIndex + Math.floor(Math.random() * 3) + 3
-        const newCards = [...flashcards]
-        // Remove current
-        newCards.splice(currentIndex, 1)
-        // Insert ahead (handling bounds)
-        const realInsertPos = Math.min(insertPosition, newCards.length)
-        newCards.splice(realInsertPos, 0, currentCard)
-
-        setFlashcards(newCards)
-        // If we inserted after current index, we stay at current index (which is now the next card)
-        // If we inserted before (unlikely given logic), we'd need to adjust.
-        // Since we removed current, the next card slides into currentIndex.
-        // So we just keep currentIndex, unless it's out of bounds.
-        if (currentIndex >= newCards.length) {
-          setCurrentIndex(0)
-        }
+        setIsProcessing(false)
+        setDragOffset({ x: 0, y: 0, rotation: 0 })
+        return
       }
 
+      setFlashcards(newCards)
+      setCurrentIndex(newIndex)
+
       setFlipped(false)
       setDragOffset({ x: 0, y: 0, rotation: 0 })
       setIsProcessing(false)
@@ -265,20 +255,13 @@ const LearnMode = () => {
     }
   }
 
-  const handleShuffle = () => {
-    const shuffled = [...flashcards].sort(() => Math.random() - 0.5)
-    setFlashcards(shuffled)
-    setCurrentIndex(0)
-    setFlipped(false)
-  }
-
   const handleSwapSides = () => {
     setSideSwapped(!sideSwapped)
   }
 
   const handleRestart = () => {
     setLoading(true)
-    fetchData()
+    fetchData(Object.keys(cardStatus).map(Number))
     setCompleted(false)
     setFlipped(false)
     setCurrentIndex(0)
@@ -421,7 +404,7 @@ const LearnMode = () => {
 
           <div className="flex items-center gap-3">
             <div className="text-sm font-medium text-slate-600 dark:text-slate-300">
-              {currentIndex + 1} / {totalCards}
+              {knownCards} / {sessionGoal}
             </div>
 
             <button
@@ -431,14 +414,6 @@ const LearnMode = () => {
               <span>{sideSwapped ? 'Answer' : 'Term'}</span>
               <RefreshCw size={12} />
             </button>
-
-            <button
-              onClick={handleShuffle}
-              className="p-1.5 hover:bg-gray-100 dark:hover:bg-slate-700 rounded-lg transition-colors"
-              title="Shuffle"
-            >
-              <Shuffle size={18} />
-            </button>
           </div>
         </div>
 
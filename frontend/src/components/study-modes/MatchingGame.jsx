@@ -1,6 +1,7 @@
 import { useEffect, useState, useRef } from 'react'
 import { useParams, useNavigate, useSearchParams } from 'react-router-dom'
 import api from '../../services/api'
+import { fetchStudySession } from '../../services/studyBundle'
 import { ArrowLeft, RotateCcw, Trophy } from 'lucide-react'
 
 const BOARD_SIZE = 5
@@ -52,10 +53,16 @@ const MatchingGame = ({ preLoadedCards, onComplete, isTestMode }) => {
     return () => stopTimer()
   }, [planId, preLoadedCards])
 
-  const fetchData = async () => {
+  // `exclude` holds the pairs of the previous game, so a restart moves on to
+  // the next most urgent cards; once the deck is used up it starts over
+  const fetchData = async (exclude = []) => {
     try {
-      const response = await api.get(`/flashcards/study-plan/${planId}`)
-      initializeGame(response.data)
+      // The server composes the session, most urgent cards first
+      let session = await fetchStudySession(planId, { exclude })
+      if (session.flashcards.length === 0 && exclude.length > 0) {
+        session = await fetchStudySession(planId)
+      }
+      initializeGame(session.flashcards)
     } catch (error) {
       console.error('Failed to fetch flashcards:', error)
     } finally {
@@ -69,19 +76,20 @@ const MatchingGame = ({ preLoadedCards, onComplete, isTestMode }) => {
       if (onComplete) onComplete({ masteredCount: 0, failedCount: 0, elapsedTime: 0 })
       return
     }
-    const shuffledPairs = [...flashcards].sort(() => Math.random() - 0.5)
-    setTotalPairs(shuffledPairs.length)
+    // Pairs enter the board in the order given, most urgent first; the slots
+    // are scrambled below
+    setTotalPairs(flashcards.length)
 
     // Store flashcard data for retry logic
     const flashcardsMap = {}
-    shuffledPairs.forEach(fc => {
+    flashcards.forEach(fc => {
       flashcardsMap[fc.id] = fc
     })
     flashcardsMapRef.current = flashcardsMap
 
     // We need to fill slots initially.
-    const initialBoardPairs = shuffledPairs.slice(0, BOARD_SIZE)
-    const remainingQueue = shuffledPairs.slice(BOARD_SIZE)
+    const initialBoardPairs = flashcards.slice(0, BOARD_SIZE)
+    const remainingQueue = flashcards.slice(BOARD_SIZE)
 
     // Create initial items
     const leftItems = initialBoardPairs.map(p => ({
@@ -344,7 +352,7 @@ const MatchingGame = ({ preLoadedCards, onComplete, isTestMode }) => {
 
   const handleRestart = () => {
     setLoading(true)
-    fetchData()
+    fetchData(Object.keys(flashcardsMapRef.current).map(Number))
   }
 
   if (loading) {
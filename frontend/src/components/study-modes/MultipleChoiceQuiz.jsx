@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react'
 import { useParams, useNavigate, useSearchParams } from 'react-router-dom'
 import api from '../../services/api'
+import { fetchStudySession } from '../../services/studyBundle'
 import { logStudyActivity } from '../../utils/tracking'
 import { ArrowLeft, CheckCircle2, XCircle, RotateCcw, Trophy, Menu, Settings } from 'lucide-react'
 
@@ -29,7 +30,7 @@ const MultipleChoiceQuiz = ({ preLoadedCards, onComplete, isTestMode }) => {
   const [filterStandard, setFilterStandard] = useState(true)
   const [filterReverse, setFilterReverse] = useState(true)
   const [filterCreative, setFilterCreative] = useState(true)
-  const [randomMode, setRandomMode] = useState(true)
+  const [randomMode, setRandomMode] = useState(false) // off: most urgent cards first
 
   const [startTime, setStartTime] = useState(Date.now())
   const [flashcards, setFlashcards] = useState([])
@@ -49,10 +50,16 @@ const MultipleChoiceQuiz = ({ preLoadedCards, onComplete, isTestMode }) => {
     }
   }, [planId, preLoadedCards])
 
-  const fetchData = async () => {
+  // `exclude` holds the cards of the previous quiz, so a restart moves on to
+  // the next most urgent ones; once the deck is used up it starts over
+  const fetchData = async (exclude = []) => {
     try {
-      const response = await api.get(`/study-plans/${planId}/quiz`)
-      const flashcardsData = response.data
+      // The server composes the session, most urgent cards first
+      let session = await fetchStudySession(planId, { exclude })
+      if (session.flashcards.length === 0 && exclude.length > 0) {
+        session = await fetchStudySession(planId)
+      }
+      const flashcardsData = session.flashcards
 
       if (flashcardsData.length === 0) {
         setLoading(false)
@@ -166,7 +173,12 @@ const MultipleChoiceQuiz = ({ preLoadedCards, onComplete, isTestMode }) => {
     setCorrectCount(0)
     setWrongCount(0)
     setCompleted(false)
-    loadNextQuestion(flashcards, {})
+    if (preLoadedCards) {
+      loadNextQuestion(flashcards, {})
+    } else {
+      setLoading(true)
+      fetchData(flashcards.map(fc => fc.id))
+    }
   }
 
   const handleSelectAnswer = (index) => {
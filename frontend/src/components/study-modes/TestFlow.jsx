@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react'
 import { useParams, useNavigate, useSearchParams } from 'react-router-dom'
 import api from '../../services/api'
+import { fetchStudyBundle, fetchStudySession } from '../../services/studyBundle'
 import { ArrowLeft, Trophy, Clock, AlertCircle } from 'lucide-react'
 import MultipleChoiceQuiz from './MultipleChoiceQuiz'
 import MatchingGame from './MatchingGame'
@@ -106,8 +107,13 @@ const TestFlow = ({ isPreAssessment = false }) => {
 
   const fetchData = async () => {
     try {
-      const response = await api.get(`/study-plans/${planId}/quiz`)
-      const cards = response.data
+      // The long test covers the whole deck, so it loads the bundle; a short
+      // test only needs `config.total` cards and lets the server pick the
+      // most urgent ones. Either way one request feeds every phase (MCQs and
+      // sentences included).
+      const { flashcards: cards } = testType === 'long'
+        ? await fetchStudyBundle(planId)
+        : await fetchStudySession(planId, { size: config.total })
 
       if (cards.length === 0) {
         console.warn("No cards found for test flow. Skipping to summary.")
@@ -116,8 +122,9 @@ const TestFlow = ({ isPreAssessment = false }) => {
         return
       }
 
-      // Shuffle all flashcards
-      const shuffled = [...cards].sort(() => Math.random() - 0.5)
+      // The long test asks the whole deck in random order; short test cards
+      // keep the server's order and are dealt out to the phases below
+      const shuffled = testType === 'long' ? [...cards].sort(() => Math.random() - 0.5) : cards
       setFlashcards(shuffled)
 
       // Select vocabulary for each mode
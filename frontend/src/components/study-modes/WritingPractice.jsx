@@ -1,6 +1,8 @@
 import { useEffect, useState, useRef } from 'react'
 import { useParams, useNavigate, useSearchParams } from 'react-router-dom'
 import api from '../../services/api'
+import { fetchStudySession } from '../../services/studyBundle'
+import { queueMasteryUpdate, flushMasteryUpdates } from '../../utils/mastery'
 import { ArrowLeft, RotateCcw, Trophy, CheckCircle2, XCircle } from 'lucide-react'
 
 // LCS (Longest Common Subsequence) diff algorithm
@@ -94,6 +96,7 @@ const WritingPractice = ({ preLoadedCards, onComplete, isTestMode, initialSideSw
   const [submitted, setSubmitted] = useState(false)
 
   const [cardStatus, setCardStatus] = useState({}) // { [id]: { known: bool, attempts: int } }
+  const [sessionGoal, setSessionGoal] = useState(0) // cards to get right in this session
   const [correctCount, setCorrectCount] = useState(0)
   const [incorrectCount, setIncorrectCount] = useState(0)
   const [completed, setCompleted] = useState(false)
@@ -124,14 +127,18 @@ const WritingPractice = ({ preLoadedCards, onComplete, isTestMode, initialSideSw
     }
   }, [planId, preLoadedCards])
 
-  const fetchData = async () => {
+  // `exclude` holds the cards of the previous session, so a restart moves on
+  // to the next most urgent ones; once the deck is used up it starts over
+  const fetchData = async (exclude = []) => {
     try {
-      const response = await api.get(`/flashcards/study-plan/${planId}`)
-      const cards = response.data
-
-      // Shuffle
-      const shuffled = [...cards].sort(() => Math.random() - 0.5)
-      setFlashcards(shuffled)
+      // The server composes the session, most urgent cards first
+      let session = await fetchStudySession(planId, { exclude })
+      if (session.flashcards.length === 0 && exclude.length > 0) {
+        session = await fetchStudySession(planId)
+      }
+      const cards = session.flashcards
+      setFlashcards(cards)
+      setSessionGoal(cards.length)
 
       // Initialize status
       const status = {}
@@ -165,8 +172,7 @@ const WritingPractice = ({ preLoadedCards, onComplete, isTestMode, initialSideSw
       status.known = true
 
       // Update mastery
-      api.post(`/flashcards/${cardId}/update-mastery?mastery_level=${Math.min(100, (currentCard.mastery_level || 0) + 10)}`)
-        .catch(console.error)
+      queueMasteryUpdate(cardId, Math.min(100, (currentCard.mastery_level || 0) + 10))
     } else {
       setIncorrectCount(prev => prev + 1)
       status.attempts = (status.attempts || 0) + 1
@@ -175,51 +181,64 @@ const WritingPractice = ({ preLoadedCards, onComplete, isTestMode, initialSideSw
     setCardStatus(prev => ({ ...prev, [cardId]: status }))
   }
 
-  const handleContinue = () => {
-    if (!currentCard) return
+  // A practice round ran out before the session goal was reached: let the
+  // composer pick the rest of the session from every card not yet known, so
+  // missed cards come back from the server instead of being re-inserted here
+  const fetchNextRound = async () => {
+    const knownIds = Object.keys(cardStatus).filter(id => cardStatus[id].known).map(Number)
+    if (knownIds.length >= sessionGoal) return []
+    try {
+      await flushMasteryUpdates()
+      const { flashcards: cards } = await fetchStudySession(planId, {
+        size: sessionGoal - knownIds.length,
+        exclude: knownIds
+      })
+      setCardStatus(prev => {
+        const next = { ...prev }
+        cards.forEach(card => {
+          if (!next[card.id]) next[card.id] = { known: false, attempts: 0 }
+        })
+        return next
+      })
+      return cards
+    } catch (error) {
+      console.error('Failed to fetch the next round:', error)
+      return []
+    }
+  }
 
-    const cardId = currentCard.id
-    const status = cardStatus[cardId]
+  const handleContinue = async () => {
+    if (!currentCard) return
 
-    if (result?.isCorrect || isTestMode) {
-      // Remove gap from deck
-      const newCards = flashcards.filter((_, i) => i !== currentIndex)
-      if (newCards.length === 0) {
-        setCompleted(true)
-        if (onComplete) {
-          onComplete(cardStatus)
-        } else if (window.testFlowCallback) {
-          window.testFlowCallback(cardStatus)
-        } else if (taskId && !isTestMode) {
-          // Mark task as complete for standalone mode
-          api.post(`/tasks/${taskId}/complete`, {}).then(() => {
-            console.log('Task marked as complete')
-          }).catch(err => {
-            console.error('Failed to mark task as complete:', err)
-          })
-        }
-        return
-      }
+    // Answered cards leave the round either way; a test only asks each card once
+    let newCards = flashcards.filter((_, i) => i !== currentIndex)
+    let newIndex = currentIndex >= newCards.length ? newCards.length - 1 : currentIndex
+    if (newCards.length === 0 && !isTestMode && !preLoadedCards) {
+      newCards = await fetchNextRound()
+      newIndex = 0
+    }
 
-      // Adjust index
-      const newIndex = currentIndex >= newCards.length ? newCards.length - 1 : currentIndex
-      setFlashcards(newCards)
-      setCurrentIndex(newIndex)
-    } else {
-      // Re-insert 3-5 positions ahead
-      const insertPosition = currentIndex + Math.floor(Math.random() * 3) + 3
-      const newCards = [...flashcards]
-      newCards.splice(insertPosition, 0, currentCard)
-      setFlashcards(newCards)
-
-      // Move to next
-      if (currentIndex < flashcards.length - 1) {
-        setCurrentIndex(currentIndex + 1)
-      } else {
-        setCurrentIndex(0)
+    if (newCards.length === 0) {
+      setCompleted(true)
+      flushMasteryUpdates()
+      if (onComplete) {
+        onComplete(cardStatus)
+      } else if (window.testFlowCallback) {
+        window.testFlowCallback(cardStatus)
+      } else if (taskId && !isTestMode) {
+        // Mark task as complete for standalone mode
+        api.post(`/tasks/${taskId}/complete`, {}).then(() => {
+          console.log('Task marked as complete')
+        }).catch(err => {
+          console.error('Failed to mark task as complete:', err)
+        })
       }
+      return
     }
 
+    setFlashcards(newCards)
+    setCurrentIndex(newIndex)
+
     // Reset state
     setUserAnswer('')
     setSubmitted(false)
@@ -246,11 +265,8 @@ const WritingPractice = ({ preLoadedCards, onComplete, isTestMode, initialSideSw
   }
 
   const handleRestart = () => {
-    const status = {}
-    flashcards.forEach(card => {
-      status[card.id] = { known: false, attempts: 0 }
-    })
-    setCardStatus(status)
+    setLoading(true)
+    fetchData(Object.keys(cardStatus).map(Number))
     setCorrectCount(0)
     setIncorrectCount(0)
     setCompleted(false)
@@ -258,10 +274,6 @@ const WritingPractice = ({ preLoadedCards, onComplete, isTestMode, initialSideSw
     setUserAnswer('')
     setSubmitted(false)
     setResult(null)
-
-    // Reshuffle
-    const shuffled = [...flashcards].sort(() => Math.random() - 0.5)
-    setFlashcards(shuffled)
   }
 
 
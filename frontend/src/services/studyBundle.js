@@ -0,0 +1,48 @@
+import api from './api'
+
+// Loads cards, MCQs and example sentences for a plan in one request.
+// Cards come back with `mcq_questions` and `vocabulary_sentences` attached.
+// The bundle is cached by ETag and carries no progress, so mastery_level and
+// times_studied come from the (small, uncached) progress endpoint.
+export const fetchStudyBundle = async (planId) => {
+  const [response, progressResponse] = await Promise.all([
+    api.get(`/study-plans/${planId}/bundle`),
+    api.get(`/study-plans/${planId}/progress`)
+  ])
+  const { version } = response.data
+
+  const progressByCard = {}
+  progressResponse.data.flashcards.forEach(progress => {
+    progressByCard[progress.id] = progress
+  })
+
+  const sentencesByCard = {}
+  const flashcards = response.data.flashcards.map(card => {
+    sentencesByCard[card.id] = card.vocabulary_sentences || []
+    const { mastery_level = 0, times_studied = 0 } = progressByCard[card.id] || {}
+    return { ...card, mastery_level, times_studied }
+  })
+
+  return { flashcards, sentencesByCard, version }
+}
+
+export const SESSION_SIZE = 20
+
+// Asks the server for the `size` most urgent cards of a plan (low mastery,
+// due or recently missed first), in that order, with MCQs and sentences
+// attached. Cards listed in `exclude` are skipped, so a study mode passes the
+// ids it has already dealt with to get the next round instead of downloading
+// and shuffling the whole deck.
+export const fetchStudySession = async (planId, { size = SESSION_SIZE, exclude = [] } = {}) => {
+  const response = await api.post(`/study-plans/${planId}/sessions`, {
+    size,
+    exclude_flashcard_ids: exclude
+  })
+
+  const sentencesByCard = {}
+  response.data.cards.forEach(card => {
+    sentencesByCard[card.id] = card.vocabulary_sentences || []
+  })
+
+  return { flashcards: response.data.cards, sentencesByCard }
+}
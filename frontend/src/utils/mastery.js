@@ -0,0 +1,83 @@
+import api from '../services/api';
+
+// Mastery changes are buffered and sent to /flashcards/update-mastery in one
+// request instead of one POST per card. Only the latest level of each card is
+// kept, so re-sending a batch after a failed request is harmless.
+const FLUSH_INTERVAL_MS = 15000;
+const FLUSH_AT_CARDS = 20;
+
+let pending = new Map();
+let flushTimer = null;
+let flushing = false;
+
+const takePending = () => {
+    const updates = Array.from(pending, ([flashcard_id, mastery_level]) => ({ flashcard_id, mastery_level }));
+    pending = new Map();
+    return updates;
+};
+
+const restore = (updates) => {
+    // Levels queued since the failed request are newer; keep them
+    updates.forEach(({ flashcard_id, mastery_level }) => {
+        if (!pending.has(flashcard_id)) pending.set(flashcard_id, mastery_level);
+    });
+};
+
+const scheduleFlush = () => {
+    if (!flushTimer) {
+        flushTimer = setTimeout(() => {
+            flushTimer = null;
+            flushMasteryUpdates();
+        }, FLUSH_INTERVAL_MS);
+    }
+};
+
+export const flushMasteryUpdates = async () => {
+    if (flushing || pending.size === 0) return;
+    flushing = true;
+    const updates = takePending();
+    try {
+        await api.post('/flashcards/update-mastery', { updates });
+    } catch (error) {
+        console.error('Failed to update mastery:', error);
+        restore(updates);
+        scheduleFlush();
+    } finally {
+        flushing = false;
+    }
+};
+
+// Same keepalive flush as utils/tracking.js when the tab is hidden or closed
+const flushOnHide = () => {
+    if (pending.size === 0) return;
+    const updates = takePending();
+    try {
+        fetch(`${api.defaults.baseURL}/flashcards/update-mastery`, {
+            method: 'POST',
+            keepalive: true,
+            headers: {
+                'Content-Type': 'application/json',
+                Authorization: api.defaults.headers.common['Authorization'] || ''
+            },
+            body: JSON.stringify({ updates })
+        }).catch(() => restore(updates));
+    } catch (error) {
+        restore(updates);
+    }
+};
+
+if (typeof window !== 'undefined') {
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') flushOnHide();
+    });
+    window.addEventListener('pagehide', flushOnHide);
+}
+
+export const queueMasteryUpdate = (flashcardId, masteryLevel) => {
+    pending.set(flashcardId, masteryLevel);
+    if (pending.size >= FLUSH_AT_CARDS) {
+        flushMasteryUpdates();
+    } else {
+        scheduleFlush();
+    }
+};
@@ -1,17 +1,98 @@
 import api from '../services/api';
 
-export const logStudyActivity = async (planId, mode, flashcardId, isCorrect, responseTimeMs, attempts = 1) => {
+// Answers are buffered and sent to /tracking/log-batch in groups instead of one
+// POST per card. Every event carries its own id and timestamp, so a batch that
+// is re-sent after a failed request is only stored once.
+const FLUSH_INTERVAL_MS = 15000;
+const FLUSH_AT_EVENTS = 20;
+const MAX_BUFFERED_EVENTS = 500;
+
+let buffer = [];
+let flushTimer = null;
+let flushing = false;
+
+const newEventId = () => {
+    if (window.crypto?.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+};
+
+const scheduleFlush = () => {
+    if (!flushTimer) {
+        flushTimer = setTimeout(() => {
+            flushTimer = null;
+            flushStudyActivity();
+        }, FLUSH_INTERVAL_MS);
+    }
+};
+
+export const flushStudyActivity = async () => {
+    if (flushing || buffer.length === 0) return;
+    flushing = true;
+    const events = buffer;
+    buffer = [];
     try {
-        await api.post('/tracking/log', {
-            study_plan_id: parseInt(planId),
-            mode: mode,
-            flashcard_id: flashcardId,
-            is_correct: isCorrect,
-            response_time_ms: responseTimeMs,
-            attempts_needed: attempts
-        });
+        await api.post('/tracking/log-batch', { events });
     } catch (error) {
         console.error("Failed to log study activity:", error);
-        // Fail silently so we don't disrupt user experience
+        // Keep the events for the next flush; ids make the retry safe
+        buffer = events.concat(buffer).slice(-MAX_BUFFERED_EVENTS);
+        scheduleFlush();
+    } finally {
+        flushing = false;
+    }
+};
+
+// The page may be gone before an axios request completes, so flush with a
+// keepalive fetch when the tab is hidden or closed.
+const flushOnHide = () => {
+    if (buffer.length === 0) return;
+    const events = buffer;
+    buffer = [];
+    try {
+        fetch(`${api.defaults.baseURL}/tracking/log-batch`, {
+            method: 'POST',
+            keepalive: true,
+            headers: {
+                'Content-Type': 'application/json',
+                Authorization: api.defaults.headers.common['Authorization'] || ''
+            },
+            body: JSON.stringify({ events })
+        }).catch(() => {
+            buffer = events.concat(buffer).slice(-MAX_BUFFERED_EVENTS);
+        });
+    } catch (error) {
+        buffer = events.concat(buffer).slice(-MAX_BUFFERED_EVENTS);
+    }
+};
+
+if (typeof window !== 'undefined') {
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') flushOnHide();
+    });
+    window.addEventListener('pagehide', flushOnHide);
+}
+
+export const logStudyActivity = (planId, mode, flashcardId, isCorrect, responseTimeMs, attempts = 1) => {
+    buffer.push({
+        study_plan_id: parseInt(planId),
+        mode: mode,
+        flashcard_id: flashcardId,
+        is_correct: isCorrect,
+        response_time_ms: responseTimeMs,
+        attempts_needed: attempts,
+        client_event_id: newEventId(),
+        client_timestamp: new Date().toISOString()
+    });
+    // Fail silently and keep memory bounded if the server stays unreachable
+    if (buffer.length > MAX_BUFFERED_EVENTS) {
+        buffer = buffer.slice(-MAX_BUFFERED_EVENTS);
+    }
+
+    if (buffer.length >= FLUSH_AT_EVENTS) {
+        flushStudyActivity();
+    } else {
+        scheduleFlush();
     }
 };